@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+    AsyncRuntime for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import math
+import signal
+import asyncio
+import logging
+
+from functools import reduce
+
+from Scheduler import INTERRUPT_FALLBACK_PERIODS
+
+module_logger = logging.getLogger('Joyspyck.AsyncRuntime')
+
+# AsyncRuntime updates all joysticks from a single thread using an asyncio event loop.
+#
+# Every controller is an independent source: polled controllers run on a timer at the
+# rate of their joystick (waitTimeAxis or waitTimeButtons) and controllers with an event
+# fd (interrupt driven) are updated by the loop when their fd is ready, and polled at a
+# slower rate in case an edge is missed. Updates do not close their frame: the joysticks
+# that emitted events are collected and get a single SYN_REPORT per tick, like on a
+# BusWorker. Ticks are the greatest common divisor of the joystick periods and all the
+# timers are aligned to them, so the sources due on a tick share its SYN_REPORT.
+#
+# SIGINT and SIGTERM stop the loop, cancelling all sources. SIGHUP stops it too, with
+# reload_requested() true, so the configuration can be reloaded and the runtime run again.
+# If prepare_reload is given, it is first run in a thread while the sources keep running,
+# and the loop only stops when it returns something to apply, see reload_result().
+class AsyncRuntime (object):
+
+	# Shortest tick used to sync joysticks with different periods at their exact rates
+	MIN_TICK = 0.001
+
+	def __init__(self, joysticks, prepare_reload=None):
+		self._logger = logging.getLogger('Joyspyck.AsyncRuntime')
+		self._joysticks = joysticks
+		self._prepare_reload = prepare_reload
+		self._preparing = False
+		self._reload_result = None
+		self._loop = None
+		self._stop_event = None
+		self._stopping = False
+		self._reload = False
+		self._ticks = 0
+		self._overruns = 0
+		self._pending = {}
+		self._flush_handle = None
+		self._start_time = 0
+		self._tick = 0
+		self._flushed_tick = -1
+
+	def run(self):
+		asyncio.run(self._main())
+
+	# Can be called from any thread or signal handler
+	def stop(self):
+		self._stopping = True
+		if self._loop is not None and self._stop_event is not None:
+			self._loop.call_soon_threadsafe(self._stop_event.set)
+
+	def reload_requested(self):
+		return self._reload
+
+	# What prepare_reload returned, when the runtime stopped for a reload
+	def reload_result(self):
+		return self._reload_result
+
+	def _request_reload(self):
+		if self._prepare_reload is None:
+			self._reload = True
+			self._stop_event.set()
+		elif not self._preparing:
+			self._preparing = True
+			self._loop.run_in_executor(None, self._prepare_reload).add_done_callback(self._reload_prepared)
+
+	def _reload_prepared(self, future):
+		self._preparing = False
+		if future.cancelled():
+			return
+		if future.exception() is not None:
+			self._logger.error("[reload] Could not prepare the reload: {}".format(str(future.exception())))
+			return
+		self._reload_result = future.result()
+		if self._reload_result is not None:
+			self._reload = True
+			self._stop_event.set()
+
+	def stats(self):
+		return {'ticks': self._ticks, 'overruns': self._overruns}
+
+	async def _main(self):
+		self._loop = asyncio.get_running_loop()
+		self._stop_event = asyncio.Event()
+		for sig in (signal.SIGINT, signal.SIGTERM):
+			self._loop.add_signal_handler(sig, self._stop_event.set)
+		self._loop.add_signal_handler(signal.SIGHUP, self._request_reload)
+		self._pending.clear()
+		self._flush_handle = None
+		if self._stopping:
+			self._stop_event.set()
+
+		self._tick = self._tick_period()
+		self._start_time = self._loop.time()
+		self._flushed_tick = -1
+		sources = []
+		readers = []
+		for joystick in self._joysticks:
+			for index, controller in enumerate(joystick.axis_controllers()):
+				self._add_source(sources, readers, controller.event_fd(), joystick,
+					'update_axis_controller', index, joystick.wait_time_axis)
+			for index, controller in enumerate(joystick.button_controllers()):
+				self._add_source(sources, readers, controller.event_fd(), joystick,
+					'update_button_controller', index, joystick.wait_time_buttons)
+
+		self._logger.info("[run] {} polled and {} event driven sources running".format(len(sources), len(readers)))
+		await self._stop_event.wait()
+
+		self._logger.info("[run] Stopping sources...")
+		for fd in readers:
+			self._loop.remove_reader(fd)
+		for source in sources:
+			source.cancel()
+		await asyncio.gather(*sources, return_exceptions=True)
+		if self._flush_handle is not None:
+			self._flush_handle.cancel()
+		self._flush()
+		self._logger.info("[run] Stats: {}".format(self.stats()))
+
+	# Greatest common divisor of the periods of the joysticks with controllers, or the
+	# fastest period when the divisor is shorter than MIN_TICK
+	def _tick_period(self):
+		periods_us = []
+		for joystick in self._joysticks:
+			if joystick.axis_controllers():
+				periods_us.append(max(1, round(joystick.wait_time_axis * 1000000)))
+			if joystick.button_controllers():
+				periods_us.append(max(1, round(joystick.wait_time_buttons * 1000000)))
+		if not periods_us:
+			return self.MIN_TICK
+		tick_us = reduce(math.gcd, periods_us)
+		if tick_us < self.MIN_TICK * 1000000:
+			tick_us = min(periods_us)
+		return tick_us / 1000000
+
+	# Interrupt driven controllers are updated when their fd is ready, and polled every
+	# INTERRUPT_FALLBACK_PERIODS periods in case an edge was missed
+	def _add_source(self, sources, readers, fd, joystick, update, index, period):
+		if fd is not None:
+			self._loop.add_reader(fd, self._update, joystick, update, index)
+			readers.append(fd)
+			period *= INTERRUPT_FALLBACK_PERIODS
+		sources.append(self._loop.create_task(self._poll(joystick, update, index, period)))
+
+	# Update a controller without closing the frame, the joystick is synced by _flush. The
+	# update method is looked up on every call, so the profiler can wrap and unwrap it.
+	def _update(self, joystick, update, index):
+		if getattr(joystick, update)(index, False) > 0 and joystick not in self._pending:
+			self._pending[joystick] = True
+			if self._flush_handle is None:
+				self._schedule_flush()
+
+	# Flush at the start of the current tick, which runs once the sources due on it have
+	# been updated, or at the next one when the current tick was already flushed
+	def _schedule_flush(self):
+		tick = int((self._loop.time() - self._start_time) // self._tick)
+		if tick <= self._flushed_tick:
+			tick = self._flushed_tick + 1
+		self._flush_handle = self._loop.call_at(self._start_time + tick * self._tick, self._flush, tick)
+
+	# Send one SYN_REPORT per joystick that emitted events since the last flush
+	def _flush(self, tick=None):
+		self._flush_handle = None
+		if tick is not None:
+			self._flushed_tick = tick
+		for joystick in self._pending:
+			joystick.syn()
+		self._pending.clear()
+
+	# Update a controller at a fixed rate. Deadlines are computed from the start time of the
+	# runtime, so the update time does not add to the period and the sources with the same
+	# period are due at the same time. Missed deadlines are skipped.
+	async def _poll(self, joystick, update, index, period):
+		loop = self._loop
+		deadline = self._start_time
+		while True:
+			self._update(joystick, update, index)
+			self._ticks += 1
+			deadline += period
+			delay = deadline - loop.time()
+			if delay < 0:
+				self._overruns += 1
+				deadline += (-delay // period + 1) * period
+				delay = deadline - loop.time()
+			await asyncio.sleep(delay)
@@ -22,16 +22,49 @@
 	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import board
-import busio
+import time
 import logging
 
 import adafruit_ads1x15.ads1115 as ADS
 
 from .AxisManager import AxisController
+from .Calibration import AxisCalibration
+from .Filters import axis_filter_from_options
+from BusManager import get_i2c, i2c_bus_key, DEFAULT_I2C_BUS
+from GpioEdge import GpioEdge, Edge
 from adafruit_ads1x15.analog_in import AnalogIn
 
 module_logger = logging.getLogger('Joyspyck.AxisControllers.ADS1115_AxisController')
+
+# ADS1115 registers and config bits used in continuous mode and ALERT/RDY conversions
+# http://www.ti.com/lit/ds/symlink/ads1114.pdf (page 27)
+POINTER_CONVERSION = 0x00
+POINTER_CONFIG     = 0x01
+POINTER_LO_THRESH  = 0x02
+POINTER_HI_THRESH  = 0x03
+CONFIG_OS_START    = 0x8000	# Start a single-shot conversion
+CONFIG_MODE_SINGLE = 0x0100	# Power down after a single-shot conversion
+CONFIG_MUX_SINGLE  = 0x4000	# AINx against GND, x in bits 13:12
+CONFIG_COMP_QUE_1  = 0x0000	# Assert ALERT/RDY after each conversion
+CONFIG_COMP_QUE_DISABLE = 0x0003
+CONFIG_GAIN = {
+	2/3: 0x0000,
+	1:   0x0200,
+	2:   0x0400,
+	4:   0x0600,
+	8:   0x0800,
+	16:  0x0A00
+}
+CONFIG_DATA_RATE = {
+	8:   0x0000,
+	16:  0x0020,
+	32:  0x0040,
+	64:  0x0060,
+	128: 0x0080,
+	250: 0x00A0,
+	475: 0x00C0,
+	860: 0x00E0
+}
 class ADS1115_AxisController (AxisController):
 	
 	def __init__(self, config):
@@ -44,12 +77,19 @@ class ADS1115_AxisController (AxisController):
 
 		# Set defaults in config if keys not present
 		if 'gain' not in self._config['options']:
-			self._config['options']['gain'] = 0
+			self._config['options']['gain'] = 1
 
 		self._gain = self._config['options']['gain'] \
-		if isinstance(self._config['options']['gain'], int) \
+		if isinstance(self._config['options']['gain'], (int, float)) \
 		else int(self._config['options']['gain'], base=10)
 
+		if 'busnum' not in self._config['options']:
+			self._config['options']['busnum'] = DEFAULT_I2C_BUS
+
+		self._busnum = self._config['options']['busnum'] \
+		if isinstance(self._config['options']['busnum'], int) \
+		else int(self._config['options']['busnum'], base=10)
+
 		if 'address' not in self._config['options']:
 			self._config['options']['address'] = 0x48
 
@@ -60,32 +100,86 @@ class ADS1115_AxisController (AxisController):
 		if 'calibration_max' not in self._config['options']:
 			self._config['options']['calibration_max'] = 32766
 
-		self._calibration_max = self._config['options']['calibration_max'] \
-		if isinstance(self._config['options']['calibration_max'], int) \
-		else int(self._config['options']['calibration_max'], base=10)
-
 		if 'calibration_min' not in self._config['options']:
 			self._config['options']['calibration_min'] = -32766
 
-		self._calibration_min = self._config['options']['calibration_min'] \
-		if isinstance(self._config['options']['calibration_min'], int) \
-		else int(self._config['options']['calibration_min'],base=10)
-
 		if 'calibration_threshold' not in self._config['options']:
 			self._config['options']['calibration_threshold'] = 0.009
 
-		self._calibration_threshold = self._config['options']['calibration_threshold'] \
-		if isinstance(self._config['options']['calibration_threshold'], float) \
-		else float(self._config['options']['calibration_threshold'])
+		if 'curve' not in self._config['options']:
+			self._config['options']['curve'] = 1.0
+
+		# Calibration of the mapped channels. Options can be given per channel as lists.
+		self._calibration = AxisCalibration(min(self._num_events, self._num_axis),
+			self._config['options']['calibration_min'],
+			self._config['options']['calibration_max'],
+			self._config['options']['calibration_threshold'],
+			self._config['options']['curve'],
+			raw_offset=10,
+			post_min=self._post_calibration_min,
+			post_max=self._post_calibration_max)
+
+		# Smoothing of the channels, applied by the calibration before the zero zone and curve
+		self._calibration.set_filter(axis_filter_from_options(self._calibration.num_axis(), self._config['options']))
+
+		if 'data_rate' not in self._config['options']:
+			self._config['options']['data_rate'] = 128
+
+		self._data_rate = self._config['options']['data_rate'] \
+		if isinstance(self._config['options']['data_rate'], int) \
+		else int(self._config['options']['data_rate'], base=10)
+
+		if self._data_rate not in CONFIG_DATA_RATE:
+			raise ValueError("ADS1115 {0} data_rate must be one of {1}.".format(self._config['name'], sorted(CONFIG_DATA_RATE)))
+
+		# Continuous conversion mode. The only mapped channel is converted all the time.
+		if 'continuous' not in self._config['options']:
+			self._config['options']['continuous'] = False
+
+		self._continuous = bool(self._config['options']['continuous'])
+
+		# With several channels every mux switch waits up to two conversion periods, which is
+		# slower than single-shot conversions, so continuous mode is only used for one channel.
+		if self._continuous and self._calibration.num_axis() > 1:
+			self._logger.warning("[init] ADS1115 {0} continuous mode needs a single mapped channel, using single-shot conversions.".format(self._config['name']))
+			self._continuous = False
+
+		# Optional GPIO line wired to ALERT/RDY, used to wait for the end of conversions
+		if 'alert_rdy_chip' not in self._config['options']:
+			self._config['options']['alert_rdy_chip'] = '/dev/gpiochip0'
+
+		self._alert_rdy_chip = self._config['options']['alert_rdy_chip']
+
+		if 'alert_rdy_line' not in self._config['options']:
+			self._config['options']['alert_rdy_line'] = None
+
+		self._alert_rdy_line = self._config['options']['alert_rdy_line'] \
+		if self._config['options']['alert_rdy_line'] is None or isinstance(self._config['options']['alert_rdy_line'], int) \
+		else int(self._config['options']['alert_rdy_line'], base=10)
+
+		# Last raw value of each channel. Continuous mode state: channel being converted and
+		# time of the last mux switch.
+		self._raw_values = [0, 0, 0, 0]
+		self._values = [0, 0, 0, 0]
+		self._mux_channel = 0
+		self._mux_time = 0
+		self._alert_rdy = None
+		self._register_buffer = bytearray(3)
+		self._pointer_buffer = bytearray([POINTER_CONVERSION])
+
+		# After a mux switch the ongoing conversion ends with the old input, so wait for two
+		# conversion periods plus a 10% margin for the internal oscillator.
+		self._switch_time = 2.2 / self._data_rate
 
 	def connect(self):
 		try:
-			# Initialize ADS object
-			self._i2c = busio.I2C(board.SCL, board.SDA)
+			# Initialize ADS object on the shared bus handle
+			self._i2c = get_i2c(self._busnum)
 			self._adc = ADS.ADS1115(self._i2c, address=self._address)
 
-			# Set gain
+			# Set gain and data rate
 			self._adc.gain = self._gain
+			self._adc.data_rate = self._data_rate
 
 			# Create input in channels
 			self._channels = [
@@ -95,6 +189,19 @@ class ADS1115_AxisController (AxisController):
 				AnalogIn(self._adc, ADS.P3),
 			]
 
+			if self._alert_rdy_line is not None and self._alert_rdy is None:
+				# ALERT/RDY goes low at the end of every conversion when the MSB of
+				# Hi_thresh is 1 and the MSB of Lo_thresh is 0.
+				self._alert_rdy = GpioEdge(self._alert_rdy_chip, self._alert_rdy_line, Edge.FALLING)
+				self._alert_rdy.open()
+
+			if self._continuous or self._alert_rdy is not None:
+				self._write_register(POINTER_LO_THRESH, 0x0000)
+				self._write_register(POINTER_HI_THRESH, 0x8000)
+
+			if self._continuous:
+				self._select_channel(0)
+
 			self._logger.info("[connect] ADS1115 initialized on address {}".format(self._address))
 
 		except Exception as ex:
@@ -102,21 +209,106 @@ class ADS1115_AxisController (AxisController):
 			return False
 		return True
 
+	def close(self):
+		if self._alert_rdy is not None:
+			self._alert_rdy.close()
+			self._alert_rdy = None
+
+	def bus(self):
+		return i2c_bus_key(self._busnum)
+
+	# Read every mapped channel, then calibrate and filter them all at once
+	def poll(self):
+		num_channels = self._calibration.num_axis()
+		if not self._continuous:
+			if self._alert_rdy is None:
+				# No ALERT/RDY line, each read waits a fixed conversion time
+				for channel in range(num_channels):
+					self._raw_values[channel] = self._channels[channel].value
+			else:
+				# Convert the channels one after the other, each read as soon as ALERT/RDY
+				# signals the end of its conversion
+				for channel in range(num_channels):
+					self._start_conversion(channel)
+					self._wait_ready()
+					self._raw_values[channel] = self._read_conversion()
+			self._calibration.apply(self._raw_values, self._values)
+			return
+
+		# Read the latest conversion of the channel. Only the first poll after connecting
+		# waits for a conversion to be done.
+		self._wait_conversion()
+		self._raw_values[0] = self._read_conversion()
+		self._calibration.apply(self._raw_values, self._values)
+
+	def _select_channel(self, channel):
+		config = CONFIG_MUX_SINGLE | (channel << 12)
+		config |= CONFIG_GAIN[self._gain]
+		config |= CONFIG_DATA_RATE[self._data_rate]
+		config |= CONFIG_COMP_QUE_1 if self._alert_rdy is not None else CONFIG_COMP_QUE_DISABLE
+		self._write_register(POINTER_CONFIG, config)	# MODE bit clear: continuous conversion
+
+		if self._alert_rdy is not None:
+			self._alert_rdy.drain()
+		self._mux_channel = channel
+		self._mux_time = time.monotonic()
+
+	# Start a single-shot conversion of the channel, signaled on ALERT/RDY when done
+	def _start_conversion(self, channel):
+		config = CONFIG_OS_START | CONFIG_MUX_SINGLE | (channel << 12) | CONFIG_MODE_SINGLE
+		config |= CONFIG_GAIN[self._gain]
+		config |= CONFIG_DATA_RATE[self._data_rate]
+		config |= CONFIG_COMP_QUE_1
+		self._alert_rdy.drain()
+		self._write_register(POINTER_CONFIG, config)
+		self._mux_channel = channel
+		self._mux_time = time.monotonic()
+
+	# Wait for the ALERT/RDY edge of the single-shot conversion started last. A missed edge
+	# only delays the read up to the switch time, never blocks the update loop.
+	def _wait_ready(self):
+		deadline = self._mux_time + self._switch_time
+		remaining = deadline - time.monotonic()
+		while remaining > 0:
+			if self._alert_rdy.wait(remaining):
+				return
+			remaining = deadline - time.monotonic()
+
+	# Wait until the channel selected on the last mux switch has a valid conversion.
+	def _wait_conversion(self):
+		deadline = self._mux_time + self._switch_time
+		if self._alert_rdy is not None:
+			# The first edge after a switch may belong to the old channel, the second one
+			# is always a conversion of the new one.
+			edges = 0
+			while edges < 2:
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					break
+				edges += self._alert_rdy.wait(remaining)
+		else:
+			remaining = deadline - time.monotonic()
+			if remaining > 0:
+				time.sleep(remaining)
+
+	def _read_conversion(self):
+		with self._adc.i2c_device as i2c:
+			i2c.write_then_readinto(self._pointer_buffer, self._register_buffer, in_end=2)
+		value = self._register_buffer[0] << 8 | self._register_buffer[1]
+		return value - 0x10000 if value & 0x8000 else value
+
+	def _write_register(self, register, value):
+		self._register_buffer[0] = register
+		self._register_buffer[1] = (value >> 8) & 0xFF
+		self._register_buffer[2] = value & 0xFF
+		with self._adc.i2c_device as i2c:
+			i2c.write(self._register_buffer)
+
 	def axis_value(self, index):
 
 		# Check valid axis index
 		if index < 0 or index > (self._num_axis - 1):
 			return None
 
-		# Apply normalization function
-		read_value = self._channels[index].value
-		translated_value = self._post_calibration_min + ((read_value - 10) * (self._post_calibration_max - self._post_calibration_min)) / (self._calibration_max - self._calibration_min)
-
-		# Apply zero zone
-		zero_min = -(self._post_calibration_max - self._post_calibration_min) * self._calibration_threshold
-		zero_max = -zero_min
-
-		if zero_min < translated_value < zero_max:
-			return 0
-		else:
-			return translated_value
+		# Calibrated in poll
+		return self._values[index]
@@ -24,21 +24,29 @@
 
 from UInputEvents import UInputEvents
 
-# Factory to generate AxisControllers depending on the supplied type.
-def get_axis_controller(controller_config):
+# Factory to generate AxisControllers depending on the supplied type. With connect False
+# the controller is only created, and connect must be called before using it.
+def get_axis_controller(controller_config, connect=True):
 	ret = None
 
-	if controller_config["type"] == "ADS1115":
+	# Run the controller in its own process, see ProcessController
+	if controller_config.get("isolated", False):
+		from ProcessController import ProcessAxisController
+		ret = ProcessAxisController(controller_config)
+	elif controller_config["type"] == "ADS1115":
 		from .ADS1115_AxisController import ADS1115_AxisController
 		ret = ADS1115_AxisController(controller_config)
 	elif controller_config["type"] == "Dummy":
 		from .Dummy_AxisController import Dummy_AxisController
 		ret = Dummy_AxisController(controller_config)
+	elif controller_config["type"] == "Simulated":
+		from .Simulated_AxisController import Simulated_AxisController
+		ret = Simulated_AxisController(controller_config)
 	elif controller_config["type"] == "MPU6050":
 		from .MPU6050_AxisController import MPU6050_AxisController
 		ret = MPU6050_AxisController(controller_config)
 
-	if ret is not None and ret.connect():
+	if ret is not None and (not connect or ret.connect()):
 		return ret
 	else:
 		return None
@@ -69,7 +77,7 @@ class AxisController (object):
             if event in UInputEvents:
                 self._events.append(UInputEvents[event] + (-32766, 32766, 0, 0))
             else:
-                raise ValueError("Event {0} is not a valid UInputEvent".format(event))
+                raise ValueError(UInputEvents.invalid_message(event))
         
         self._num_events = len(self._events)
 
@@ -79,14 +87,43 @@ class AxisController (object):
     def num_mapped_axis(self):
 	    return self._num_events
 
+    # Called once per update cycle before any axis_value call. Controllers able
+    # to read all their channels at once should do it here and serve axis_value
+    # from that snapshot.
+    def poll(self):
+        pass
+
     def axis_value(self, index):
         return 0
 
+    def name(self):
+        return self._config['name']
+
     def type(self):
         return self._config['type']
 
+    # File descriptor that becomes readable when the device has new data (for example a
+    # GPIO edge of its interrupt line). Controllers with an fd are polled when it is ready
+    # instead of periodically. None for polled controllers.
+    def event_fd(self):
+        return None
+
+    # Discard the pending data of event_fd without reading the device. Called instead of
+    # poll while the controller is offline, so its fd does not stay ready.
+    def drain_events(self):
+        pass
+
+    # Hashable key of the physical bus the device is connected to. Controllers sharing
+    # a bus are polled from the same worker. None when the device has no bus.
+    def bus(self):
+        return None
+
     def get_events(self):
         return self._events
 
     def connect(self):
         return True
+
+    # Release the device. Called when the controller is removed from a running joystick.
+    def close(self):
+        pass
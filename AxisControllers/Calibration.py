@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+    Axis calibration for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+# Parse an option that can be given once for all the axis or as a list with one value
+# per axis. Returns a tuple with the value of every axis.
+def per_axis_option(value, num_axis, convert, name):
+	if isinstance(value, (list, tuple)):
+		if len(value) < num_axis:
+			raise ValueError("Option {0} has {1} values, {2} are needed.".format(name, len(value), num_axis))
+		return tuple(convert(item) for item in value[:num_axis])
+	return (convert(value),) * num_axis
+
+# AxisCalibration turns the raw readings of all the axis of a controller into axis
+# values in one call:
+#
+#   value = post_min + (raw - raw_offset) * (post_max - post_min) / (calibration_max - calibration_min)
+#
+# Values inside the zero zone, smaller in magnitude than (post_max - post_min) * threshold,
+# become 0. With a curve other than 1, the values outside it are then shaped as
+# post_max * (|value| / post_max) ** curve, keeping their sign.
+#
+# apply(raw, out) calibrates the raw readings of all the axis (any sequence) into out (any
+# mutable sequence of the same length). It is set in __init__ to the version without
+# curves when no axis has one. Everything but the readings is precomputed per axis, so
+# calibrating an axis costs one multiply-add and a comparison. calibration_min,
+# calibration_max, threshold and curve can be one value for all the axis or a sequence
+# with one value per axis.
+#
+# The two steps are also available on their own: scale(raw, out) does the linear step and
+# shape(values) the zero zone and the curve. With a filter (see set_filter) apply runs
+# scale, the filter and shape, so the filter smooths the values before the zero zone and
+# the curve are applied.
+class AxisCalibration (object):
+
+	def __init__(self, num_axis, calibration_min, calibration_max, threshold, curve=1.0,
+			raw_offset=0, post_min=-32765, post_max=32765):
+		calibration_min = per_axis_option(calibration_min, num_axis, float, 'calibration_min')
+		calibration_max = per_axis_option(calibration_max, num_axis, float, 'calibration_max')
+		threshold = per_axis_option(threshold, num_axis, float, 'calibration_threshold')
+		curve = per_axis_option(curve, num_axis, float, 'curve')
+
+		params = []
+		for i in range(num_axis):
+			if calibration_max[i] == calibration_min[i]:
+				raise ValueError("calibration_max and calibration_min of axis {0} are equal.".format(i))
+			scale = (post_max - post_min) / (calibration_max[i] - calibration_min[i])
+			bias = post_min - raw_offset * scale
+			zero = (post_max - post_min) * threshold[i]
+			params.append((scale, bias, zero, curve[i]))
+
+		self._num_axis = num_axis
+		self._post_max = float(post_max)
+		self._params = tuple(params)
+		self._filter = None
+
+		# Curves are only evaluated when some axis has one
+		self._has_curve = any(c != 1.0 for c in curve)
+		self.shape = self._shape_curve if self._has_curve else self._shape_linear
+		self.set_filter(None)
+
+	def num_axis(self):
+		return self._num_axis
+
+	# Smooth the values with axis_filter (an AxisFilter, None for no filter) between the
+	# two steps of apply
+	def set_filter(self, axis_filter):
+		self._filter = axis_filter
+		if axis_filter is not None:
+			self.apply = self._apply_filtered
+		elif self._has_curve:
+			self.apply = self._apply_curve
+		else:
+			self.apply = self._apply_linear
+
+	def scale(self, raw, out):
+		i = 0
+		for (scale, bias, _, _), value in zip(self._params, raw):
+			out[i] = value * scale + bias
+			i += 1
+
+	def _shape_linear(self, values):
+		for i, (_, _, zero, _) in enumerate(self._params):
+			if -zero < values[i] < zero:
+				values[i] = 0
+
+	def _shape_curve(self, values):
+		post_max = self._post_max
+		for i, (_, _, zero, curve) in enumerate(self._params):
+			value = values[i]
+			if -zero < value < zero:
+				values[i] = 0
+			elif value > 0:
+				values[i] = post_max * (value / post_max) ** curve
+			else:
+				values[i] = -post_max * (-value / post_max) ** curve
+
+	def _apply_filtered(self, raw, out):
+		self.scale(raw, out)
+		self._filter.apply(out)
+		self.shape(out)
+
+	def _apply_linear(self, raw, out):
+		i = 0
+		for (scale, bias, zero, _), value in zip(self._params, raw):
+			value = value * scale + bias
+			out[i] = 0 if -zero < value < zero else value
+			i += 1
+
+	def _apply_curve(self, raw, out):
+		post_max = self._post_max
+		i = 0
+		for (scale, bias, zero, curve), value in zip(self._params, raw):
+			value = value * scale + bias
+			if -zero < value < zero:
+				out[i] = 0
+			elif value > 0:
+				out[i] = post_max * (value / post_max) ** curve
+			else:
+				out[i] = -post_max * (-value / post_max) ** curve
+			i += 1
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+    Axis filters for Joyspyck
+
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import math
+import time
+
+from bisect import bisect_left
+
+from array import array
+
+from .Calibration import per_axis_option
+
+FILTER_TYPES = ('ema', 'median', 'one_euro')
+
+# Default filter options, see axis_filter_from_options
+FILTER_DEFAULTS = {
+	'filter': None,
+	'filter_alpha': 0.5,
+	'filter_window': 3,
+	'filter_min_cutoff': 1.0,
+	'filter_beta': 0.001,
+	'filter_d_cutoff': 1.0,
+}
+
+# Read the filter options of a controller, setting the missing ones to their defaults.
+# Returns the AxisFilter of its num_axis axis, None when the controller has no filter.
+def axis_filter_from_options(num_axis, options):
+	for name, default in FILTER_DEFAULTS.items():
+		if name not in options:
+			options[name] = default
+
+	if options['filter'] is None:
+		return None
+	return AxisFilter(num_axis, options['filter'],
+		alpha=options['filter_alpha'],
+		window=options['filter_window'],
+		min_cutoff=options['filter_min_cutoff'],
+		beta=options['filter_beta'],
+		d_cutoff=options['filter_d_cutoff'])
+
+# AxisFilter smooths the scaled values of all the axis of a controller in one call, in
+# place, before the zero zone and the curve (see AxisCalibration.set_filter). The filter
+# type is the same for the whole controller, its parameters can be one value for all the
+# axis or a sequence with one value per axis:
+#
+#  - ema: exponential moving average, value = alpha * sample + (1 - alpha) * value.
+#    Lower alphas smooth more and add more lag; 1 leaves the axis untouched.
+#  - median: median of the last `window` samples. Removes spikes without smoothing steps.
+#  - one_euro: the 1-euro filter (Casiez et al., CHI 2012), an EMA whose cutoff
+#    frequency goes up with the speed of the axis: min_cutoff (Hz) sets the smoothing of a
+#    still axis and beta how fast the cutoff grows with the speed (in axis units per
+#    second), so slow movements are smooth and fast ones have little lag. d_cutoff (Hz)
+#    smooths the speed estimate.
+#
+# apply(values) filters the values of all the axis (any mutable sequence, only the first
+# num_axis values are used) in place. It is set in __init__ to the version of the filter
+# type. All the state is kept in arrays allocated once: the last outputs and, for the
+# median, a ring with the last `window` samples of every axis and the same samples kept
+# sorted, where every new sample replaces the one leaving the ring. The first samples
+# fill the state, so the values do not ramp up from 0 after start.
+class AxisFilter (object):
+
+	def __init__(self, num_axis, filter_type, alpha=0.5, window=3, min_cutoff=1.0, beta=0.001, d_cutoff=1.0):
+		if filter_type not in FILTER_TYPES:
+			raise ValueError("Filter {0} is not one of {1}.".format(filter_type, ", ".join(FILTER_TYPES)))
+
+		self._num_axis = num_axis
+		self._started = False
+		self._values = array('d', [0.0] * num_axis)
+
+		if filter_type == 'ema':
+			self._alpha = per_axis_option(alpha, num_axis, float, 'filter_alpha')
+			if any(not 0 < a <= 1 for a in self._alpha):
+				raise ValueError("Option filter_alpha must be between 0 (excluded) and 1.")
+			self.apply = self._apply_ema
+		elif filter_type == 'median':
+			self._window = int(window)
+			if self._window < 1:
+				raise ValueError("Option filter_window must be at least 1.")
+			self._ring = array('d', [0.0] * (num_axis * self._window))
+			self._sorted = array('d', [0.0] * (num_axis * self._window))
+			self._ring_index = 0
+			self.apply = self._apply_median
+		else:
+			min_cutoff = per_axis_option(min_cutoff, num_axis, float, 'filter_min_cutoff')
+			self._beta = per_axis_option(beta, num_axis, float, 'filter_beta')
+			d_cutoff = per_axis_option(d_cutoff, num_axis, float, 'filter_d_cutoff')
+			if any(c <= 0 for c in min_cutoff + d_cutoff):
+				raise ValueError("Options filter_min_cutoff and filter_d_cutoff must be over 0.")
+			# Time constants 1 / (2 pi cutoff) of the cutoffs, precomputed
+			self._min_tau = tuple(1.0 / (2 * math.pi * c) for c in min_cutoff)
+			self._d_tau = tuple(1.0 / (2 * math.pi * c) for c in d_cutoff)
+			self._two_pi = 2 * math.pi
+			self._speeds = array('d', [0.0] * num_axis)
+			self._last_time = 0.0
+			self.apply = self._apply_one_euro
+
+	def num_axis(self):
+		return self._num_axis
+
+	def _start(self, values):
+		for i in range(self._num_axis):
+			self._values[i] = values[i]
+		self._started = True
+
+	def _apply_ema(self, values):
+		if not self._started:
+			self._start(values)
+			return
+		state = self._values
+		for i, alpha in enumerate(self._alpha):
+			value = state[i] + alpha * (values[i] - state[i])
+			state[i] = value
+			values[i] = value
+
+	def _apply_median(self, values):
+		window = self._window
+		ring = self._ring
+		ordered = self._sorted
+		if not self._started:
+			for i in range(self._num_axis):
+				for k in range(i * window, (i + 1) * window):
+					ring[k] = values[i]
+					ordered[k] = values[i]
+			self._started = True
+			return
+
+		index = self._ring_index
+		middle = window // 2
+		for i in range(self._num_axis):
+			start = i * window
+			end = start + window
+			value = values[i]
+			old = ring[start + index]
+			ring[start + index] = value
+
+			# Move the slot of the old sample to where the new one sorts, shifting the samples
+			# in between by one
+			k = bisect_left(ordered, old, start, end)
+			if value > old:
+				while k + 1 < end and ordered[k + 1] < value:
+					ordered[k] = ordered[k + 1]
+					k += 1
+			else:
+				while k > start and ordered[k - 1] > value:
+					ordered[k] = ordered[k - 1]
+					k -= 1
+			ordered[k] = value
+			values[i] = ordered[start + middle]
+		self._ring_index = (index + 1) % window
+
+	def _apply_one_euro(self, values):
+		now = time.monotonic()
+		if not self._started:
+			self._start(values)
+			self._last_time = now
+			return
+
+		dt = now - self._last_time
+		if dt <= 0:
+			return
+		self._last_time = now
+
+		state = self._values
+		speeds = self._speeds
+		beta = self._beta
+		d_tau = self._d_tau
+		two_pi = self._two_pi
+		for i, min_tau in enumerate(self._min_tau):
+			last = state[i]
+			# Smoothed speed, then a cutoff growing with it
+			a = 1.0 / (1.0 + d_tau[i] / dt)
+			speed = speeds[i] + a * ((values[i] - last) / dt - speeds[i])
+			speeds[i] = speed
+			tau = 1.0 / (1.0 / min_tau + two_pi * beta[i] * abs(speed))
+			a = 1.0 / (1.0 + tau / dt)
+			value = last + a * (values[i] - last)
+			state[i] = value
+			values[i] = value
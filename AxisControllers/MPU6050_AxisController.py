@@ -23,10 +23,12 @@
 """
 
 import math
-import smbus
 import logging
 
 from .AxisManager import AxisController
+from .Calibration import AxisCalibration
+from .Filters import axis_filter_from_options
+from BusManager import get_smbus, i2c_bus_key
 
 module_logger = logging.getLogger('Joyspyck.AxisControllers.MPU6050_AxisController')
 
@@ -41,6 +43,18 @@ INT_ENABLE   = 0x38
 ACCEL_XOUT_H = 0x3B
 ACCEL_YOUT_H = 0x3D
 ACCEL_ZOUT_H = 0x3F
+FIFO_EN      = 0x23
+USER_CTRL    = 0x6A
+FIFO_COUNTH  = 0x72
+FIFO_R_W     = 0x74
+
+# FIFO related bits and sizes
+ACCEL_FIFO_EN   = 0x08	# FIFO_EN: push ACCEL_XOUT_H..ACCEL_ZOUT_L to the FIFO
+USER_FIFO_EN    = 0x40	# USER_CTRL: enable FIFO operations
+USER_FIFO_RESET = 0x04	# USER_CTRL: reset the FIFO buffer
+FIFO_SIZE       = 1024	# FIFO size in bytes
+FIFO_SAMPLE     = 6		# Bytes per accel sample in the FIFO
+FIFO_CHUNK      = 30	# Bytes per block read (SMBus block limit is 32), multiple of FIFO_SAMPLE
 
 # Check how to get tilt info from accelerometer
 # https://www.analog.com/media/en/technical-documentation/application-notes/AN-1057.pdf (page 7)
@@ -59,6 +73,16 @@ def _get_z_rotation(x, y, z):
 def _dist(a,b):
 	return math.sqrt((a*a)+(b*b))
 
+# Build a signed number from the high and low bytes of a register pair
+def _word_2c(h, l):
+	val = (h << 8) + l
+
+	# Transform it in a signed number
+	if (val >= 0x8000):
+		return -((65535 - val) + 1)
+	else:
+		return val
+
 # Main class
 class MPU6050_AxisController (AxisController):
 
@@ -88,9 +112,8 @@ class MPU6050_AxisController (AxisController):
 		if 'calibration_threshold' not in self._config['options']:
 			self._config['options']['calibration_threshold'] = 0.009
 
-		self._calibration_threshold = self._config['options']['calibration_threshold'] \
-		if isinstance(self._config['options']['calibration_threshold'], float) \
-		else float(self._config['options']['calibration_threshold'])
+		if 'curve' not in self._config['options']:
+			self._config['options']['curve'] = 1.0
 
 		# Extreme values are 180° and -180° due to the limitations of using one single
 		# sensor: the acceleration generated at an inclination of N° is the same as the acceleration generated at an 
@@ -99,24 +122,76 @@ class MPU6050_AxisController (AxisController):
 		self._calibration_max = 180
 		self._calibration_min = 0
 
+		# Calibration of the three rotations. Threshold and curve can be given per axis as lists.
+		self._calibration = AxisCalibration(self._num_axis,
+			self._calibration_min,
+			self._calibration_max,
+			self._config['options']['calibration_threshold'],
+			self._config['options']['curve'],
+			post_min=self._post_calibration_min,
+			post_max=self._post_calibration_max)
+
+		# Smoothing of the rotations, applied by the calibration before the zero zone and curve
+		self._calibration.set_filter(axis_filter_from_options(self._num_axis, self._config['options']))
+
+		# FIFO streaming mode. Samples are stored by the device at sample_rate and drained
+		# on every poll, reduced to one value by averaging them or keeping the latest.
+		if 'fifo' not in self._config['options']:
+			self._config['options']['fifo'] = False
+
+		self._fifo = bool(self._config['options']['fifo'])
+
+		if 'sample_rate' not in self._config['options']:
+			self._config['options']['sample_rate'] = 125
+
+		self._sample_rate = self._config['options']['sample_rate'] \
+		if isinstance(self._config['options']['sample_rate'], int) \
+		else int(self._config['options']['sample_rate'], base=10)
+
+		if self._sample_rate < 4 or self._sample_rate > 1000:
+			raise ValueError("MPU6050 {0} sample_rate must be between 4 and 1000 Hz.".format(self._config['name']))
+
+		if 'fifo_reduce' not in self._config['options']:
+			self._config['options']['fifo_reduce'] = 'average'
+
+		self._fifo_average = self._config['options']['fifo_reduce'] == 'average'
+
+		if self._config['options']['fifo_reduce'] not in ('average', 'latest'):
+			raise ValueError("MPU6050 {0} fifo_reduce must be 'average' or 'latest'.".format(self._config['name']))
+
+		# Axis values computed from the last burst read
+		self._values = [0, 0, 0]
+		self._rotations = [0.0, 0.0, 0.0]
+
 	def connect(self):
 		try:
-			# Initialize smbus object.
-			self._bus = smbus.SMBus(self._busnum)
+			# Get the shared smbus object.
+			self._bus = get_smbus(self._busnum)
 
 			# Check i2c register map:
 			# https://www.invensense.com/wp-content/uploads/2015/02/MPU-6000-Register-Map1.pdf
 
 			# Set device config
-			self._bus.write_byte_data(self._address, SMPLRT_DIV, 7)	# Set sample rate divider to 7
-			self._bus.write_byte_data(self._address, PWR_MGMT_1, 1) # Clock source set to PLL with X axis gyroscope reference
-			self._bus.write_byte_data(self._address, CONFIG, 0)		# Disable FSYNC function
+			if self._fifo:
+				# With DLPF enabled the sample rate is 1kHz / (1 + SMPLRT_DIV)
+				self._bus.write_byte_data(self._address, SMPLRT_DIV, round(1000 / self._sample_rate) - 1)
+				self._bus.write_byte_data(self._address, PWR_MGMT_1, 1) # Clock source set to PLL with X axis gyroscope reference
+				self._bus.write_byte_data(self._address, CONFIG, 1)		# Disable FSYNC function, DLPF at 184Hz
+			else:
+				self._bus.write_byte_data(self._address, SMPLRT_DIV, 7)	# Set sample rate divider to 7
+				self._bus.write_byte_data(self._address, PWR_MGMT_1, 1) # Clock source set to PLL with X axis gyroscope reference
+				self._bus.write_byte_data(self._address, CONFIG, 0)		# Disable FSYNC function
 			self._bus.write_byte_data(self._address, INT_ENABLE, 1)	# FIFO_OFLOW_EN Enabled
 			
 			# Set gyro and accel configuration
 			self._bus.write_byte_data(self._address, GYRO_CONFIG, 24)	# 0x18 sets FS_SEL (gyro sentitivity) to ± 1000 °/s
 			self._bus.write_byte_data(self._address, ACCEL_CONFIG, 0)	# 0x00 sets AFS_SEL (accel0 sentitivity) to ± 2g
 
+			# Stream accel samples to the FIFO
+			if self._fifo:
+				self._bus.write_byte_data(self._address, FIFO_EN, ACCEL_FIFO_EN)
+				self._reset_fifo()
+
 			self._logger.info("[connect] MPU6050 initialized on address {} in bus {}".format(self._address, self._bus))
 
 		except Exception as ex:
@@ -124,36 +199,82 @@ class MPU6050_AxisController (AxisController):
 			return False
 		return True
 
-	def axis_value(self, index):
+	def bus(self):
+		return i2c_bus_key(self._busnum)
+
+	def poll(self):
+		if self._fifo:
+			self._poll_fifo()
+			return
+
+		# Read the 6 bytes of ACCEL_XOUT_H..ACCEL_ZOUT_L in one burst, so the three axis
+		# come from the same sample.
+		block = self._bus.read_i2c_block_data(self._address, ACCEL_XOUT_H, 6)
+
+		self._update_values(_word_2c(block[0], block[1]), _word_2c(block[2], block[3]), _word_2c(block[4], block[5]))
+
+	def _poll_fifo(self):
+		count_block = self._bus.read_i2c_block_data(self._address, FIFO_COUNTH, 2)
+		count = (count_block[0] << 8) + count_block[1]
+
+		# On overflow the oldest bytes are overwritten and sample alignment is lost. The count
+		# only reaches FIFO_SIZE then, as whole samples fill up to 1020 bytes. Start again from
+		# an empty FIFO and use the data registers for this cycle.
+		if count >= FIFO_SIZE:
+			self._logger.warning("[poll] FIFO overflow on address {}, resetting it.".format(self._address))
+			self._reset_fifo()
+			block = self._bus.read_i2c_block_data(self._address, ACCEL_XOUT_H, 6)
+			self._update_values(_word_2c(block[0], block[1]), _word_2c(block[2], block[3]), _word_2c(block[4], block[5]))
+			return
+
+		# Keep last values if no new sample arrived since the previous poll
+		pending = count - count % FIFO_SAMPLE
+		if pending == 0:
+			return
+		samples = pending // FIFO_SAMPLE
+
+		sum_x = sum_y = sum_z = 0
+		while pending > 0:
+			chunk = FIFO_CHUNK if pending > FIFO_CHUNK else pending
+			block = self._bus.read_i2c_block_data(self._address, FIFO_R_W, chunk)
+			pending -= chunk
+			for k in range(0, chunk, FIFO_SAMPLE):
+				accel_x = _word_2c(block[k], block[k+1])
+				accel_y = _word_2c(block[k+2], block[k+3])
+				accel_z = _word_2c(block[k+4], block[k+5])
+				sum_x += accel_x
+				sum_y += accel_y
+				sum_z += accel_z
+
+		if self._fifo_average:
+			self._update_values(sum_x / samples, sum_y / samples, sum_z / samples)
+		else:
+			self._update_values(accel_x, accel_y, accel_z)
 
-		# Check valid axis index
-		if index < 0 or index > (self._num_axis - 1):
-			return None
+	def _reset_fifo(self):
+		self._bus.write_byte_data(self._address, USER_CTRL, USER_FIFO_RESET)
+		self._bus.write_byte_data(self._address, USER_CTRL, USER_FIFO_EN)
 
+	def _update_values(self, raw_x, raw_y, raw_z):
 		# Get value for accelerometer for every axis. Normalizing with 16384 because accel sensitivity is set to ± 2g
 		# Mode info on that in https://store.invensense.com/datasheets/invensense/MPU-6050_DataSheet_V3%204.pdf (page 13)
-		accel_x = self._read_word_2c(ACCEL_XOUT_H) / 16384.0
-		accel_y = self._read_word_2c(ACCEL_YOUT_H) / 16384.0
-		accel_z = self._read_word_2c(ACCEL_ZOUT_H) / 16384.0
-
-		# Apply normalization function. Expand range.
-		if index == 0:
-			read_value = _get_x_rotation(accel_x, accel_y, accel_z)
-		elif index == 1:
-			read_value = _get_y_rotation(accel_x, accel_y, accel_z)
-		else:
-			read_value = _get_z_rotation(accel_x, accel_y, accel_z)
-		
-		translated_value = self._post_calibration_min + ((read_value) * (self._post_calibration_max - self._post_calibration_min)) / (self._calibration_max - self._calibration_min)
+		accel_x = raw_x / 16384.0
+		accel_y = raw_y / 16384.0
+		accel_z = raw_z / 16384.0
 
-		# Apply zero zone percentage.
-		zero_min = -(self._post_calibration_max - self._post_calibration_min) * self._calibration_threshold
-		zero_max = -zero_min
+		rotations = self._rotations
+		rotations[0] = _get_x_rotation(accel_x, accel_y, accel_z)
+		rotations[1] = _get_y_rotation(accel_x, accel_y, accel_z)
+		rotations[2] = _get_z_rotation(accel_x, accel_y, accel_z)
+		self._calibration.apply(rotations, self._values)
 
-		if zero_min < translated_value < zero_max:
-			return 0
-		else:
-			return translated_value
+	def axis_value(self, index):
+
+		# Check valid axis index
+		if index < 0 or index > (self._num_axis - 1):
+			return None
+
+		return self._values[index]
 
 	# SMBUS auxiliary functions 
 	def _read_byte(self, reg):
@@ -166,11 +287,5 @@ class MPU6050_AxisController (AxisController):
 		return value
 	
 	def _read_word_2c(self, reg):
-		val = self._read_word(reg)
-
-		# Transform it in a signed number
-		if (val >= 0x8000):
-			return -((65535 - val) + 1)
-		else:
-			return val
+		return _word_2c(self._read_byte(reg), self._read_byte(reg+1))
 
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+    Simulated AxisController for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import math
+import time
+import logging
+
+from array import array
+
+from .AxisManager import AxisController
+from BusManager import get_simulated_bus, simulated_bus_key
+
+module_logger = logging.getLogger('Joyspyck.AxisControllers.Simulated_AxisController')
+
+# Simulated axis device, used to benchmark the update path without hardware.
+#
+# Every poll does `transactions` transfers on a simulated bus (i2c, smbus, usb or none)
+# and computes all the axis values from a sine wave, so consecutive polls return
+# different values and the axis are emitted.
+class Simulated_AxisController (AxisController):
+
+	def __init__(self, config):
+		super().__init__(config)
+
+		self._logger = logging.getLogger('Joyspyck.AxisControllers.Simulated_AxisController')
+
+		# Set defaults in config if keys not present
+		if 'num_axis' not in self._config['options']:
+			self._config['options']['num_axis'] = max(self._num_events, 1)
+
+		self._num_axis = int(self._config['options']['num_axis'])
+
+		if 'bus' not in self._config['options']:
+			self._config['options']['bus'] = 'i2c'
+
+		self._bus_kind = self._config['options']['bus']
+
+		if 'busnum' not in self._config['options']:
+			self._config['options']['busnum'] = 0
+
+		self._busnum = int(self._config['options']['busnum'])
+
+		# Microseconds per transaction, by default the one of the bus kind
+		if 'latency' not in self._config['options']:
+			self._config['options']['latency'] = None
+
+		self._latency = self._config['options']['latency'] \
+		if self._config['options']['latency'] is None \
+		else float(self._config['options']['latency'])
+
+		# Transactions per poll, by default one per axis like a multiplexed ADC
+		if 'transactions' not in self._config['options']:
+			self._config['options']['transactions'] = self._num_axis
+
+		self._transactions = int(self._config['options']['transactions'])
+
+		if 'frequency' not in self._config['options']:
+			self._config['options']['frequency'] = 1.0
+
+		self._frequency = float(self._config['options']['frequency'])
+
+		if self._num_axis < self._num_events:
+			raise ValueError("Simulated {0} maps more axis than num_axis.".format(self._config['name']))
+
+		self._values = array('l', [0] * self._num_axis)
+		self._phases = [2 * math.pi * i / self._num_axis for i in range(self._num_axis)]
+		self._polls = 0
+		self._sim_bus = None
+
+	def connect(self):
+		try:
+			self._sim_bus = get_simulated_bus(self._bus_kind, self._busnum, self._latency)
+		except ValueError as ex:
+			self._logger.error("[connect] {0}".format(str(ex)))
+			return False
+		return True
+
+	def poll(self):
+		self._sim_bus.transfer(self._transactions)
+		self._polls += 1
+
+		angle = 2 * math.pi * self._frequency * time.monotonic()
+		amplitude = self._post_calibration_max
+		values = self._values
+		for i, phase in enumerate(self._phases):
+			values[i] = int(amplitude * math.sin(angle + phase))
+
+	def axis_value(self, index):
+		if index < 0 or index > (self._num_axis - 1):
+			return None
+		return self._values[index]
+
+	# Number of polls done since the controller was created
+	def polls(self):
+		return self._polls
+
+	def bus(self):
+		return simulated_bus_key(self._bus_kind, self._busnum)
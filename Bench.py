@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+    Bench for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import gc
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+import tracemalloc
+import Joystick
+
+from array import array
+from Config import load_config
+from Scheduler import PeriodicScheduler
+from OutputSinks import NullSink, RecorderSink, DEFAULT_MAX_RECORDS
+from AsyncRuntime import AsyncRuntime
+from Joyspyck import UpdateWorker, UpdatingThreadType, create_bus_workers
+
+# Possible returns of the benchmark
+JSON_FILE_NOT_OPEN = -1
+JSON_NOT_LOAD = -3
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "examples", "example_Simulated.json")
+
+# Stages of the update path measured by the stage benchmark
+STAGES = ('update', 'update_axis', 'update_buttons')
+
+logger = logging.getLogger('Joyspyck.Bench')
+
+
+# Load the joysticks of the config file, with null output sinks. If bus is given, it replaces
+# the bus of all Simulated controllers.
+def load_joysticks(config_file, bus=None, output='null', max_records=DEFAULT_MAX_RECORDS):
+	data = load_config(config_file)
+
+	joysticks = []
+	sinks = []
+	for joystick_conf in data:
+		if bus is not None:
+			for controller_conf in joystick_conf.get("axisControllers", []) + joystick_conf.get("buttonControllers", []):
+				if controller_conf["type"] == "Simulated":
+					controller_conf["options"]["bus"] = bus
+		joystick = Joystick.Joystick(joystick_conf, output=output, max_records=max_records)
+		joysticks.append(joystick)
+		sinks.append(joystick.output())
+	return joysticks, sinks
+
+# Events and SYN_REPORTs received by a sink, when the sink keeps track of them
+def sink_counts(sink):
+	if isinstance(sink, NullSink):
+		return sink.events, sink.syns
+	if isinstance(sink, RecorderSink):
+		syns = sum(1 for record in sink.records if record[3])
+		return len(sink.records) - syns, syns
+	return 0, 0
+
+def percentile(sorted_values, q):
+	return sorted_values[min(len(sorted_values) - 1, int(q * (len(sorted_values) - 1) + 0.5))]
+
+# Call stage on every joystick `polls` times. Returns the duration of every call in ns.
+def time_stage(joysticks, stage, polls):
+	durations = array('q', [0] * polls)
+	calls = [getattr(joystick, stage) for joystick in joysticks]
+	clock = time.perf_counter_ns
+	for i in range(polls):
+		start = clock()
+		for call in calls:
+			call()
+		durations[i] = clock() - start
+	return durations
+
+# Memory blocks left allocated and peak of traced memory per call of stage. Blocks are
+# counted with the interpreter counter, the peak is measured in a second run with
+# tracemalloc, which slows down the calls.
+def allocations_stage(joysticks, stage, polls):
+	calls = [getattr(joystick, stage) for joystick in joysticks]
+
+	gc.collect()
+	gc.disable()
+	try:
+		blocks = sys.getallocatedblocks()
+		for _ in range(polls):
+			for call in calls:
+				call()
+		blocks = sys.getallocatedblocks() - blocks
+	finally:
+		gc.enable()
+
+	tracemalloc.start()
+	try:
+		for call in calls:
+			call()
+		start, _ = tracemalloc.get_traced_memory()
+		tracemalloc.reset_peak()
+		for _ in range(polls):
+			for call in calls:
+				call()
+		_, peak = tracemalloc.get_traced_memory()
+	finally:
+		tracemalloc.stop()
+
+	return blocks / polls, peak - start
+
+# Stage benchmark: run every stage back to back, without waits between calls
+def bench_stages(joysticks, sinks, polls, warmup):
+	print("{:<16}{:>10}{:>10}{:>10}{:>10}{:>10}{:>12}{:>12}{:>10}".format(
+		"stage", "polls/s", "p50 us", "p90 us", "p99 us", "max us", "blocks/poll", "peak bytes", "events"))
+	for stage in STAGES:
+		time_stage(joysticks, stage, warmup)
+		events = sum(sink_counts(sink)[0] for sink in sinks)
+		durations = time_stage(joysticks, stage, polls)
+		events = sum(sink_counts(sink)[0] for sink in sinks) - events
+		blocks, peak = allocations_stage(joysticks, stage, polls)
+
+		values = sorted(durations)
+		total = sum(values)
+		print("{:<16}{:>10.0f}{:>10.1f}{:>10.1f}{:>10.1f}{:>10.1f}{:>12.2f}{:>12}{:>10}".format(
+			stage, polls * 1000000000 / total if total else 0,
+			percentile(values, 0.5) / 1000, percentile(values, 0.9) / 1000,
+			percentile(values, 0.99) / 1000, values[-1] / 1000, blocks, peak, events))
+
+# Runtime benchmark: run the joysticks as Joyspyck would for `duration` seconds
+def bench_runtime(joysticks, sinks, runtime, duration, wait_time, absolute_sleep):
+	polls = _controller_polls(joysticks)
+	counts = [sink_counts(sink) for sink in sinks]
+	stats = []
+
+	start = time.monotonic()
+	if runtime == 'single':
+		scheduler = PeriodicScheduler(wait_time, absolute_sleep)
+		scheduler.start()
+		while time.monotonic() - start < duration:
+			for joystick in joysticks:
+				joystick.update()
+			scheduler.wait()
+		stats.append(("single", scheduler.stats()))
+
+	elif runtime == 'asyncio':
+		async_runtime = AsyncRuntime(joysticks)
+		timer = threading.Timer(duration, async_runtime.stop)
+		timer.start()
+		async_runtime.run()
+		stats.append(("asyncio", async_runtime.stats()))
+
+	else:
+		if runtime == 'bus':
+			workers = create_bus_workers(joysticks, absolute_sleep)
+		else:
+			workers = []
+			for i, joystick in enumerate(joysticks):
+				if joystick.num_axis_controllers() > 0:
+					workers.append(UpdateWorker(joystick, UpdatingThreadType.AXIS_THREAD, absolute_sleep,
+						name="joystick{}-axis".format(i)))
+				if joystick.num_button_controllers() > 0:
+					workers.append(UpdateWorker(joystick, UpdatingThreadType.BUTTON_THREAD, absolute_sleep,
+						name="joystick{}-buttons".format(i)))
+		for worker in workers:
+			worker.start()
+		time.sleep(duration)
+		for worker in workers:
+			worker.stop()
+		for worker in workers:
+			worker.join()
+			stats.append((worker.name, worker.scheduler.stats()))
+	elapsed = time.monotonic() - start
+
+	print("runtime {} during {:.2f} s".format(runtime, elapsed))
+	for name, count in _controller_polls(joysticks):
+		print("  {:<40}{:>10.1f} polls/s".format(name, (count - dict(polls)[name]) / elapsed))
+	for i, sink in enumerate(sinks):
+		events, syns = sink_counts(sink)
+		print("  joystick{:<31}{:>10.1f} events/s {:>10.1f} syn/s".format(
+			i, (events - counts[i][0]) / elapsed, (syns - counts[i][1]) / elapsed))
+	for name, stat in stats:
+		print("  {:<40}{}".format(name, stat))
+
+# Polls done by every controller that counts them (Simulated controllers)
+def _controller_polls(joysticks):
+	polls = []
+	for joystick in joysticks:
+		for controller in joystick.axis_controllers() + joystick.button_controllers():
+			if hasattr(controller, 'polls'):
+				polls.append((controller.name(), controller.polls()))
+	return polls
+
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description='Joyspyck benchmark')
+	parser.add_argument('config_file', metavar='JSON Config file', nargs='?', default=DEFAULT_CONFIG,
+						help='JSON containing the Joystick configuration. Simulated controllers by default.')
+	parser.add_argument('--bus', choices=['i2c', 'smbus', 'usb', 'none'],
+						help='Simulated bus of all Simulated controllers, "none" measures the CPU cost only.')
+	parser.add_argument('--output', choices=['null', 'recorder', 'uinput', 'raw'], default='null',
+						help='Output sink of the joysticks, null by default.')
+	parser.add_argument('--max_records', type=int, default=DEFAULT_MAX_RECORDS,
+						help='Events kept by the recorder output, only the kept ones are counted.')
+	parser.add_argument('--polls', type=int, default=2000,
+						help='Calls of every stage in the stage benchmark.')
+	parser.add_argument('--warmup', type=int, default=100,
+						help='Calls of every stage before measuring.')
+	parser.add_argument('--runtime', choices=['single', 'bus', 'joystick', 'asyncio'],
+						help='Run the joysticks with a Joyspyck runtime instead of the stage benchmark.')
+	parser.add_argument('--duration', type=float, default=5.0,
+						help='Seconds to run the runtime benchmark.')
+	parser.add_argument('--wait_time', type=float, default=0.01,
+						help='Period of the single threaded runtime.')
+	parser.add_argument('--absolute_sleep', action='store_true', required=False,
+						help='Sleep until each polling deadline with clock_nanosleep.')
+	parser.add_argument('-v', action='store_true', required=False,
+						help='Activate verbose.')
+
+	args = parser.parse_args()
+
+	log_formatter = logging.Formatter('%(asctime)s.%(msecs)06d [%(name)s] [%(levelname)-5.5s] %(message)s', datefmt='%H:%M:%S')
+	logging.getLogger('Joyspyck').setLevel(logging.DEBUG if args.v else logging.WARNING)
+	console_handler = logging.StreamHandler()
+	console_handler.setFormatter(log_formatter)
+	logging.getLogger('Joyspyck').addHandler(console_handler)
+
+	try:
+		bench_joysticks, bench_sinks = load_joysticks(args.config_file, args.bus, args.output, args.max_records)
+	except IOError:
+		logger.error("[main] Could not open config file.")
+		exit(JSON_FILE_NOT_OPEN)
+	except Exception as ex:
+		logger.error("[main] Exception when loading config json: {0}".format(str(ex)))
+		exit(JSON_NOT_LOAD)
+
+	if args.runtime:
+		bench_runtime(bench_joysticks, bench_sinks, args.runtime, args.duration, args.wait_time, args.absolute_sleep)
+	else:
+		bench_stages(bench_joysticks, bench_sinks, args.polls, args.warmup)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+    BusManager for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+import logging
+import threading
+
+module_logger = logging.getLogger('Joyspyck.BusManager')
+
+# Bus number of the i2c pins exposed by board.SCL and board.SDA
+DEFAULT_I2C_BUS = 1
+
+# Shared bus handles, keyed by bus number. Every controller on the same bus uses
+# the same handle instead of opening its own.
+_i2c_handles = {}
+_smbus_handles = {}
+_simulated_handles = {}
+_handles_lock = threading.Lock()
+
+# Locks serializing the use of each bus, keyed by bus key, see get_bus_lock
+_bus_locks = {}
+
+# Key identifying a physical i2c bus, used to group the controllers that must be
+# polled from the same worker.
+def i2c_bus_key(busnum):
+	return ('i2c', busnum)
+
+# Get the shared busio compatible handle of /dev/i2c-<busnum>
+def get_i2c(busnum=DEFAULT_I2C_BUS):
+	with _handles_lock:
+		if busnum not in _i2c_handles:
+			if busnum == DEFAULT_I2C_BUS:
+				import board
+				import busio
+				_i2c_handles[busnum] = busio.I2C(board.SCL, board.SDA)
+			else:
+				from adafruit_extended_bus import ExtendedI2C
+				_i2c_handles[busnum] = ExtendedI2C(busnum)
+			module_logger.info("[get_i2c] Opened i2c bus {}".format(busnum))
+		return _i2c_handles[busnum]
+
+# Get the shared smbus handle of /dev/i2c-<busnum>
+def get_smbus(busnum=DEFAULT_I2C_BUS):
+	with _handles_lock:
+		if busnum not in _smbus_handles:
+			import smbus
+			_smbus_handles[busnum] = smbus.SMBus(busnum)
+			module_logger.info("[get_smbus] Opened smbus {}".format(busnum))
+		return _smbus_handles[busnum]
+
+# Get the lock of the bus with the given key. It is held around every poll of the
+# controllers on the bus and around their reconnects, so a reconnect from another thread
+# never interleaves with the transfers of the bus worker. Controllers without a bus (key
+# None) get a lock of their own.
+def get_bus_lock(key):
+	if key is None:
+		return threading.Lock()
+	with _handles_lock:
+		if key not in _bus_locks:
+			_bus_locks[key] = threading.Lock()
+		return _bus_locks[key]
+
+# All the bus handles opened so far
+def bus_handles():
+	with _handles_lock:
+		return list(_i2c_handles.values()) + list(_smbus_handles.values()) + list(_simulated_handles.values())
+
+# Time of one transaction on each kind of simulated bus, in microseconds: roughly a
+# register read on a 100 kHz i2c bus, an smbus word read and a full speed USB frame.
+SIMULATED_LATENCY_US = {'i2c': 250, 'smbus': 300, 'usb': 1000, 'none': 0}
+
+
+# Key identifying a simulated bus
+def simulated_bus_key(kind, busnum):
+	return ('sim', kind, busnum)
+
+# Simulated bus used by the Simulated controllers. Transactions take a fixed time and
+# are serialized like in a real bus adapter. The wait releases the GIL, as real bus
+# I/O does.
+class SimulatedBus (object):
+
+	def __init__(self, kind, busnum, latency_us=None):
+		if kind not in SIMULATED_LATENCY_US:
+			raise ValueError("Simulated bus {0} is not one of {1}.".format(kind, ", ".join(SIMULATED_LATENCY_US)))
+		self.kind = kind
+		self.busnum = busnum
+		self.latency = (SIMULATED_LATENCY_US[kind] if latency_us is None else latency_us) / 1000000
+		self.transactions = 0
+		self._lock = threading.Lock()
+
+	def transfer(self, count=1):
+		with self._lock:
+			self.transactions += count
+			if self.latency > 0:
+				time.sleep(self.latency * count)
+
+# Get the shared simulated bus of the given kind and number. The latency of the first
+# controller opening the bus is used.
+def get_simulated_bus(kind, busnum=0, latency_us=None):
+	with _handles_lock:
+		key = simulated_bus_key(kind, busnum)
+		if key not in _simulated_handles:
+			_simulated_handles[key] = SimulatedBus(kind, busnum, latency_us)
+		return _simulated_handles[key]
@@ -23,22 +23,31 @@
 """
 
 from UInputEvents import UInputEvents
+from .Debounce import get_debouncer, DEBOUNCE_MODES, DEFAULT_DEBOUNCE_SAMPLES
 
-# Factory to generate ButtonControllers depending on the supplied type.
-def get_button_controller(controller_config):
+# Factory to generate ButtonControllers depending on the supplied type. With connect False
+# the controller is only created, and connect must be called before using it.
+def get_button_controller(controller_config, connect=True):
 	ret = None
 
-	if controller_config["type"] == "MCP23017":
+	# Run the controller in its own process, see ProcessController
+	if controller_config.get("isolated", False):
+		from ProcessController import ProcessButtonController
+		ret = ProcessButtonController(controller_config)
+	elif controller_config["type"] == "MCP23017":
 		from .MCP23017_ButtonController import MCP23017_ButtonController
 		ret = MCP23017_ButtonController(controller_config)
-	if controller_config["type"] == "FTDI":
+	elif controller_config["type"] == "FTDI":
 		from .FTDI_ButtonController import FTDI_ButtonController
 		ret = FTDI_ButtonController(controller_config)
 	elif controller_config["type"] == "Dummy":
 		from .Dummy_ButtonController import Dummy_ButtonController
 		ret = Dummy_ButtonController(controller_config)
+	elif controller_config["type"] == "Simulated":
+		from .Simulated_ButtonController import Simulated_ButtonController
+		ret = Simulated_ButtonController(controller_config)
 
-	if ret is not None and ret.connect():
+	if ret is not None and (not connect or ret.connect()):
 		return ret
 	else:
 		return None
@@ -71,9 +80,16 @@ class ButtonController (object):
             if event in UInputEvents:
                 self._events.append(UInputEvents[event])
             else:
-                raise ValueError("Event {0} is not a valid UInputEvent".format(event))
+                raise ValueError(UInputEvents.invalid_message(event))
 
         self._num_events = len(self._events)
+        self._mapped_mask = (1 << self._num_events) - 1
+
+        # Debounce filter applied by the joystick to the masks read, see Debounce
+        self._debounce = self._config.get('debounce')
+        self._debounce_samples = int(self._config.get('debounceSamples', DEFAULT_DEBOUNCE_SAMPLES))
+        if self._debounce is not None and self._debounce not in DEBOUNCE_MODES:
+            raise ValueError("ButtonController {0} debounce must be one of {1}.".format(self._config['name'], ", ".join(DEBOUNCE_MODES)))
 
     def num_buttons(self):
         return self._num_buttons
@@ -81,14 +97,58 @@ class ButtonController (object):
     def num_mapped_buttons(self):
         return self._num_events
 
+    # Called once per update cycle before any button_status call. Controllers able
+    # to read all their inputs at once should do it here and serve button_status
+    # from that snapshot.
+    def poll(self):
+        pass
+
     def button_status(self, index):
         return ButtonStatus.UNKNOWN
 
+    # Status of all mapped buttons packed in an int, bit N set when button N is pressed.
+    # Controllers reading the whole port in poll should override it with bitwise operations.
+    def buttons_mask(self):
+        mask = 0
+        for i in range(self._num_events):
+            if self.button_status(i) == ButtonStatus.PRESSED:
+                mask |= 1 << i
+        return mask
+
+    # New debounce filter for the buttons of the controller, None when they are not debounced
+    def create_debouncer(self):
+        if self._debounce is None:
+            return None
+        return get_debouncer(self._debounce, self._debounce_samples, self._num_events)
+
+    def name(self):
+        return self._config['name']
+
     def type(self):
         return self._config['type']
 
+    # File descriptor that becomes readable when the device has new data (for example a
+    # GPIO edge of its interrupt line). Controllers with an fd are polled when it is ready
+    # instead of periodically. None for polled controllers.
+    def event_fd(self):
+        return None
+
+    # Discard the pending data of event_fd without reading the device. Called instead of
+    # poll while the controller is offline, so its fd does not stay ready.
+    def drain_events(self):
+        pass
+
+    # Hashable key of the physical bus the device is connected to. Controllers sharing
+    # a bus are polled from the same worker. None when the device has no bus.
+    def bus(self):
+        return None
+
     def get_events(self):
         return self._events
 
     def connect(self):
         return True
+
+    # Release the device. Called when the controller is removed from a running joystick.
+    def close(self):
+        pass
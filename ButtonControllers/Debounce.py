@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+    Button debouncing for Joyspyck
+
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+DEBOUNCE_MODES = ('consecutive', 'integrator')
+
+# Default number of samples of the debounce filters
+DEFAULT_DEBOUNCE_SAMPLES = 4
+
+# Factory to generate debounce filters depending on the supplied mode
+def get_debouncer(mode, samples, num_buttons):
+	if mode == 'consecutive':
+		return ConsecutiveDebouncer(samples, num_buttons)
+	elif mode == 'integrator':
+		return IntegratorDebouncer(samples, num_buttons)
+	raise ValueError("Debounce {0} is not one of {1}.".format(mode, ", ".join(DEBOUNCE_MODES)))
+
+# Debouncers filter the button masks read from a controller (bit N set when button N is
+# pressed) and return the debounced mask. All the buttons are filtered at once with
+# bitwise operations on the packed masks, so the cost does not depend on the number of
+# buttons. Every button starts released, unless start is called with the buttons to start
+# pressed.
+
+# A button changes when its last `samples` samples agree. Keeps a ring with the last
+# masks: the buttons pressed in all of them are the bits set in their AND, and the
+# buttons released in all of them the bits clear in their OR.
+class ConsecutiveDebouncer (object):
+
+	def __init__(self, samples, num_buttons):
+		if samples < 1:
+			raise ValueError("Debounce samples must be at least 1.")
+		self._full = (1 << num_buttons) - 1
+		self._samples = [0] * samples
+		self._num_samples = samples
+		self._index = 0
+		self._state = 0
+
+	# Start as if mask had been read for the last `samples` samples
+	def start(self, mask):
+		mask &= self._full
+		for i in range(self._num_samples):
+			self._samples[i] = mask
+		self._state = mask
+
+	def update(self, mask):
+		samples = self._samples
+		samples[self._index] = mask
+		self._index = (self._index + 1) % self._num_samples
+
+		pressed = released = mask
+		for sample in samples:
+			pressed &= sample
+			released |= sample
+		self._state = (self._state | pressed) & released & self._full
+		return self._state
+
+# Every button has a counter going up on pressed samples and down on released ones,
+# saturating at 0 and `samples`. A button is pressed when its counter reaches `samples`
+# and released when it reaches 0, so isolated glitches are absorbed even while the
+# contact is still bouncing.
+#
+# The counters are bit-sliced (vertical counters): plane j holds bit j of the counter of
+# every button, so all the counters are incremented or decremented with a ripple of
+# bitwise operations over the planes.
+class IntegratorDebouncer (object):
+
+	def __init__(self, samples, num_buttons):
+		if samples < 1:
+			raise ValueError("Debounce samples must be at least 1.")
+		self._full = (1 << num_buttons) - 1
+		self._planes = [0] * samples.bit_length()
+		self._max_planes = tuple(self._full if samples >> j & 1 else 0 for j in range(samples.bit_length()))
+		self._at_max = 0
+		self._at_zero = self._full
+		self._state = 0
+
+	# Start with the counters of the buttons in mask saturated up and the rest at 0
+	def start(self, mask):
+		mask &= self._full
+		for j, max_plane in enumerate(self._max_planes):
+			self._planes[j] = max_plane & mask
+		self._at_max = mask
+		self._at_zero = ~mask & self._full
+		self._state = mask
+
+	def update(self, mask):
+		full = self._full
+		planes = self._planes
+
+		# Count up the pressed buttons and down the released ones, but the saturated
+		up = mask & ~self._at_max & full
+		down = ~mask & ~self._at_zero & full
+		for j, plane in enumerate(planes):
+			planes[j] = plane ^ up ^ down
+			up &= plane
+			down &= ~plane
+
+		at_max = at_zero = full
+		for plane, max_plane in zip(planes, self._max_planes):
+			at_max &= ~(plane ^ max_plane)
+			at_zero &= ~plane
+		self._at_max = at_max
+		self._at_zero = at_zero
+
+		self._state = (self._state | at_max) & ~at_zero & full
+		return self._state
@@ -40,3 +40,6 @@ class Dummy_ButtonController (ButtonController):
         if index < 0 or index > (self._num_buttons - 1):
             return None
         return random.randint(0, 1)
+
+    def buttons_mask(self):
+        return random.getrandbits(self._num_events) if self._num_events > 0 else 0
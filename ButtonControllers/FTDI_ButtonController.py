@@ -65,8 +65,16 @@ class FTDI_ButtonController (ButtonController):
 	def num_buttons(self):
 		return self._num_buttons
 
-	def button_status(self, index):
+	def bus(self):
+		return ('ftdi', self._ftdi_url)
+
+	def poll(self):
+		# Read the whole GPIO port once. All buttons of this cycle are decoded from it.
 		self._buttons = self._gpio.read()
 
+	def button_status(self, index):
 		# Buttons are PULL DOWN, pressed when connected to GND, low logic level.
 		return ButtonStatus.UNPRESSED if (self._buttons) >> index & 0x01 else ButtonStatus.PRESSED
+
+	def buttons_mask(self):
+		return ~self._buttons & self._mapped_mask
@@ -22,15 +22,25 @@
 	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import board
-import busio
 import logging
 import digitalio
 
 from adafruit_mcp230xx.mcp23017 import MCP23017
+from adafruit_bus_device.i2c_device import I2CDevice
 from .ButtonManager import ButtonStatus, ButtonController
+from BusManager import get_i2c, i2c_bus_key, DEFAULT_I2C_BUS
+from GpioEdge import GpioEdge, Edge
 
 module_logger = logging.getLogger('Joyspyck.ButtonControllers.MCP23017_ButtonController')
+
+# MCP23017 registers used in interrupt mode (IOCON.BANK = 0, A/B pairs are sequential)
+# http://ww1.microchip.com/downloads/en/devicedoc/20001952c.pdf (page 16)
+GPINTENA = 0x04
+INTCONA  = 0x08
+IOCON    = 0x0A
+GPIOA    = 0x12
+
+IOCON_MIRROR = 0x40	# INTA and INTB are internally connected
 class MCP23017_ButtonController (ButtonController):
 
 	def __init__(self, config):
@@ -41,6 +51,13 @@ class MCP23017_ButtonController (ButtonController):
 		# Specific of that MCP
 		self._num_buttons = 16
 
+		if 'busnum' not in self._config['options']:
+			self._config['options']['busnum'] = DEFAULT_I2C_BUS
+
+		self._busnum = self._config['options']['busnum'] \
+			if isinstance(self._config['options']['busnum'], int) \
+			else int(self._config['options']['busnum'], 10)
+
 		if 'address' not in self._config['options']:
 			self._config['options']['address'] = 0x20
 
@@ -48,17 +65,61 @@ class MCP23017_ButtonController (ButtonController):
 			if isinstance(self._config['options']['address'], int) \
 			else int(self._config['options']['address'], 16)
 
+		# Bulk read mode reads GPIOA and GPIOB in one transaction per poll
+		if 'bulk_read' not in self._config['options']:
+			self._config['options']['bulk_read'] = True
+
+		self._bulk_read = bool(self._config['options']['bulk_read'])
+
+		# Interrupt mode. INTA (mirrored with INTB) wired to a GPIO line: the ports are only
+		# read when some input changes. Needs bulk_read.
+		if 'interrupt_chip' not in self._config['options']:
+			self._config['options']['interrupt_chip'] = '/dev/gpiochip0'
+
+		self._interrupt_chip = self._config['options']['interrupt_chip']
+
+		if 'interrupt_line' not in self._config['options']:
+			self._config['options']['interrupt_line'] = None
+
+		self._interrupt_line = self._config['options']['interrupt_line'] \
+			if self._config['options']['interrupt_line'] is None or isinstance(self._config['options']['interrupt_line'], int) \
+			else int(self._config['options']['interrupt_line'], 10)
+
+		if self._interrupt_line is not None and not self._bulk_read:
+			raise ValueError("MCP23017 {0} interrupt mode needs bulk_read.".format(self._config['name']))
+
+		# Debounce filters need a sample on every tick, interrupts only give the changes
+		if self._interrupt_line is not None and self._debounce is not None:
+			raise ValueError("MCP23017 {0} interrupt mode can not be debounced.".format(self._config['name']))
+
+		self._interrupt = None
+		self._register_buffer = bytearray(3)
+
+		# Last GPIO port state read in bulk mode. All pins pulled up (unpressed).
+		self._port_state = 0xFFFF
+
 	def connect(self):
 		try:
-			# Initialize MCP object
-			self._i2c = busio.I2C(board.SCL, board.SDA)
+			# Initialize MCP object on the shared bus handle
+			self._i2c = get_i2c(self._busnum)
 			self._mcp = MCP23017(self._i2c, address=self._address)
 
-			self._buttons = []
-			for i in range(0, self._num_buttons):
-				self._buttons.append(self._mcp.get_pin(i))
-				self._buttons[i].direction = digitalio.Direction.INPUT
-				self._buttons[i].pull = digitalio.Pull.UP
+			if self._bulk_read:
+				# Set all pins as inputs with pull-up using the 16 bit registers
+				self._mcp.iodir = 0xFFFF
+				self._mcp.gppu = 0xFFFF
+
+				if self._interrupt_line is not None:
+					self._setup_interrupt()
+
+				# Reading the ports also clears any pending interrupt
+				self._port_state = self._mcp.gpio
+			else:
+				self._buttons = []
+				for i in range(0, self._num_buttons):
+					self._buttons.append(self._mcp.get_pin(i))
+					self._buttons[i].direction = digitalio.Direction.INPUT
+					self._buttons[i].pull = digitalio.Pull.UP
 
 			self._logger.info("[connect] MCP23017 initialized on address {}".format(self._address))
 
@@ -67,10 +128,62 @@ class MCP23017_ButtonController (ButtonController):
 			return False
 		return True
 
+	def close(self):
+		if self._interrupt is not None:
+			self._interrupt.close()
+			self._interrupt = None
+
 	def num_buttons(self):
 		return self._num_buttons
 
+	def bus(self):
+		return i2c_bus_key(self._busnum)
+
+	def event_fd(self):
+		return self._interrupt.fileno() if self._interrupt is not None else None
+
+	def drain_events(self):
+		if self._interrupt is not None:
+			self._interrupt.drain()
+
+	def poll(self):
+		# Consume the edges before reading: a change after the read raises a new one
+		if self._interrupt is not None:
+			self._interrupt.drain()
+
+		# Read GPIOA and GPIOB in a single 2 byte transaction. Pin N is bit N.
+		if self._bulk_read:
+			self._port_state = self._mcp.gpio
+
+	def _setup_interrupt(self):
+		if self._interrupt is None:
+			self._interrupt = GpioEdge(self._interrupt_chip, self._interrupt_line, Edge.FALLING)
+			self._interrupt.open()
+
+		# INT pins active low, push-pull, mirrored. Interrupt on any change of a mapped input.
+		device = I2CDevice(self._i2c, self._address)
+		self._write_register(device, IOCON, IOCON_MIRROR, 1)
+		self._write_register(device, INTCONA, 0x0000, 2)
+		self._write_register(device, GPINTENA, self._mapped_mask, 2)
+		self._logger.info("[connect] MCP23017 on address {} interrupts on line {} of {}".format(
+			self._address, self._interrupt_line, self._interrupt_chip))
+
+	def _write_register(self, device, register, value, size):
+		self._register_buffer[0] = register
+		self._register_buffer[1] = value & 0xFF
+		self._register_buffer[2] = (value >> 8) & 0xFF
+		with device as i2c:
+			i2c.write(self._register_buffer, end=size + 1)
+
 	def button_status(self, index):
 		if index >=0 and index < self._num_buttons:
+			if self._bulk_read:
+				return ButtonStatus.UNPRESSED if (self._port_state >> index) & 0x01 else ButtonStatus.PRESSED
 			return  ButtonStatus.UNPRESSED if self._buttons[index].value else ButtonStatus.PRESSED
 		return ButtonStatus.UNKNOWN
+
+	def buttons_mask(self):
+		# Inputs are pulled up, a pressed button reads as 0
+		if self._bulk_read:
+			return ~self._port_state & self._mapped_mask
+		return super().buttons_mask()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+    Simulated ButtonController for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import logging
+
+from .ButtonManager import ButtonController, ButtonStatus
+from BusManager import get_simulated_bus, simulated_bus_key
+
+module_logger = logging.getLogger('Joyspyck.ButtonControllers.Simulated_ButtonController')
+
+# Simulated button device, used to benchmark the update path without hardware.
+#
+# Every poll does `transactions` transfers on a simulated bus (i2c, smbus, usb or none).
+# Every `change_every` polls, `changes` buttons are toggled, walking all the mapped buttons.
+class Simulated_ButtonController (ButtonController):
+
+	def __init__(self, config):
+		super().__init__(config)
+
+		self._logger = logging.getLogger('Joyspyck.ButtonControllers.Simulated_ButtonController')
+
+		# Set defaults in config if keys not present
+		if 'num_buttons' not in self._config['options']:
+			self._config['options']['num_buttons'] = 16
+
+		self._num_buttons = int(self._config['options']['num_buttons'])
+
+		if 'bus' not in self._config['options']:
+			self._config['options']['bus'] = 'i2c'
+
+		self._bus_kind = self._config['options']['bus']
+
+		if 'busnum' not in self._config['options']:
+			self._config['options']['busnum'] = 0
+
+		self._busnum = int(self._config['options']['busnum'])
+
+		# Microseconds per transaction, by default the one of the bus kind
+		if 'latency' not in self._config['options']:
+			self._config['options']['latency'] = None
+
+		self._latency = self._config['options']['latency'] \
+		if self._config['options']['latency'] is None \
+		else float(self._config['options']['latency'])
+
+		# Transactions per poll, by default one bulk read of the port
+		if 'transactions' not in self._config['options']:
+			self._config['options']['transactions'] = 1
+
+		self._transactions = int(self._config['options']['transactions'])
+
+		if 'change_every' not in self._config['options']:
+			self._config['options']['change_every'] = 1
+
+		self._change_every = max(1, int(self._config['options']['change_every']))
+
+		if 'changes' not in self._config['options']:
+			self._config['options']['changes'] = 1
+
+		self._changes = int(self._config['options']['changes'])
+
+		if self._num_buttons < self._num_events:
+			raise ValueError("Simulated {0} maps more buttons than num_buttons.".format(self._config['name']))
+
+		self._mask = 0
+		self._next_button = 0
+		self._polls = 0
+		self._sim_bus = None
+
+	def connect(self):
+		try:
+			self._sim_bus = get_simulated_bus(self._bus_kind, self._busnum, self._latency)
+		except ValueError as ex:
+			self._logger.error("[connect] {0}".format(str(ex)))
+			return False
+		return True
+
+	def poll(self):
+		self._sim_bus.transfer(self._transactions)
+		self._polls += 1
+
+		if self._num_events > 0 and self._polls % self._change_every == 0:
+			for _ in range(self._changes):
+				self._mask ^= 1 << self._next_button
+				self._next_button = (self._next_button + 1) % self._num_events
+
+	def num_buttons(self):
+		return self._num_buttons
+
+	def button_status(self, index):
+		if index < 0 or index > (self._num_buttons - 1):
+			return None
+		return ButtonStatus.PRESSED if self._mask >> index & 1 else ButtonStatus.UNPRESSED
+
+	def buttons_mask(self):
+		return self._mask
+
+	# Number of polls done since the controller was created
+	def polls(self):
+		return self._polls
+
+	def bus(self):
+		return simulated_bus_key(self._bus_kind, self._busnum)
@@ -0,0 +1,411 @@
+# -*- coding: utf-8 -*-
+"""
+    Config compiler for Joyspyck
+
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+import copy
+import json
+import hashlib
+import logging
+
+from BusManager import DEFAULT_I2C_BUS, SIMULATED_LATENCY_US
+from AxisControllers.Filters import FILTER_TYPES, FILTER_DEFAULTS
+from ButtonControllers.Debounce import DEBOUNCE_MODES, DEFAULT_DEBOUNCE_SAMPLES
+from OutputSinks import OUTPUT_SINKS
+from UInputEvents import UInputEvents
+
+module_logger = logging.getLogger('Joyspyck.Config')
+
+# Bumped whenever the schema or the normalized form changes, so cached configs compiled
+# by an older version are not used.
+SCHEMA_VERSION = 3
+
+# Compiled configs kept in memory, keyed by the hash of the file
+MAX_CACHED_CONFIGS = 8
+
+# ConfigError holds every error found in a config file, each one a string starting
+# with the place of the error in the file.
+class ConfigError (ValueError):
+
+	def __init__(self, errors):
+		self.errors = list(errors)
+		super().__init__("{0} error(s) in config:\n  - {1}".format(len(self.errors), "\n  - ".join(self.errors)))
+
+
+# Option converters. Each one returns the value normalized to its type, or raises
+# ValueError with what the value must be.
+def _int(value):
+	if isinstance(value, int) and not isinstance(value, bool):
+		return value
+	if isinstance(value, float) and value.is_integer():
+		return int(value)
+	if isinstance(value, str):
+		try:
+			return int(value, 10)
+		except ValueError:
+			pass
+	raise ValueError("must be an integer")
+
+def _hex(value):
+	if isinstance(value, int) and not isinstance(value, bool):
+		return value
+	if isinstance(value, str):
+		try:
+			return int(value, 16)
+		except ValueError:
+			pass
+	raise ValueError("must be an integer or an hexadecimal string")
+
+def _float(value):
+	if isinstance(value, (int, float)) and not isinstance(value, bool):
+		return float(value)
+	if isinstance(value, str):
+		try:
+			return float(value)
+		except ValueError:
+			pass
+	raise ValueError("must be a number")
+
+def _bool(value):
+	if isinstance(value, bool):
+		return value
+	if value in (0, 1):
+		return bool(value)
+	raise ValueError("must be true or false")
+
+def _str(value):
+	if isinstance(value, str):
+		return value
+	raise ValueError("must be a string")
+
+def _optional(convert):
+	def optional(value):
+		return None if value is None else convert(value)
+	return optional
+
+def _choice(convert, choices):
+	def choice(value):
+		value = convert(value)
+		if value not in choices:
+			raise ValueError("must be one of {0}".format(", ".join(str(c) for c in choices)))
+		return value
+	return choice
+
+def _range(convert, low=None, high=None, low_inclusive=True):
+	def in_range(value):
+		value = convert(value)
+		if low is not None and (value < low if low_inclusive else value <= low):
+			raise ValueError("must be {0} {1}".format(">=" if low_inclusive else ">", low))
+		if high is not None and value > high:
+			raise ValueError("must be <= {0}".format(high))
+		return value
+	return in_range
+
+# One value for all the axis or a list with one value per axis, see per_axis_option
+def _per_axis(convert):
+	def per_axis(value):
+		if isinstance(value, (list, tuple)):
+			return [convert(item) for item in value]
+		return convert(value)
+	return per_axis
+
+_positive_float = _range(_float, 0, low_inclusive=False)
+
+# ADS1115 gains, 2/3 can be written with any precision
+def _ads1115_gain(value):
+	value = _float(value)
+	if abs(value - 2/3) < 0.001:
+		return 2/3
+	if value.is_integer() and int(value) in (1, 2, 4, 8, 16):
+		return int(value)
+	raise ValueError("must be one of 2/3, 1, 2, 4, 8, 16")
+
+
+# Smoothing filter options of the axis controllers, see Filters
+_FILTER_OPTIONS = {
+	'filter': (FILTER_DEFAULTS['filter'], _optional(_choice(_str, FILTER_TYPES))),
+	'filter_alpha': (FILTER_DEFAULTS['filter_alpha'], _per_axis(_range(_positive_float, high=1))),
+	'filter_window': (FILTER_DEFAULTS['filter_window'], _range(_int, 1)),
+	'filter_min_cutoff': (FILTER_DEFAULTS['filter_min_cutoff'], _per_axis(_positive_float)),
+	'filter_beta': (FILTER_DEFAULTS['filter_beta'], _per_axis(_range(_float, 0))),
+	'filter_d_cutoff': (FILTER_DEFAULTS['filter_d_cutoff'], _per_axis(_positive_float)),
+}
+
+# Options of every controller type: name -> (default, converter). A callable default is
+# called with the controller config and the options converted so far.
+_AXIS_OPTIONS = {
+	'ADS1115': {
+		'gain': (1, _ads1115_gain),
+		'busnum': (DEFAULT_I2C_BUS, _int),
+		'address': (0x48, _hex),
+		'calibration_max': (32766, _per_axis(_float)),
+		'calibration_min': (-32766, _per_axis(_float)),
+		'calibration_threshold': (0.009, _per_axis(_float)),
+		'curve': (1.0, _per_axis(_positive_float)),
+		'data_rate': (128, _choice(_int, (8, 16, 32, 64, 128, 250, 475, 860))),
+		'continuous': (False, _bool),
+		'alert_rdy_chip': ('/dev/gpiochip0', _str),
+		'alert_rdy_line': (None, _optional(_int)),
+		**_FILTER_OPTIONS,
+	},
+	'MPU6050': {
+		'busnum': (1, _int),
+		'address': (0x68, _hex),
+		'calibration_threshold': (0.009, _per_axis(_float)),
+		'curve': (1.0, _per_axis(_positive_float)),
+		'fifo': (False, _bool),
+		'sample_rate': (125, _range(_int, 4, 1000)),
+		'fifo_reduce': ('average', _choice(_str, ('average', 'latest'))),
+		**_FILTER_OPTIONS,
+	},
+	'Simulated': {
+		'num_axis': (lambda conf, options: max(len(conf['mapping']), 1), _range(_int, 1)),
+		'bus': ('i2c', _choice(_str, tuple(SIMULATED_LATENCY_US))),
+		'busnum': (0, _int),
+		'latency': (None, _optional(_range(_float, 0))),
+		'transactions': (lambda conf, options: options['num_axis'], _range(_int, 0)),
+		'frequency': (1.0, _float),
+	},
+	'Dummy': {},
+}
+
+_BUTTON_OPTIONS = {
+	'MCP23017': {
+		'busnum': (DEFAULT_I2C_BUS, _int),
+		'address': (0x20, _hex),
+		'bulk_read': (True, _bool),
+		'interrupt_chip': ('/dev/gpiochip0', _str),
+		'interrupt_line': (None, _optional(_int)),
+	},
+	'FTDI': {
+		'ftdi_url': ('', _str),
+	},
+	'Simulated': {
+		'num_buttons': (16, _range(_int, 1)),
+		'bus': ('i2c', _choice(_str, tuple(SIMULATED_LATENCY_US))),
+		'busnum': (0, _int),
+		'latency': (None, _optional(_range(_float, 0))),
+		'transactions': (1, _range(_int, 0)),
+		'change_every': (1, _range(_int, 1)),
+		'changes': (1, _range(_int, 0)),
+	},
+	'Dummy': {},
+}
+
+# Keys of the controller config, next to its name and type
+_AXIS_CONTROLLER_KEYS = {}
+
+_BUTTON_CONTROLLER_KEYS = {
+	'debounce': (None, _optional(_choice(_str, DEBOUNCE_MODES))),
+	'debounceSamples': (DEFAULT_DEBOUNCE_SAMPLES, _range(_int, 1)),
+}
+
+_JOYSTICK_OPTIONS = {
+	'waitTimeButtons': (0.05, _positive_float),
+	'waitTimeAxis': (0.05, _positive_float),
+	'axisTolerance': (0, _range(_float, 0)),
+	'output': ('uinput', _choice(_str, OUTPUT_SINKS)),
+}
+
+# Checks involving several options of a controller, returning a list of errors
+_PER_AXIS_FILTER_OPTIONS = ('filter_alpha', 'filter_min_cutoff', 'filter_beta', 'filter_d_cutoff')
+
+def _check_ads1115(conf, options):
+	num_axis = min(len(conf['mapping']), 4)
+	return _check_per_axis(options, num_axis, ('calibration_max', 'calibration_min', 'calibration_threshold', 'curve') + _PER_AXIS_FILTER_OPTIONS)
+
+def _check_mpu6050(conf, options):
+	return _check_per_axis(options, 3, ('calibration_threshold', 'curve') + _PER_AXIS_FILTER_OPTIONS)
+
+def _check_per_axis(options, num_axis, names):
+	return ["option {0} has {1} values, {2} are needed".format(name, len(options[name]), num_axis)
+		for name in names if isinstance(options[name], list) and len(options[name]) < num_axis]
+
+def _check_mcp23017(conf, options):
+	if options['interrupt_line'] is not None and not options['bulk_read']:
+		return ["interrupt mode needs bulk_read"]
+	if options['interrupt_line'] is not None and conf['debounce'] is not None:
+		return ["interrupt mode can not be debounced"]
+	return []
+
+def _check_simulated_axis(conf, options):
+	if len(conf['mapping']) > options['num_axis']:
+		return ["maps more axis than num_axis"]
+	return []
+
+def _check_simulated_buttons(conf, options):
+	if len(conf['mapping']) > options['num_buttons']:
+		return ["maps more buttons than num_buttons"]
+	return []
+
+_AXIS_CHECKS = {
+	'ADS1115': _check_ads1115,
+	'MPU6050': _check_mpu6050,
+	'Simulated': _check_simulated_axis,
+}
+
+_BUTTON_CHECKS = {
+	'MCP23017': _check_mcp23017,
+	'Simulated': _check_simulated_buttons,
+}
+
+
+# Convert one option, falling back to its default when it is missing or not valid
+def _compile_option(values, name, default, convert, conf, compiled, where, errors):
+	if name in values:
+		try:
+			return convert(values[name])
+		except ValueError as ex:
+			errors.append("{0}: option {1} {2}, got {3!r}".format(where, name, str(ex), values[name]))
+	return default(conf, compiled) if callable(default) else default
+
+# Convert the options of a schema, filling the missing ones with their defaults. Options
+# not in the schema are kept as they are.
+def _compile_options(values, schema, conf, where, errors):
+	compiled = dict(values)
+	for name, (default, convert) in schema.items():
+		compiled[name] = _compile_option(values, name, default, convert, conf, compiled, where, errors)
+	return compiled
+
+def _compile_controller(conf, kind, index, options_schemas, keys_schema, checks, where, errors):
+	where = "{0}, {1} controller {2}".format(where, kind, index)
+	if not isinstance(conf, dict):
+		errors.append("{0}: must be an object".format(where))
+		return None
+
+	num_errors = len(errors)
+	if 'name' in conf:
+		where = "{0} ({1})".format(where, conf['name'])
+	for key in ('name', 'type', 'options', 'mapping'):
+		if key not in conf:
+			errors.append("{0}: missing {1}".format(where, key))
+	if len(errors) > num_errors:
+		return None
+
+	if not isinstance(conf['name'], str):
+		errors.append("{0}: name must be a string".format(where))
+	if conf['type'] not in options_schemas:
+		errors.append("{0}: type {1!r} must be one of {2}".format(where, conf['type'], ", ".join(options_schemas)))
+	if not isinstance(conf['options'], dict):
+		errors.append("{0}: options must be an object".format(where))
+	if not isinstance(conf['mapping'], list):
+		errors.append("{0}: mapping must be a list of events".format(where))
+	if len(errors) > num_errors:
+		return None
+
+	for event in conf['mapping']:
+		if not isinstance(event, str) or event not in UInputEvents:
+			errors.append("{0}: {1}".format(where, UInputEvents.invalid_message(event)))
+
+	compiled = dict(conf)
+	compiled['mapping'] = list(conf['mapping'])
+	compiled['options'] = _compile_options(conf['options'], options_schemas[conf['type']], conf, where, errors)
+	for name, (default, convert) in keys_schema.items():
+		compiled[name] = _compile_option(conf, name, default, convert, conf, compiled, where, errors)
+	compiled['isolated'] = _compile_option(conf, 'isolated', False, _bool, conf, compiled, where, errors)
+	if compiled['isolated'] or 'isolatedPeriod' in conf:
+		from ProcessController import DEFAULT_ISOLATED_PERIOD
+		compiled['isolatedPeriod'] = _compile_option(conf, 'isolatedPeriod', DEFAULT_ISOLATED_PERIOD, _positive_float,
+			conf, compiled, where, errors)
+
+	check = checks.get(conf['type'])
+	if check is not None:
+		errors.extend("{0}: {1}".format(where, error) for error in check(compiled, compiled['options']))
+	return compiled
+
+def _compile_joystick(conf, index, errors):
+	where = "joystick {0}".format(index)
+	if not isinstance(conf, dict):
+		errors.append("{0}: must be an object".format(where))
+		return None
+
+	compiled = _compile_options(conf, _JOYSTICK_OPTIONS, conf, where, errors)
+	for key, kind, options_schemas, keys_schema, checks in (
+			('buttonControllers', 'button', _BUTTON_OPTIONS, _BUTTON_CONTROLLER_KEYS, _BUTTON_CHECKS),
+			('axisControllers', 'axis', _AXIS_OPTIONS, _AXIS_CONTROLLER_KEYS, _AXIS_CHECKS)):
+		controllers = conf.get(key, [])
+		if not isinstance(controllers, list):
+			errors.append("{0}: {1} must be a list".format(where, key))
+			controllers = []
+		compiled[key] = [_compile_controller(controller_conf, kind, i, options_schemas, keys_schema, checks, where, errors)
+			for i, controller_conf in enumerate(controllers)]
+	return compiled
+
+# Validate a loaded config file and return it normalized: every option converted to its
+# type and the missing ones filled with their defaults, so controllers do not need to
+# parse them. Raises ConfigError with all the errors found.
+def compile_config(data):
+	errors = []
+	if not isinstance(data, list):
+		raise ConfigError(["config must be a list of joysticks"])
+
+	compiled = [_compile_joystick(joystick_conf, i, errors) for i, joystick_conf in enumerate(data)]
+	if errors:
+		raise ConfigError(errors)
+	return compiled
+
+
+_compiled_configs = {}
+
+# Load and compile a config file. Compiled configs are cached by the hash of the file,
+# in memory and, when cache_dir is given, as JSON files in that directory, so loading
+# an unchanged file only costs reading and hashing it. Returns a copy the caller can
+# modify. Raises IOError when the file can not be read and ConfigError when it is not valid.
+def load_config(config_file, cache_dir=None):
+	with open(config_file, "rb") as json_file:
+		data = json_file.read()
+
+	key = hashlib.sha256(b"%d:" % SCHEMA_VERSION + data).hexdigest()
+	compiled = _compiled_configs.get(key)
+	if compiled is None and cache_dir is not None:
+		compiled = _read_cache(cache_dir, key)
+	if compiled is None:
+		try:
+			loaded = json.loads(data.decode("utf-8"))
+		except ValueError as ex:
+			raise ConfigError(["not valid JSON: {0}".format(str(ex))])
+		compiled = compile_config(loaded)
+		if cache_dir is not None:
+			_write_cache(cache_dir, key, compiled)
+
+	if len(_compiled_configs) >= MAX_CACHED_CONFIGS and key not in _compiled_configs:
+		_compiled_configs.clear()
+	_compiled_configs[key] = compiled
+	return copy.deepcopy(compiled)
+
+def _read_cache(cache_dir, key):
+	try:
+		with open(os.path.join(cache_dir, key + ".json"), "r") as cache_file:
+			return json.load(cache_file)
+	except (IOError, ValueError):
+		return None
+
+def _write_cache(cache_dir, key, compiled):
+	path = os.path.join(cache_dir, key + ".json")
+	try:
+		os.makedirs(cache_dir, exist_ok=True)
+		with open(path + ".tmp", "w") as cache_file:
+			json.dump(compiled, cache_file)
+		os.replace(path + ".tmp", path)
+	except (IOError, OSError) as ex:
+		module_logger.warning("[load_config] Could not cache compiled config in {0}: {1}".format(cache_dir, str(ex)))
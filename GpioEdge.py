@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+    GpioEdge for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+import fcntl
+import select
+import struct
+import logging
+
+module_logger = logging.getLogger('Joyspyck.GpioEdge')
+
+# Linux GPIO character device ABI (linux/gpio.h, v1 line events)
+GPIOHANDLE_REQUEST_INPUT = 0x01
+GPIOEVENT_REQUEST_RISING_EDGE = 0x01
+GPIOEVENT_REQUEST_FALLING_EDGE = 0x02
+GPIOEVENT_REQUEST_BOTH_EDGES = 0x03
+GPIO_GET_LINEEVENT_IOCTL = 0xC030B404	# _IOWR(0xB4, 0x04, struct gpioevent_request)
+
+# struct gpioevent_request { u32 lineoffset; u32 handleflags; u32 eventflags; char consumer_label[32]; int fd; }
+_EVENT_REQUEST = struct.Struct('III32si')
+# struct gpioevent_data { u64 timestamp; u32 id; } padded to 16 bytes
+_EVENT_DATA_SIZE = 16
+_MAX_EVENTS_READ = 64
+
+class Edge:
+	RISING = GPIOEVENT_REQUEST_RISING_EDGE
+	FALLING = GPIOEVENT_REQUEST_FALLING_EDGE
+	BOTH = GPIOEVENT_REQUEST_BOTH_EDGES
+
+# GpioEdge requests edge events of one GPIO line (for example an ALERT/RDY or INT
+# output of a device) from /dev/gpiochipN and exposes them as a file descriptor
+# that can be waited on instead of sleeping or polling the device.
+class GpioEdge (object):
+
+	def __init__(self, chip, line, edge=Edge.FALLING, consumer='joyspyck'):
+		self._logger = logging.getLogger('Joyspyck.GpioEdge')
+		self._chip = chip
+		self._line = line
+		self._edge = edge
+		self._consumer = consumer
+		self._fd = None
+		self._poller = None
+
+	def open(self):
+		chip_fd = os.open(self._chip, os.O_RDONLY)
+		try:
+			request = bytearray(_EVENT_REQUEST.pack(self._line, GPIOHANDLE_REQUEST_INPUT, self._edge,
+				self._consumer.encode()[:31], 0))
+			fcntl.ioctl(chip_fd, GPIO_GET_LINEEVENT_IOCTL, request, True)
+		finally:
+			os.close(chip_fd)
+
+		self._fd = _EVENT_REQUEST.unpack(request)[4]
+		os.set_blocking(self._fd, False)
+		self._poller = select.poll()
+		self._poller.register(self._fd, select.POLLIN | select.POLLPRI)
+		self._logger.info("[open] Listening edges of line {} on {}".format(self._line, self._chip))
+
+	def close(self):
+		if self._fd is not None:
+			os.close(self._fd)
+			self._fd = None
+			self._poller = None
+
+	def fileno(self):
+		return self._fd
+
+	# Consume all pending events without blocking. Returns the number of edges read.
+	def drain(self):
+		count = 0
+		while True:
+			try:
+				data = os.read(self._fd, _EVENT_DATA_SIZE * _MAX_EVENTS_READ)
+			except BlockingIOError:
+				return count
+			count += len(data) // _EVENT_DATA_SIZE
+			if len(data) < _EVENT_DATA_SIZE * _MAX_EVENTS_READ:
+				return count
+
+	# Block until at least one edge arrives or timeout (seconds) expires.
+	# Returns the number of edges consumed, 0 on timeout.
+	def wait(self, timeout):
+		if not self._poller.poll(max(0, timeout) * 1000):
+			return 0
+		return self.drain()
@@ -23,14 +23,22 @@
 """
 
 import sys
-import time
-import json
+import math
+import select
 import signal
 import logging
 import argparse
 import threading
 import Joystick
 
+from functools import reduce
+from Config import load_config, ConfigError
+from Scheduler import PeriodicScheduler, INTERRUPT_FALLBACK_PERIODS
+from AsyncRuntime import AsyncRuntime
+from Metrics import get_registry, MetricsExporter
+from OutputSinks import DEFAULT_MAX_RECORDS
+from Profiler import HotPathProfiler
+
 # Possible returns of the main python app
 JSON_FILE_NOT_OPEN = -1
 JSON_FILE_PATH_NOT_PROVIDED = -2
@@ -38,6 +46,8 @@ JSON_NOT_LOAD = -3
 
 _joysticks = []				# Array of created joysticks
 _update_workers = []		# Array of workers (threads) in charge of updating the joysticks
+_reload_requested = threading.Event()	# Set by SIGHUP, the config file must be reloaded
+_exit_requested = threading.Event()		# Set by SIGINT in threaded mode
 
 logger = logging.getLogger('Joyspyck')
 
@@ -45,9 +55,66 @@ logger = logging.getLogger('Joyspyck')
 # This way, all thread can be cleaned before exiting.
 def signal_handler(sig, frame):
 	logger.info("[signal_handler] Stopping workers...")
+	_exit_requested.set()
 	for w in _update_workers:
 		w.stop()
 
+# SIGHUP asks the main loop to reload the config file between two updates
+def reload_handler(sig, frame):
+	logger.info("[reload_handler] Reloading config file...")
+	_reload_requested.set()
+
+# Apply the config file to the running joysticks. Joysticks are matched by position: the
+# existing ones are reloaded, keeping their devices and unchanged controllers, new ones
+# are created and the ones left over are closed. If the file can not be loaded, or the new
+# configuration of a joystick is not valid, the running configuration is kept.
+#
+# The new controllers and joysticks are connected while the running ones keep being
+# updated. pause, if given, is called just before applying the changes and must stop all
+# the updates of the joysticks.
+def reload_joysticks(config_file, output=None, cache_dir=None, max_records=DEFAULT_MAX_RECORDS, pause=None):
+	pending = prepare_reload_joysticks(config_file, output, cache_dir, max_records)
+	if pending is None:
+		return False
+	if pause is not None:
+		pause()
+	apply_reload_joysticks(pending)
+	return True
+
+# First step of reload_joysticks, safe to run while the joysticks are being updated. Returns
+# what apply_reload_joysticks needs, None if the file could not be loaded.
+def prepare_reload_joysticks(config_file, output=None, cache_dir=None, max_records=DEFAULT_MAX_RECORDS):
+	try:
+		data = load_config(config_file, cache_dir)
+	except Exception as ex:
+		logger.error("[reload_joysticks] Could not load config file, keeping the running one: {0}".format(str(ex)))
+		return None
+
+	created = []
+	for i, joystick_conf in enumerate(data):
+		try:
+			if i < len(_joysticks):
+				_joysticks[i].prepare_reload(joystick_conf)
+			else:
+				created.append(Joystick.Joystick(joystick_conf, output=output, max_records=max_records))
+		except Exception as ex:
+			logger.error("[reload_joysticks] Joystick {0} not reloaded: {1}".format(i, str(ex)))
+	return len(data), created
+
+# Second step of reload_joysticks, with the updates stopped
+def apply_reload_joysticks(pending):
+	num_joysticks, created = pending
+	for i, joystick in enumerate(_joysticks[:num_joysticks]):
+		try:
+			joystick.apply_reload()
+		except Exception as ex:
+			logger.error("[reload_joysticks] Joystick {0} not reloaded: {1}".format(i, str(ex)))
+
+	for joystick in _joysticks[num_joysticks:]:
+		joystick.close()
+	del _joysticks[num_joysticks:]
+	_joysticks.extend(created)
+
 
 class UpdatingThreadType:
 	BUTTON_THREAD = 0
@@ -57,35 +124,208 @@ class UpdatingThreadType:
 # Definition of the threads in charge of updating uinput devices with the
 # information gathered from hardware devices. Depending on the type, one worker
 # will update all ButtonControllers or all AxisControllers contained inside a
-# joystick.
+# joystick. Every worker only touches its own joystick, at its own rate.
 class UpdateWorker (threading.Thread):
-	def __init__(self, worker_joystick, worker_type):
-		threading.Thread.__init__(self)
-		self._joysticks = worker_joystick
+	def __init__(self, worker_joystick, worker_type, absolute_sleep=False, name=None):
+		threading.Thread.__init__(self, name=name)
+		self._joystick = worker_joystick
 		self._type = worker_type
 		self._working = False
 
+		# Updates are run at a fixed rate given by the joystick wait times
+		if self._type == UpdatingThreadType.BUTTON_THREAD:
+			self.scheduler = PeriodicScheduler(worker_joystick.wait_time_buttons, absolute_sleep)
+		else:
+			self.scheduler = PeriodicScheduler(worker_joystick.wait_time_axis, absolute_sleep)
+
 	def stop (self):
 		self._working = False
 
 	def run(self):
 		self._working = True
+		self.scheduler.start()
 		if self._type == UpdatingThreadType.BUTTON_THREAD:
 			self.update_buttons()
 		else:
 			self.update_axis()
+		logger.info("[UpdateWorker] {} scheduler stats: {}".format(self.name, self.scheduler.stats()))
 
 	def update_buttons (self):
 		while self._working:
-			for self._joystick in _joysticks:
-				self._joystick.update_buttons()
-			time.sleep(self._joystick.wait_time_buttons)
+			self._joystick.update_buttons()
+			self.scheduler.wait()
 
 	def update_axis (self):
 		while self._working:
-			for self._joystick in _joysticks:
-				self._joystick.update_axis()
-			time.sleep(self._joystick.wait_time_axis)
+			self._joystick.update_axis()
+			self.scheduler.wait()
+
+
+# Controller polled from a BusWorker every `divider` ticks, or when its event fd is ready
+class BusTask (object):
+	def __init__(self, joystick, slot, worker_type, index, period, fd):
+		self.joystick = joystick
+		self.slot = slot
+		self.type = worker_type
+		self.index = index
+		self.period = period
+		self.fd = fd
+		self.divider = 1
+
+	def update(self, syn=False):
+		if self.type == UpdatingThreadType.AXIS_THREAD:
+			return self.joystick.update_axis_controller(self.index, syn)
+		return self.joystick.update_button_controller(self.index, syn)
+
+
+# Worker in charge of all the controllers connected to the same physical bus, whatever
+# joystick they belong to. All bus transactions are done from this thread, so they are
+# never interleaved, and the reads of every controller due on a tick are done back to
+# back. Workers of different buses run in parallel.
+#
+# Controllers with an event fd (interrupt driven) are updated as soon as their fd is
+# ready: the worker waits on their fds between ticks. They are also polled on ticks every
+# INTERRUPT_FALLBACK_PERIODS periods, in case an edge was missed.
+class BusWorker (threading.Thread):
+
+	# Tick period when the bus has no controllers. Only used to check if the worker has
+	# been stopped.
+	IDLE_PERIOD = 0.5
+
+	# Shortest tick used to poll controllers with different periods at their exact rates
+	MIN_TICK = 0.001
+
+	def __init__(self, bus, absolute_sleep=False, name=None):
+		threading.Thread.__init__(self, name=name)
+		self._bus = bus
+		self._absolute_sleep = absolute_sleep
+		self._tasks = []
+		self._fd_tasks = {}
+		self._joysticks = []
+		self._working = False
+		self.scheduler = None
+
+	def add_controller(self, joystick, worker_type, index):
+		if joystick not in self._joysticks:
+			self._joysticks.append(joystick)
+		if worker_type == UpdatingThreadType.BUTTON_THREAD:
+			period = joystick.wait_time_buttons
+			fd = joystick.button_controllers()[index].event_fd()
+		else:
+			period = joystick.wait_time_axis
+			fd = joystick.axis_controllers()[index].event_fd()
+		slot = self._joysticks.index(joystick)
+		if fd is not None:
+			self._fd_tasks[fd] = BusTask(joystick, slot, worker_type, index, period, fd)
+			period *= INTERRUPT_FALLBACK_PERIODS
+		self._tasks.append(BusTask(joystick, slot, worker_type, index, period, fd))
+
+	def stop (self):
+		self._working = False
+
+	# Tick at the greatest common divisor of the polling periods, so every controller is
+	# polled every N ticks at exactly its own rate. Periods whose divisor is shorter than
+	# MIN_TICK are polled on ticks of the fastest one instead, and their effective rate is
+	# logged. Returns the tick period.
+	def _schedule_tasks(self):
+		if not self._tasks:
+			return self.IDLE_PERIOD
+
+		periods_us = [max(1, round(task.period * 1000000)) for task in self._tasks]
+		tick_us = reduce(math.gcd, periods_us)
+		if tick_us < self.MIN_TICK * 1000000:
+			tick_us = min(periods_us)
+
+		for task, period_us in zip(self._tasks, periods_us):
+			task.divider = max(1, round(period_us / tick_us))
+			if task.divider * tick_us != period_us:
+				logger.warning("[BusWorker] {} polls a controller every {} s instead of {} s".format(
+					self.name, task.divider * tick_us / 1000000, task.period))
+		return tick_us / 1000000
+
+	def run(self):
+		self.scheduler = PeriodicScheduler(self._schedule_tasks(), self._absolute_sleep)
+
+		# Interrupt driven controllers are waited on between ticks
+		poller = None
+		if self._fd_tasks:
+			poller = select.poll()
+			for fd in self._fd_tasks:
+				poller.register(fd, select.POLLIN | select.POLLPRI)
+
+		self._working = True
+		self.scheduler.start()
+		self.update(poller)
+		logger.info("[BusWorker] {} scheduler stats: {}".format(self.name, self.scheduler.stats()))
+
+	def update (self, poller=None):
+		tasks = self._tasks
+		fd_tasks = self._fd_tasks
+		joysticks = self._joysticks
+		pending = [0] * len(joysticks)
+		tick = 0
+		while self._working:
+			for task in tasks:
+				if tick % task.divider == 0:
+					pending[task.slot] += task.update()
+
+			# One SYN_REPORT per joystick with changes in this tick
+			for slot in range(len(joysticks)):
+				if pending[slot]:
+					joysticks[slot].syn()
+					pending[slot] = 0
+
+			tick += 1
+			ready = self.scheduler.wait(poller)
+			while ready:
+				for fd, _ in ready:
+					fd_tasks[fd].update(syn=True)
+				ready = self.scheduler.wait(poller)
+
+
+# Stop the workers of the threaded mode after their current update, and wait for them
+def stop_workers():
+	for worker in _update_workers:
+		worker.stop()
+	for worker in _update_workers:
+		worker.join()
+
+# Create and start the workers of the threaded mode, one per bus or two per joystick
+def start_workers(workers_mode, absolute_sleep=False):
+	if workers_mode == 'bus':
+		workers = create_bus_workers(_joysticks, absolute_sleep)
+	else:
+		workers = []
+		for i, joystick in enumerate(_joysticks):
+			if joystick.num_axis_controllers() > 0:
+				workers.append(UpdateWorker(joystick, UpdatingThreadType.AXIS_THREAD, absolute_sleep,
+					name="joystick{}-axis".format(i)))
+
+			if joystick.num_button_controllers() > 0:
+				workers.append(UpdateWorker(joystick, UpdatingThreadType.BUTTON_THREAD, absolute_sleep,
+					name="joystick{}-buttons".format(i)))
+
+	for worker in workers:
+		worker.start()
+		get_registry().add_stats(worker.name, lambda worker=worker: worker.scheduler.stats())
+	return workers
+
+# Create one BusWorker per physical bus used by the joysticks. Controllers without
+# bus (virtual devices) share a worker.
+def create_bus_workers(joysticks, absolute_sleep=False):
+	workers = {}
+	for joystick in joysticks:
+		for index, controller in enumerate(joystick.axis_controllers()):
+			_bus_worker(workers, controller.bus(), absolute_sleep).add_controller(joystick, UpdatingThreadType.AXIS_THREAD, index)
+		for index, controller in enumerate(joystick.button_controllers()):
+			_bus_worker(workers, controller.bus(), absolute_sleep).add_controller(joystick, UpdatingThreadType.BUTTON_THREAD, index)
+	return list(workers.values())
+
+def _bus_worker(workers, bus, absolute_sleep):
+	if bus not in workers:
+		name = "bus-" + "-".join(str(part) for part in bus) if bus is not None else "bus-none"
+		workers[bus] = BusWorker(bus, absolute_sleep, name=name)
+	return workers[bus]
 
 
 if __name__ == "__main__":
@@ -94,6 +334,26 @@ if __name__ == "__main__":
 						help='JSON containing the Joystick configuration.')
 	parser.add_argument('--wait_time', metavar='sleep between polling', type=float,
 						help='JSON containing the Joystick configuration.')
+	parser.add_argument('--absolute_sleep', action='store_true', required=False,
+						help='Sleep until each polling deadline with clock_nanosleep instead of relative sleeps.')
+	parser.add_argument('--workers', choices=['bus', 'joystick'], default='bus',
+						help='Threaded mode: one worker per physical bus (default) or two workers per joystick.')
+	parser.add_argument('--asyncio', action='store_true', required=False,
+						help='Update all controllers from a single thread with an asyncio event loop.')
+	parser.add_argument('--output', choices=['uinput', 'raw', 'recorder', 'null'], required=False,
+						help='Output sink of all joysticks, overriding their "output" option. uinput by default.')
+	parser.add_argument('--max_records', type=int, default=DEFAULT_MAX_RECORDS,
+						help='Events kept by the recorder output of every joystick, the oldest are dropped first.')
+	parser.add_argument('--config_cache', metavar='path', required=False,
+						help='Directory where compiled config files are cached, keyed by the hash of the file.')
+	parser.add_argument('--metrics_file', metavar='path', required=False,
+						help='Write metrics in the Prometheus text format to this file.')
+	parser.add_argument('--metrics_socket', metavar='path', required=False,
+						help='Serve metrics in the Prometheus text format on this Unix socket.')
+	parser.add_argument('--metrics_interval', type=float, default=5.0,
+						help='Seconds between writes of the metrics file.')
+	parser.add_argument('--profile', metavar='seconds', type=float, required=False,
+						help='Profile the update path during the first seconds and log a flat profile.')
 	parser.add_argument('-v', action='store_true', required=False, 
 						help='Activate verbose.')
 
@@ -110,52 +370,87 @@ if __name__ == "__main__":
 	logger.addHandler(console_handler)
 
 	if args.config_file:
-		# Check file existence
-		json_file = None
+		# Load and validate the whole config before touching any bus
 		try:
-			json_file = open(args.config_file, "r+")
+			data = load_config(args.config_file, args.config_cache)
 		except IOError:
 			logger.error("[main] Could not open config file.")
 			exit(JSON_FILE_NOT_OPEN)
+		except ConfigError as ex:
+			logger.error("[main] Config file is not valid. {0}".format(str(ex)))
+			exit(JSON_NOT_LOAD)
 
-		# Load json and create all joysticks
-		with json_file:
-			try:
-				data = json.load(json_file)
-				for joystick_conf in data:
-					_joysticks.append(Joystick.Joystick(joystick_conf))
-			except Exception as ex:
-				logger.error("[main] Exception when loading config json: {0}".format(str(ex)))
-				exit(JSON_NOT_LOAD)
+		# Create all joysticks
+		try:
+			for joystick_conf in data:
+				_joysticks.append(Joystick.Joystick(joystick_conf, output=args.output, max_records=args.max_records))
+		except Exception as ex:
+			logger.error("[main] Exception when creating joysticks: {0}".format(str(ex)))
+			exit(JSON_NOT_LOAD)
+
+		# Publish metrics of controllers and update loops
+		metrics_exporter = None
+		if args.metrics_file or args.metrics_socket:
+			metrics_exporter = MetricsExporter(get_registry(), args.metrics_file, args.metrics_socket, args.metrics_interval)
+			metrics_exporter.start()
+
+		# Timed methods are installed now and removed when the profile is done
+		if args.profile:
+			HotPathProfiler(_joysticks).run_for(args.profile)
 
 		# Loop over Joysticks updating states. SINGLE THREADED MODE.
 		if args.wait_time:
+			scheduler = PeriodicScheduler(args.wait_time, args.absolute_sleep)
+			get_registry().add_stats("single", scheduler.stats)
+			signal.signal(signal.SIGHUP, reload_handler)
+			scheduler.start()
+			try:
+				while True:
+					for joystick in _joysticks:
+						joystick.update()
+					if _reload_requested.is_set():
+						_reload_requested.clear()
+						reload_joysticks(args.config_file, args.output, args.config_cache, args.max_records)
+					scheduler.wait()
+			except KeyboardInterrupt:
+				logger.info("[main] Scheduler stats: {}".format(scheduler.stats()))
+
+		# ASYNCIO MODE. Single thread, every controller at its own rate.
+		elif args.asyncio:
+			# On SIGHUP the new controllers are connected while the runtime keeps running, then
+			# it stops, the changes are applied and it is run again
+			prepare_reload = lambda: prepare_reload_joysticks(args.config_file, args.output, args.config_cache, args.max_records)
 			while True:
-				for joystick in _joysticks:
-					joystick.update()
-				time.sleep(args.wait_time)
+				async_runtime = AsyncRuntime(_joysticks, prepare_reload)
+				get_registry().add_stats("asyncio", async_runtime.stats)
+				async_runtime.run()
+				if not async_runtime.reload_requested():
+					break
+				apply_reload_joysticks(async_runtime.reload_result())
 
 		# MULTI THREADED MODE.
 		else:
 
-			# Capture SIGINT to exit
+			# Capture SIGINT to exit and SIGHUP to reload
 			signal.signal(signal.SIGINT, signal_handler)
+			signal.signal(signal.SIGHUP, reload_handler)
 
 			# Create workers
-			for joystick in _joysticks:
-				if joystick.num_axis_controllers() > 0:
-					axis_worker = UpdateWorker(joystick, UpdatingThreadType.AXIS_THREAD)
-					axis_worker.start()
-					_update_workers.append(axis_worker)
-
-				if joystick.num_button_controllers() > 0:
-					button_worker = UpdateWorker(joystick, UpdatingThreadType.BUTTON_THREAD)
-					button_worker.start()
-					_update_workers.append(button_worker)
-
-			for worker in _update_workers:
-				while worker.isAlive():
-					worker.join(timeout=1)
+			_update_workers.extend(start_workers(args.workers, args.absolute_sleep))
+
+			# Wait for the workers to end. On reload, the new controllers are connected while the
+			# workers keep running; then they are stopped after their current update, the
+			# changes applied and new workers started for the new controllers.
+			while any(worker.is_alive() for worker in _update_workers):
+				_reload_requested.wait(timeout=1)
+				if _reload_requested.is_set() and not _exit_requested.is_set():
+					_reload_requested.clear()
+					if reload_joysticks(args.config_file, args.output, args.config_cache, args.max_records, pause=stop_workers) \
+							and not _exit_requested.is_set():
+						_update_workers[:] = start_workers(args.workers, args.absolute_sleep)
+
+		if metrics_exporter is not None:
+			metrics_exporter.stop()
 
 	else:
 		logger.error("[main] Supply a path for the config file.")
@@ -22,53 +22,67 @@
 	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import uinput
+import copy
+import time
+import itertools
 import logging
+import threading
 
+from array import array
+
+from Supervisor import get_supervisor
+from BusManager import get_bus_lock
+from Metrics import get_registry
+from OutputSinks import get_output_sink, DEFAULT_MAX_RECORDS
 from AxisControllers.AxisManager import get_axis_controller
-from ButtonControllers.ButtonManager import get_button_controller, ButtonStatus
+from ButtonControllers.ButtonManager import get_button_controller
 
 module_logger = logging.getLogger('Joyspyck.Joystick')
+
+# Last axis value of an axis that was never emitted. Out of the axis range, so the
+# first read value is always emitted.
+_AXIS_UNSET = -(1 << 31)
+
+# Numbers of the joysticks in order of creation, see Joystick.index
+_joystick_indexes = itertools.count()
+
 # Joystick class models a uinput virtual device (/dev/input/jsX)
 #
 # Contains arrays of axis and button controllers and is in charge of managing them
 # and updating the virtual device with the information it gets from them.
 class Joystick:
 
-	def __init__(self, joystick_conf):
+	# The output sink is a uinput device unless other is set in the "output" option of the
+	# joystick, or given in output (which takes precedence). A recorder sink keeps the last
+	# max_records events. See OutputSinks.
+	def __init__(self, joystick_conf, output=None, max_records=DEFAULT_MAX_RECORDS):
 
 		# Store info
 		self._logger = logging.getLogger('Joyspyck.Joystick')
+		self.index = next(_joystick_indexes)	# Tells apart controllers of several joysticks in the metrics
+		self._output = output
+		self._max_records = max_records
 		self._button_controllers = []
+		self._button_confs = []		# Configuration every controller was created from
 		self._num_button_controllers = 0
 		self._axis_controllers = []
+		self._axis_confs = []
 		self._num_axis_controllers = 0
 		self._device = None
-		self._last_button_state = []
-		events = []
-
-		if 'waitTimeButtons' not in joystick_conf:
-			self.wait_time_buttons = 0.05
-		else:
-			self.wait_time_buttons = joystick_conf['waitTimeButtons'] \
-				if isinstance(joystick_conf['waitTimeButtons'], float) \
-				else int(joystick_conf['waitTimeButtons'], 10)
+		self._device_lock = threading.Lock()	# Updates may come from several workers
+		self._axis_plan = ()
+		self._button_plan = ()
+		self._pending_reload = None	# Prepared by prepare_reload, see reload
 
-		if 'waitTimeAxis' not in joystick_conf:
-			self.wait_time_axis = 0.05
-		else:
-			self.wait_time_axis = joystick_conf['waitTimeAxis'] \
-				if isinstance(joystick_conf['waitTimeAxis'], float) \
-				else int(joystick_conf['waitTimeAxis'], 10)
+		self._read_options(joystick_conf)
 
 		# Create button controllers
 		for button_controller_conf in joystick_conf["buttonControllers"]:
-
+			conf = copy.deepcopy(button_controller_conf)
 			button_controller = get_button_controller(button_controller_conf)
 			if button_controller is not None:
 				self._button_controllers.append(button_controller)
-				events = events + button_controller.get_events()
-				self._last_button_state.append([ButtonStatus.UNPRESSED for i in range(button_controller.num_buttons())])
+				self._button_confs.append(conf)
 			else:
 				self._logger.error("[init] Not button controller found.")
 		
@@ -76,59 +90,443 @@ class Joystick:
 
 		# Create axis controllers
 		for axis_controller_conf in joystick_conf["axisControllers"]:
+			conf = copy.deepcopy(axis_controller_conf)
 			axis_controller = get_axis_controller(axis_controller_conf)
 			if axis_controller is not None:
 				self._axis_controllers.append(axis_controller)
-				events = events + axis_controller.get_events()
+				self._axis_confs.append(conf)
 			else:
 				self._logger.error("[init] Not axis controller found")
 		
 		self._num_axis_controllers = len(self._axis_controllers)
 
-		# Create uinput device 
-		self._device = uinput.Device(events)
+		self._axis_plan, self._button_plan = self._build_emit_plan(self._axis_controllers, self._button_controllers)
+
+		# Create output sink, a uinput device by default
+		self._device = get_output_sink(self.output_type, self._get_events(self._axis_controllers, self._button_controllers),
+			self._max_records)
+
+	def _read_options(self, joystick_conf):
+		if 'waitTimeButtons' not in joystick_conf:
+			self.wait_time_buttons = 0.05
+		else:
+			self.wait_time_buttons = float(joystick_conf['waitTimeButtons'])
+
+		if 'waitTimeAxis' not in joystick_conf:
+			self.wait_time_axis = 0.05
+		else:
+			self.wait_time_axis = float(joystick_conf['waitTimeAxis'])
+
+		# Axis changes smaller than this are considered jitter and not emitted
+		if 'axisTolerance' not in joystick_conf:
+			self.axis_tolerance = 0
+		else:
+			self.axis_tolerance = joystick_conf['axisTolerance'] \
+				if isinstance(joystick_conf['axisTolerance'], (int, float)) \
+				else float(joystick_conf['axisTolerance'])
+
+		if self._output is not None:
+			self.output_type = self._output
+		elif 'output' not in joystick_conf:
+			self.output_type = 'uinput'
+		else:
+			self.output_type = joystick_conf['output']
+
+	# Events supported by the device: all the button events, then all the axis events
+	def _get_events(self, axis_controllers, button_controllers):
+		events = []
+		for button_controller in button_controllers:
+			events = events + button_controller.get_events()
+		for axis_controller in axis_controllers:
+			events = events + axis_controller.get_events()
+		return events
+
+	# Precompute everything the update loops need, so they only read and compare values:
+	#  - Axis plan: (controller, health, metrics, ((axis index, event), ...), values, state)
+	#    per axis controller. values is the buffer where the axis values are read before
+	#    emitting them and state holds the last emitted ones.
+	#  - Button plan: (controller, health, metrics, events, state, debouncer) per button
+	#    controller, with the last emitted state packed in an int (bit N is button N) in
+	#    state[0]. debouncer filters the masks read, None when the buttons are not debounced.
+	# Every entry is self-contained, so a plan can be replaced while an update is running.
+	#
+	# Health objects come from the reconnect supervisor, failed controllers are skipped
+	# until it reconnects them. Metrics objects come from the metrics registry. Controllers
+	# with an entry in reuse (by id) keep it; with keep_state False only their health and
+	# metrics are kept.
+	def _build_emit_plan(self, axis_controllers, button_controllers, reuse=None, keep_state=True):
+		supervisor = get_supervisor()
+		registry = get_registry()
+		reuse = reuse or {}
+
+		axis_plan = []
+		for axis_controller in axis_controllers:
+			old = reuse.get(id(axis_controller))
+			if old is not None and keep_state:
+				axis_plan.append(old)
+				continue
+			entries = []
+			for i in range(axis_controller.num_mapped_axis()):
+				entries.append((i, tuple(axis_controller.get_events()[i][:-4]))) #- (-32766, 32766, 0, 0)
+			if old is not None:
+				health, metrics = old[1], old[2]
+			else:
+				health = supervisor.watch(axis_controller, axis_controller.name())
+				metrics = registry.controller(axis_controller, 'axis', health, self.index)
+			axis_plan.append((axis_controller, health, metrics, tuple(entries),
+				array('l', [0] * len(entries)), array('l', [_AXIS_UNSET] * len(entries))))
+
+		button_plan = []
+		for button_controller in button_controllers:
+			old = reuse.get(id(button_controller))
+			if old is not None and keep_state:
+				button_plan.append(old)
+				continue
+			if old is not None:
+				health, metrics = old[1], old[2]
+			else:
+				health = supervisor.watch(button_controller, button_controller.name())
+				metrics = registry.controller(button_controller, 'button', health, self.index)
+			button_plan.append((button_controller, health, metrics, tuple(button_controller.get_events()), [0],
+				button_controller.create_debouncer()))
+
+		return tuple(axis_plan), tuple(button_plan)
+
+	# Apply a new configuration to the running joystick. Controllers whose configuration did
+	# not change are kept, connected and with their last emitted state; the rest are closed
+	# and created again. The output sink is only recreated when the set of events it supports
+	# or the output type changes, so applications do not see the device going away.
+	#
+	# The new controllers are validated before touching the running ones: if the configuration
+	# is not valid the exception is raised and the joystick is left as it was. The emit plan
+	# is swapped with the device lock held, between two frames.
+	#
+	# Reloading is done in two steps, prepare_reload and apply_reload, so the joystick can
+	# keep being updated while the new devices are connected.
+	def reload(self, joystick_conf):
+		self.prepare_reload(joystick_conf)
+		self.apply_reload()
+
+	# Validate the new configuration and create and connect the new controllers, without
+	# touching the running ones, so it can be called while the joystick is being updated.
+	# A new controller named as a removed one may use the same device, so it is connected
+	# by apply_reload once the old one is closed.
+	def prepare_reload(self, joystick_conf):
+		self.discard_reload()
 
+		button_controllers, button_confs, new_buttons, removed_buttons = self._diff_controllers(
+			self._button_controllers, self._button_confs, joystick_conf["buttonControllers"], get_button_controller)
+		try:
+			axis_controllers, axis_confs, new_axis, removed_axis = self._diff_controllers(
+				self._axis_controllers, self._axis_confs, joystick_conf["axisControllers"], get_axis_controller)
+		except Exception:
+			for controller in new_buttons:
+				controller.close()
+			raise
+
+		removed_names = set(controller.name() for controller in removed_axis + removed_buttons)
+		deferred = []
+		for controllers, confs, created in ((axis_controllers, axis_confs, new_axis), (button_controllers, button_confs, new_buttons)):
+			for controller in list(created):
+				if controller.name() in removed_names:
+					deferred.append(controller)
+				else:
+					self._connect_created(controller, controllers, confs, created)
+
+		self._pending_reload = (joystick_conf, axis_controllers, axis_confs, new_axis, removed_axis,
+			button_controllers, button_confs, new_buttons, removed_buttons, deferred)
+
+	# Drop the prepared reload, closing its new controllers
+	def discard_reload(self):
+		if self._pending_reload is not None:
+			for controller in self._pending_reload[3] + self._pending_reload[7]:
+				controller.close()
+			self._pending_reload = None
+
+	# Apply the reload prepared by prepare_reload: close the removed controllers, connect the
+	# deferred ones and swap the emit plan. Nothing may update the joystick meanwhile, as the
+	# update workers refer to the controllers by position.
+	def apply_reload(self):
+		if self._pending_reload is None:
+			return
+		(joystick_conf, axis_controllers, axis_confs, new_axis, removed_axis,
+			button_controllers, button_confs, new_buttons, removed_buttons, deferred) = self._pending_reload
+		self._pending_reload = None
+
+		old_events = set(self._get_events(self._axis_controllers, self._button_controllers))
+		old_output_type = self.output_type
+		old_plans = {}
+		for plan in self._axis_plan + self._button_plan:
+			old_plans[id(plan[0])] = plan
+
+		# Release the removed devices before connecting the deferred ones, they may be the same
+		supervisor = get_supervisor()
+		registry = get_registry()
+		for controller in removed_axis + removed_buttons:
+			plan = old_plans.get(id(controller))
+			if plan is not None:
+				supervisor.unwatch(plan[1])
+				registry.remove(plan[2])
+			controller.close()
+
+		for controllers, confs, created in ((axis_controllers, axis_confs, new_axis), (button_controllers, button_confs, new_buttons)):
+			for controller in [controller for controller in created if controller in deferred]:
+				self._connect_created(controller, controllers, confs, created)
+
+		self._read_options(joystick_conf)
+		events = self._get_events(axis_controllers, button_controllers)
+		new_device = None
+		if set(events) != old_events or self.output_type != old_output_type:
+			new_device = get_output_sink(self.output_type, events, self._max_records)
+			self._logger.info("[reload] Events changed, output device recreated")
+		axis_plan, button_plan = self._build_emit_plan(axis_controllers, button_controllers,
+			old_plans, keep_state=new_device is None)
+
+		# A kept device still shows the buttons the removed controllers had pressed
+		released = ()
+		if new_device is None:
+			released = self._carry_pressed_buttons([old_plans[id(c)] for c in removed_buttons if id(c) in old_plans],
+				button_plan, new_buttons)
+
+		with self._device_lock:
+			old_device = self._device
+			if new_device is not None:
+				self._device = new_device
+			elif released:
+				for event in released:
+					old_device.emit(event, 0, syn=False)
+				old_device.syn()
+			self._axis_controllers = axis_controllers
+			self._axis_confs = axis_confs
+			self._num_axis_controllers = len(axis_controllers)
+			self._button_controllers = button_controllers
+			self._button_confs = button_confs
+			self._num_button_controllers = len(button_controllers)
+			self._axis_plan = axis_plan
+			self._button_plan = button_plan
+
+		if new_device is not None:
+			old_device.destroy()
+		self._logger.info("[reload] {} controllers kept, {} created, {} removed".format(
+			len(axis_controllers) + len(button_controllers) - len(new_axis) - len(new_buttons),
+			len(new_axis) + len(new_buttons), len(removed_axis) + len(removed_buttons)))
+
+	# Start the new button controllers of button_plan from the buttons pressed on the device
+	# by the removed ones, so held buttons are neither released nor pressed again, and the
+	# ones released meanwhile are reported on the next update. Returns the pressed events
+	# no new controller maps, to be released.
+	def _carry_pressed_buttons(self, removed_plans, button_plan, new_buttons):
+		pressed = set()
+		for plan in removed_plans:
+			events, mask = plan[3], plan[4][0]
+			while mask:
+				bit = mask & -mask
+				pressed.add(events[bit.bit_length() - 1])
+				mask ^= bit
+
+		for controller, health, metrics, events, state, debouncer in button_plan:
+			if controller not in new_buttons:
+				continue
+			mask = 0
+			for i, event in enumerate(events):
+				if event in pressed:
+					mask |= 1 << i
+					pressed.discard(event)
+			state[0] = mask
+			if debouncer is not None:
+				debouncer.start(mask)
+		return sorted(pressed)
+
+	# Connect a controller created by a reload, holding its bus while the bus worker may be
+	# running. If it fails, it is closed and dropped from controllers, confs and created.
+	def _connect_created(self, controller, controllers, confs, created):
+		with get_bus_lock(controller.bus()):
+			connected = controller.connect()
+		if not connected:
+			self._logger.error("[reload] Could not connect {}".format(controller.name()))
+			controller.close()
+			index = controllers.index(controller)
+			del controllers[index]
+			del confs[index]
+			created.remove(controller)
+
+	# Match the new controller configurations with the running controllers. Returns the new
+	# lists of controllers and configurations, the controllers to create (not connected yet)
+	# and the ones to remove.
+	def _diff_controllers(self, controllers, confs, new_confs, factory):
+		available = list(zip(confs, controllers))
+		new_controllers = []
+		kept_confs = []
+		created = []
+		try:
+			for new_conf in new_confs:
+				match = next((pair for pair in available if pair[0] == new_conf), None)
+				if match is not None:
+					available.remove(match)
+					new_controllers.append(match[1])
+				else:
+					conf = copy.deepcopy(new_conf)
+					controller = factory(new_conf, connect=False)
+					if controller is None:
+						raise ValueError("Controller type {0} not found.".format(new_conf.get("type")))
+					created.append(controller)
+					new_controllers.append(controller)
+					new_conf = conf
+				kept_confs.append(copy.deepcopy(new_conf))
+		except Exception:
+			for controller in created:
+				controller.close()
+			raise
+		return new_controllers, kept_confs, created, [pair[1] for pair in available]
+
+	# Close the controllers and the output device
+	def close(self):
+		self.discard_reload()
+		supervisor = get_supervisor()
+		registry = get_registry()
+		for plan in self._axis_plan + self._button_plan:
+			supervisor.unwatch(plan[1])
+			registry.remove(plan[2])
+			plan[0].close()
+		self._device.destroy()
+
+	# Update axis and buttons. All changes of the frame are reported with a single SYN_REPORT.
 	def update(self):
-		# Update axis and buttons
-		self.update_axis()
-		self.update_buttons()
+		if self.update_axis(syn=False) + self.update_buttons(syn=False) > 0:
+			self.syn()
+
+	# Output sink receiving the events of the joystick
+	def output(self):
+		return self._device
+
+	# Health state of every controller of the joystick
+	def health(self):
+		return [plan[1].as_dict() for plan in self._axis_plan + self._button_plan]
+
+	# Close the current frame with a SYN_REPORT
+	def syn(self):
+		with self._device_lock:
+			self._device.syn()
 
 	def num_axis_controllers (self):
 		return self._num_axis_controllers
 
-	def update_axis(self):
+	def axis_controllers (self):
+		return self._axis_controllers
+
+	# Emit the axis that changed since the last update. Returns the number of emitted events.
+	# If syn is True and something changed, a SYN_REPORT closes the frame.
+	def update_axis(self, syn=True):
+		emitted = 0
+
 		# For each axis controller, update the value of the axis in uinput device
-		for axis_controller in self._axis_controllers:
-			num_axis = axis_controller.num_mapped_axis()
-			for i in range(num_axis):
-				try:
-					axis_value = int(axis_controller.axis_value(i))
-				except:
-					axis_controller.connect() # if connection lost, retry connect
+		for plan in self._axis_plan:
+			emitted += self._update_axis_plan(plan)
+
+		if syn and emitted > 0:
+			self.syn()
+		return emitted
+
+	# Same as update_axis, for the axis controller in position index only
+	def update_axis_controller(self, index, syn=True):
+		emitted = self._update_axis_plan(self._axis_plan[index])
+		if syn and emitted > 0:
+			self.syn()
+		return emitted
+
+	# Read all the axis of the controller, then emit the changed ones
+	def _update_axis_plan(self, plan):
+		axis_controller, health, metrics, entries, values, state = plan
+		if not health.online:
+			axis_controller.drain_events() # an event fd left ready would wake the worker again
+			return 0
+		start = time.perf_counter_ns()
+		try:
+			with health.bus_lock:
+				axis_controller.poll()
+				for i, event in entries:
+					values[i] = int(axis_controller.axis_value(i))
+		except Exception as ex:
+			metrics.errors += 1
+			health.failed(ex) # if connection lost, reconnect in background
+			return 0
+		metrics.latency.observe(time.perf_counter_ns() - start)
+		metrics.polls += 1
+
+		emitted = 0
+		tolerance = self.axis_tolerance
+		with self._device_lock:
+			device = self._device
+			for i, event in entries:
+				# Skip unchanged values and jitter, but always let the axis go back to center
+				axis_value = values[i]
+				last_value = state[i]
+				if axis_value == last_value or (axis_value != 0 and abs(axis_value - last_value) <= tolerance):
 					continue
-				
-				event = axis_controller.get_events()[i][:-4] #- (-32766, 32766, 0, 0)
-				self._device.emit(event, axis_value, syn=True if i == (num_axis-1) else False)
-				
+
+				device.emit(event, axis_value, syn=False)
+				state[i] = axis_value
+				emitted += 1
+		metrics.events += emitted
+		return emitted
 
 	def num_button_controllers (self):
 		return self._num_button_controllers
 
-	def update_buttons(self):
+	def button_controllers (self):
+		return self._button_controllers
+
+	# Emit the buttons that changed since the last update. Returns the number of emitted events.
+	# If syn is True and something changed, a SYN_REPORT closes the frame.
+	def update_buttons(self, syn=True):
+		emitted = 0
+
 		# For each button controller, update button status of uinput device
-		for i in range(self._num_button_controllers):
-			button_controller = self._button_controllers[i]
-			num_buttons = button_controller.num_mapped_buttons()
-			for j in range(num_buttons):
-				value = button_controller.button_status(j)
-				try:
-					event = button_controller.get_events()[j]
-				except:
-					button_controller.connect() # if connection lost, retry connect
-					continue
-				if value == ButtonStatus.PRESSED and self._last_button_state[i][j] == ButtonStatus.UNPRESSED:
-					self._device.emit(event, 1)
-					self._last_button_state[i][j] = ButtonStatus.PRESSED
-				elif value == ButtonStatus.UNPRESSED and self._last_button_state[i][j] == ButtonStatus.PRESSED:
-					self._device.emit(event, 0)
-					self._last_button_state[i][j] = ButtonStatus.UNPRESSED					
+		for plan in self._button_plan:
+			emitted += self._update_button_plan(plan)
+
+		if syn and emitted > 0:
+			self.syn()
+		return emitted
+
+	# Same as update_buttons, for the button controller in position index only
+	def update_button_controller(self, index, syn=True):
+		emitted = self._update_button_plan(self._button_plan[index])
+		if syn and emitted > 0:
+			self.syn()
+		return emitted
+
+	def _update_button_plan(self, plan):
+		button_controller, health, metrics, events, state, debouncer = plan
+		if not health.online:
+			button_controller.drain_events() # an event fd left ready would wake the worker again
+			return 0
+		start = time.perf_counter_ns()
+		try:
+			with health.bus_lock:
+				button_controller.poll()
+				mask = button_controller.buttons_mask()
+		except Exception as ex:
+			metrics.errors += 1
+			health.failed(ex) # if connection lost, reconnect in background
+			return 0
+		metrics.latency.observe(time.perf_counter_ns() - start)
+		metrics.polls += 1
+
+		if debouncer is not None:
+			mask = debouncer.update(mask)
+
+		# Walk the changed bits from the lowest one
+		emitted = 0
+		changed = mask ^ state[0]
+		if changed:
+			with self._device_lock:
+				device = self._device
+				state[0] = mask
+				while changed:
+					bit = changed & -changed
+					device.emit(events[bit.bit_length() - 1], 1 if mask & bit else 0, syn=False)
+					changed ^= bit
+					emitted += 1
+			metrics.events += emitted
+		return emitted
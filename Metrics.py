@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+    Metrics for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+import socket
+import logging
+import threading
+
+from array import array
+from bisect import bisect_left
+
+module_logger = logging.getLogger('Joyspyck.Metrics')
+
+# Upper bounds of the latency histogram buckets, in ns (from 50 us to 100 ms). Values
+# above the last one go to the +Inf bucket.
+LATENCY_BUCKETS_NS = (
+	50000, 100000, 250000, 500000,
+	1000000, 2500000, 5000000, 10000000,
+	25000000, 50000000, 100000000,
+)
+
+# Histogram with fixed buckets. observe only does a bisect and two additions.
+class Histogram (object):
+
+	def __init__(self, bounds=LATENCY_BUCKETS_NS):
+		self.bounds = bounds
+		self.counts = array('Q', [0] * (len(bounds) + 1))
+		self.sum = 0
+
+	def observe(self, value):
+		self.counts[bisect_left(self.bounds, value)] += 1
+		self.sum += value
+
+	def count(self):
+		return sum(self.counts)
+
+# Counters of one controller, updated by the joystick update loop. Each controller is
+# only updated from one thread at a time, so no locking is needed.
+class ControllerMetrics (object):
+
+	def __init__(self, controller, kind, health, joystick=0):
+		self.name = controller.name()
+		self.kind = kind
+		self.joystick = joystick
+		self.bus = controller.bus()
+		self.health = health
+		self.polls = 0
+		self.events = 0
+		self.errors = 0
+		self.latency = Histogram()	# Time of poll plus reading all values, in ns
+
+# MetricsRegistry keeps the metrics of every controller and the stats of the update
+# loops (schedulers), and renders them in the Prometheus text format.
+class MetricsRegistry (object):
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._controllers = {}
+		self._stats = {}
+
+	# Metrics of a controller of the joystick with the given index. Controllers are keyed by
+	# joystick, kind and name, so joysticks may use the same controller names.
+	def controller(self, controller, kind, health, joystick=0):
+		metrics = ControllerMetrics(controller, kind, health, joystick)
+		with self._lock:
+			self._controllers[(joystick, kind, metrics.name)] = metrics
+		return metrics
+
+	def remove(self, metrics):
+		key = (metrics.joystick, metrics.kind, metrics.name)
+		with self._lock:
+			if self._controllers.get(key) is metrics:
+				del self._controllers[key]
+
+	# Add a source of loop stats: stats is called on every render and returns a dict,
+	# like PeriodicScheduler.stats
+	def add_stats(self, name, stats):
+		with self._lock:
+			self._stats[name] = stats
+
+	def render(self):
+		with self._lock:
+			controllers = list(self._controllers.values())
+			stats = list(self._stats.items())
+
+		lines = []
+		lines.append("# HELP joyspyck_controller_read_seconds Time polling a controller and reading its values.")
+		lines.append("# TYPE joyspyck_controller_read_seconds histogram")
+		for metrics in controllers:
+			labels = _labels(joystick=metrics.joystick, controller=metrics.name, kind=metrics.kind, bus=_bus_label(metrics.bus))
+			cumulative = 0
+			for bound, count in zip(metrics.latency.bounds + (None,), metrics.latency.counts):
+				cumulative += count
+				le = "+Inf" if bound is None else repr(bound / 1000000000)
+				lines.append("joyspyck_controller_read_seconds_bucket{{{},le=\"{}\"}} {}".format(labels, le, cumulative))
+			lines.append("joyspyck_controller_read_seconds_sum{{{}}} {}".format(labels, metrics.latency.sum / 1000000000))
+			lines.append("joyspyck_controller_read_seconds_count{{{}}} {}".format(labels, cumulative))
+
+		for name, help_text, value in (
+				('polls_total', 'Polls of the controller.', lambda m: m.polls),
+				('events_total', 'Events emitted for the controller.', lambda m: m.events),
+				('errors_total', 'Failed polls of the controller.', lambda m: m.errors),
+				('reconnects_total', 'Reconnections of the controller.', lambda m: m.health.reconnects),
+				('online', 'Whether the controller is online.', lambda m: int(m.health.online))):
+			lines.append("# HELP joyspyck_controller_{} {}".format(name, help_text))
+			lines.append("# TYPE joyspyck_controller_{} {}".format(name, 'gauge' if name == 'online' else 'counter'))
+			for metrics in controllers:
+				labels = _labels(joystick=metrics.joystick, controller=metrics.name, kind=metrics.kind, bus=_bus_label(metrics.bus))
+				lines.append("joyspyck_controller_{}{{{}}} {}".format(name, labels, value(metrics)))
+
+		# Loop stats: counters end in _total, the rest are gauges
+		samples = {}
+		for loop, loop_stats in stats:
+			try:
+				values = loop_stats()
+			except Exception as ex:
+				module_logger.debug("[render] Stats of {} not available: {}".format(loop, str(ex)))
+				continue
+			for key, value in values.items():
+				samples.setdefault(key, []).append((loop, value))
+		for key, values in samples.items():
+			counter = key in ('ticks', 'overruns', 'skipped')
+			name = "joyspyck_loop_{}{}".format(key, '_total' if counter else '')
+			lines.append("# TYPE {} {}".format(name, 'counter' if counter else 'gauge'))
+			for loop, value in values:
+				lines.append("{}{{{}}} {}".format(name, _labels(loop=loop), value))
+
+		return "\n".join(lines) + "\n"
+
+def _labels(**labels):
+	return ",".join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+		for key, value in labels.items())
+
+def _bus_label(bus):
+	return "none" if bus is None else "-".join(str(part) for part in bus)
+
+# MetricsExporter publishes the registry in the Prometheus text format, rewriting a file
+# every `interval` seconds (for the node_exporter textfile collector, for example) and/or
+# answering every connection to a Unix socket with the current metrics.
+class MetricsExporter (object):
+
+	def __init__(self, registry, file_path=None, socket_path=None, interval=5.0):
+		self._logger = logging.getLogger('Joyspyck.Metrics')
+		self._registry = registry
+		self._file_path = file_path
+		self._socket_path = socket_path
+		self._interval = interval
+		self._stop_event = threading.Event()
+		self._threads = []
+		self._socket = None
+
+	def start(self):
+		if self._file_path is not None:
+			self._threads.append(threading.Thread(target=self._write_file_loop, name="metrics-file", daemon=True))
+		if self._socket_path is not None:
+			if os.path.exists(self._socket_path):
+				os.unlink(self._socket_path)
+			self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			self._socket.bind(self._socket_path)
+			self._socket.listen(4)
+			self._socket.settimeout(self._interval)
+			self._threads.append(threading.Thread(target=self._serve_loop, name="metrics-socket", daemon=True))
+		for thread in self._threads:
+			thread.start()
+
+	def stop(self):
+		self._stop_event.set()
+		for thread in self._threads:
+			thread.join()
+		if self._file_path is not None:
+			self.write_file()
+		if self._socket is not None:
+			self._socket.close()
+			os.unlink(self._socket_path)
+
+	# Write the metrics to a temporary file and rename it, so readers never see a partial file
+	def write_file(self):
+		tmp_path = self._file_path + ".tmp"
+		with open(tmp_path, "w") as metrics_file:
+			metrics_file.write(self._registry.render())
+		os.replace(tmp_path, self._file_path)
+
+	def _write_file_loop(self):
+		while not self._stop_event.is_set():
+			try:
+				self.write_file()
+			except OSError as ex:
+				self._logger.error("[write_file] Could not write metrics: {}".format(str(ex)))
+			self._stop_event.wait(self._interval)
+
+	def _serve_loop(self):
+		while not self._stop_event.is_set():
+			try:
+				connection, _ = self._socket.accept()
+			except socket.timeout:
+				continue
+			except OSError:
+				break
+			with connection:
+				try:
+					connection.sendall(self._registry.render().encode())
+				except OSError as ex:
+					self._logger.debug("[serve] Could not send metrics: {}".format(str(ex)))
+
+
+_registry = None
+
+# Registry shared by all joysticks
+def get_registry():
+	global _registry
+	if _registry is None:
+		_registry = MetricsRegistry()
+	return _registry
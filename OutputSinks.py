@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+    OutputSinks for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import os
+import time
+import fcntl
+import struct
+import logging
+
+from collections import deque
+
+module_logger = logging.getLogger('Joyspyck.OutputSinks')
+
+# Type and code of the SYN_REPORT event, as the event tuples of UInputEvents
+SYN_REPORT = (0x00, 0x00)
+
+# uinput interface, see linux/uinput.h and linux/input.h
+UINPUT_PATH = '/dev/uinput'
+UI_DEV_CREATE  = 0x5501
+UI_DEV_DESTROY = 0x5502
+UI_SET_EVBIT   = 0x40045564
+UI_SET_KEYBIT  = 0x40045565
+UI_SET_ABSBIT  = 0x40045567
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_ABS = 0x03
+ABS_CNT = 0x40
+UINPUT_MAX_NAME_SIZE = 80
+
+# struct input_event: struct timeval (zero, the kernel sets the time), type, code, value
+INPUT_EVENT = struct.Struct('llHHi')
+
+# struct uinput_user_dev: name, struct input_id (bustype, vendor, product, version),
+# ff_effects_max, absmax, absmin, absfuzz and absflat
+UINPUT_USER_DEV = struct.Struct('{}sHHHHI{}i'.format(UINPUT_MAX_NAME_SIZE, 4 * ABS_CNT))
+
+# Types of output sinks
+OUTPUT_SINKS = ('uinput', 'raw', 'recorder', 'null')
+
+# Records kept by a RecorderSink, the oldest ones are dropped first
+DEFAULT_MAX_RECORDS = 100000
+
+# Factory to generate OutputSinks depending on the supplied type. max_records is only
+# used by the recorder.
+def get_output_sink(sink_type, events, max_records=DEFAULT_MAX_RECORDS):
+	if sink_type == "uinput":
+		return UInputSink(events)
+	elif sink_type == "raw":
+		return RawUInputSink(events)
+	elif sink_type == "recorder":
+		return RecorderSink(events, max_records)
+	elif sink_type == "null":
+		return NullSink(events)
+	raise ValueError("Output {0} is not one of {1}.".format(sink_type, ", ".join(OUTPUT_SINKS)))
+
+# OutputSink is where a Joystick sends its events. The interface is the one of
+# uinput.Device: emit(event, value, syn) and syn(), where events are the
+# (type, code) tuples of UInputEvents.
+class OutputSink (object):
+
+	def __init__(self, events):
+		self._events = events
+
+	def emit(self, event, value, syn=True):
+		pass
+
+	def syn(self):
+		pass
+
+	def destroy(self):
+		pass
+
+# Real uinput device, created with python-uinput. emit and syn are the device methods
+# themselves, so this sink adds no cost to every event.
+class UInputSink (OutputSink):
+
+	def __init__(self, events):
+		super().__init__(events)
+		import uinput
+		self._device = uinput.Device(events)
+		self.emit = self._device.emit
+		self.syn = self._device.syn
+
+	def destroy(self):
+		self._device.destroy()
+
+# uinput device written directly, without python-uinput. Events are packed as struct
+# input_event in a preallocated buffer and every frame, including its SYN_REPORT, is
+# sent with a single write to /dev/uinput instead of one write per event.
+#
+# The device is created with the same name and ids as python-uinput, so it is seen
+# the same way by the system and by the applications configured for it.
+class RawUInputSink (OutputSink):
+
+	NAME = b'python-uinput'
+
+	def __init__(self, events):
+		super().__init__(events)
+		self._fd = None
+
+		# Room for every event of the device changing in the same frame, plus the SYN_REPORT
+		self._capacity = len(events) + 1
+		self._buffer = bytearray(INPUT_EVENT.size * self._capacity)
+		self._view = memoryview(self._buffer)
+		self._offset = 0
+		self._end = len(self._buffer) - INPUT_EVENT.size
+
+		self._fd = os.open(UINPUT_PATH, os.O_WRONLY | os.O_NONBLOCK)
+		try:
+			self._create(events)
+		except OSError:
+			os.close(self._fd)
+			self._fd = None
+			raise
+
+	# Legacy uinput setup: enable every event type and code, write the device description
+	# and create it
+	def _create(self, events):
+		absmax = [0] * ABS_CNT
+		absmin = [0] * ABS_CNT
+		absfuzz = [0] * ABS_CNT
+		absflat = [0] * ABS_CNT
+		ev_types = set()
+		for event in events:
+			ev_type, code = event[0], event[1]
+			if ev_type not in ev_types:
+				fcntl.ioctl(self._fd, UI_SET_EVBIT, ev_type)
+				ev_types.add(ev_type)
+			if ev_type == EV_KEY:
+				fcntl.ioctl(self._fd, UI_SET_KEYBIT, code)
+			elif ev_type == EV_ABS:
+				fcntl.ioctl(self._fd, UI_SET_ABSBIT, code)
+				if len(event) == 6:
+					absmin[code], absmax[code], absfuzz[code], absflat[code] = event[2:]
+
+		user_dev = UINPUT_USER_DEV.pack(self.NAME, 0, 0, 0, 0, 0, *(absmax + absmin + absfuzz + absflat))
+		os.write(self._fd, user_dev)
+		fcntl.ioctl(self._fd, UI_DEV_CREATE)
+
+	def emit(self, event, value, syn=True):
+		if self._offset > self._end:
+			self._flush()
+		INPUT_EVENT.pack_into(self._buffer, self._offset, 0, 0, event[0], event[1], value)
+		self._offset += INPUT_EVENT.size
+		if syn:
+			self.syn()
+
+	def syn(self):
+		if self._offset > self._end:
+			self._flush()
+		INPUT_EVENT.pack_into(self._buffer, self._offset, 0, 0, EV_SYN, 0, 0)
+		self._offset += INPUT_EVENT.size
+		self._flush()
+
+	def _flush(self):
+		os.write(self._fd, self._view[:self._offset])
+		self._offset = 0
+
+	def destroy(self):
+		if self._fd is not None:
+			fcntl.ioctl(self._fd, UI_DEV_DESTROY)
+			os.close(self._fd)
+			self._fd = None
+
+	def __del__(self):
+		try:
+			self.destroy()
+		except OSError:
+			pass
+
+# Keeps every event in memory as a (timestamp, event, value, syn) tuple, with the
+# timestamp in monotonic ns. SYN_REPORTs are recorded as (timestamp, SYN_REPORT, 0, True).
+# With max_records, only the last ones are kept.
+class RecorderSink (OutputSink):
+
+	def __init__(self, events, max_records=DEFAULT_MAX_RECORDS):
+		super().__init__(events)
+		self.records = deque(maxlen=max_records)
+
+	def emit(self, event, value, syn=True):
+		timestamp = time.monotonic_ns()
+		self.records.append((timestamp, event, value, False))
+		if syn:
+			self.records.append((timestamp, SYN_REPORT, 0, True))
+
+	def syn(self):
+		self.records.append((time.monotonic_ns(), SYN_REPORT, 0, True))
+
+	def clear(self):
+		self.records.clear()
+
+# Drops the events, only counting them
+class NullSink (OutputSink):
+
+	def __init__(self, events):
+		super().__init__(events)
+		self.events = 0
+		self.syns = 0
+
+	def emit(self, event, value, syn=True):
+		self.events += 1
+		if syn:
+			self.syns += 1
+
+	def syn(self):
+		self.syns += 1
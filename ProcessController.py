@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+    ProcessController for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+import struct
+import atexit
+import logging
+import threading
+import multiprocessing
+
+from multiprocessing import shared_memory
+
+from AxisControllers.AxisManager import AxisController
+from ButtonControllers.ButtonManager import ButtonController
+
+module_logger = logging.getLogger('Joyspyck.ProcessController')
+
+# Default polling period of an isolated controller, in seconds
+DEFAULT_ISOLATED_PERIOD = 0.01
+
+# A sample older than this number of periods means the controller process is hung
+STALE_PERIODS = 50
+
+# Time given to a new controller process to import, connect and publish its first sample
+STARTUP_TIMEOUT_NS = 15 * 1000000000
+
+# Sample ring in shared memory:
+#  - Header: number of published samples.
+#  - RING_SLOTS slots: sequence, timestamp (ns), status and one double per mapped input.
+#    The sequence is odd while the slot is being written (seqlock), so a reader never
+#    takes a half written sample.
+RING_SLOTS = 8
+_HEADER = struct.Struct('Q')
+_SLOT_HEADER = struct.Struct('QqI4x')
+
+class SampleStatus:
+	OK = 0
+	ERROR = 1
+
+class SampleRing (object):
+
+	def __init__(self, num_values, name=None):
+		self._values = struct.Struct('{}d'.format(num_values))
+		self._slot_size = _SLOT_HEADER.size + self._values.size
+		if name is None:
+			self._shm = shared_memory.SharedMemory(create=True, size=_HEADER.size + RING_SLOTS * self._slot_size)
+			_HEADER.pack_into(self._shm.buf, 0, 0)
+		else:
+			self._shm = shared_memory.SharedMemory(name=name)
+		self._published = _HEADER.unpack_from(self._shm.buf, 0)[0]
+
+	def name(self):
+		return self._shm.name
+
+	def publish(self, values, status=SampleStatus.OK):
+		buf = self._shm.buf
+		count = self._published
+		offset = _HEADER.size + (count % RING_SLOTS) * self._slot_size
+		_SLOT_HEADER.pack_into(buf, offset, 2 * count + 1, time.monotonic_ns(), status)
+		self._values.pack_into(buf, offset + _SLOT_HEADER.size, *values)
+		_SLOT_HEADER.pack_into(buf, offset, 2 * count + 2, time.monotonic_ns(), status)
+		self._published = count + 1
+		_HEADER.pack_into(buf, 0, self._published)
+
+	# Returns (count, timestamp, status, values) of the latest sample, None if nothing
+	# has been published yet.
+	def latest(self):
+		buf = self._shm.buf
+		while True:
+			count = _HEADER.unpack_from(buf, 0)[0]
+			if count == 0:
+				return None
+			offset = _HEADER.size + ((count - 1) % RING_SLOTS) * self._slot_size
+			seq, timestamp, status = _SLOT_HEADER.unpack_from(buf, offset)
+			values = self._values.unpack_from(buf, offset + _SLOT_HEADER.size)
+			if seq == 2 * count and _SLOT_HEADER.unpack_from(buf, offset)[0] == seq:
+				return count, timestamp, status, values
+
+	def close(self):
+		self._shm.close()
+
+	def unlink(self):
+		self._shm.unlink()
+
+
+# Entry point of the controller processes. Builds the real controller from its config,
+# then polls it at a fixed rate and publishes every sample in the ring.
+def _controller_main(kind, config, ring_name, num_values, period, stop_event):
+	from Scheduler import PeriodicScheduler
+
+	# Spawned processes share the resource tracker of the parent, which owns and unlinks
+	# the shared memory.
+	ring = SampleRing(num_values, ring_name)
+
+	if kind == 'axis':
+		from AxisControllers.AxisManager import get_axis_controller
+		controller = get_axis_controller(config)
+	else:
+		from ButtonControllers.ButtonManager import get_button_controller
+		controller = get_button_controller(config)
+
+	if controller is None:
+		return
+
+	values = [0.0] * num_values
+	scheduler = PeriodicScheduler(period)
+	scheduler.start()
+	while not stop_event.is_set():
+		try:
+			controller.poll()
+			if kind == 'axis':
+				for i in range(num_values):
+					values[i] = controller.axis_value(i)
+			else:
+				values[0] = controller.buttons_mask()
+			ring.publish(values)
+		except Exception:
+			ring.publish(values, SampleStatus.ERROR)
+			controller.connect() # if connection lost, retry connect
+		scheduler.wait()
+	ring.close()
+
+
+# Base of the controllers running the real hardware controller in its own process. The
+# joystick side only reads the latest sample from shared memory, so a slow, hung or
+# crashing device never blocks the update of the other controllers.
+class _IsolatedController (object):
+
+	def _init_isolation(self, kind, num_values):
+		self._logger = logging.getLogger('Joyspyck.ProcessController')
+		self._kind = kind
+		self._num_values = num_values
+		self._child_config = dict(self._config)
+		self._child_config['isolated'] = False
+		self._period = float(self._config.get('isolatedPeriod', DEFAULT_ISOLATED_PERIOD))
+		self._stale_ns = int(self._period * STALE_PERIODS * 1000000000)
+		self._ring = SampleRing(num_values)
+		self._last_count = 0
+		self._last_values = (0,) * num_values
+		self._process = None
+		self._stop_event = None
+		self._start_time = 0
+		self._start_count = 0
+		_isolated_controllers.append(self)
+
+	def connect(self):
+		try:
+			self._stop_process()
+			context = multiprocessing.get_context('spawn')
+			self._stop_event = context.Event()
+			self._process = context.Process(target=_controller_main, daemon=True,
+				name="joyspyck-{}".format(self._config['name']),
+				args=(self._kind, self._child_config, self._ring.name(), self._num_values, self._period, self._stop_event))
+			self._process.start()
+			self._start_time = time.monotonic_ns()
+			latest = self._ring.latest()
+			self._start_count = latest[0] if latest is not None else 0
+			self._logger.info("[connect] {} running in process {}".format(self._config['name'], self._process.pid))
+		except Exception as ex:
+			self._logger.error("[connect] Error starting process of {}:\n{}".format(self._config['name'], str(ex)))
+			return False
+		return True
+
+	def poll(self):
+		# Raising makes the joystick call connect, which restarts the process
+		if self._process is None or not self._process.is_alive():
+			raise RuntimeError("Process of {} is not running".format(self._config['name']))
+
+		sample = self._ring.latest()
+		if sample is None or sample[0] == self._start_count:
+			if time.monotonic_ns() - self._start_time > STARTUP_TIMEOUT_NS:
+				raise RuntimeError("Process of {} did not start publishing samples".format(self._config['name']))
+			return
+
+		count, timestamp, status, values = sample
+		if time.monotonic_ns() - timestamp > self._stale_ns:
+			raise RuntimeError("Process of {} is not publishing samples".format(self._config['name']))
+		if status != SampleStatus.OK or count == self._last_count:
+			return
+
+		self._last_count = count
+		self._last_values = values
+
+	def close(self):
+		self._stop_process()
+		self._ring.close()
+		self._ring.unlink()
+		if self in _isolated_controllers:
+			_isolated_controllers.remove(self)
+
+	# Kill the process without waiting for it, connect and close are called from the update
+	# threads. The dead process is reaped from a background thread.
+	def _stop_process(self):
+		if self._process is not None:
+			self._stop_event.set()
+			self._process.kill()
+			threading.Thread(target=self._process.join, daemon=True,
+				name="joyspyck-reap-{}".format(self._config['name'])).start()
+			self._process = None
+
+
+class ProcessAxisController (_IsolatedController, AxisController):
+
+	def __init__(self, config):
+		AxisController.__init__(self, config)
+		self._num_axis = self._num_events
+		self._init_isolation('axis', self._num_events)
+
+	def axis_value(self, index):
+		if index < 0 or index > (self._num_axis - 1):
+			return None
+		return self._last_values[index]
+
+
+class ProcessButtonController (_IsolatedController, ButtonController):
+
+	def __init__(self, config):
+		ButtonController.__init__(self, config)
+		self._num_buttons = self._num_events
+		self._init_isolation('button', 1)
+
+	def buttons_mask(self):
+		return int(self._last_values[0])
+
+	def button_status(self, index):
+		if index < 0 or index > (self._num_buttons - 1):
+			return None
+		return (self.buttons_mask() >> index) & 0x01
+
+
+# Stop every controller process and release the shared memory on exit
+_isolated_controllers = []
+
+@atexit.register
+def _close_isolated_controllers():
+	for controller in list(_isolated_controllers):
+		try:
+			controller.close()
+		except Exception:
+			pass
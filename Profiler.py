@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+    Profiler for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+import logging
+import threading
+
+import BusManager
+
+module_logger = logging.getLogger('Joyspyck.Profiler')
+
+# Methods doing bus I/O in the bus handles (busio, smbus, pyftdi and simulated buses)
+IO_METHODS = (
+	'readfrom_into', 'writeto', 'writeto_then_readfrom',
+	'read_byte', 'write_byte', 'read_byte_data', 'write_byte_data', 'read_word_data',
+	'write_word_data', 'read_i2c_block_data', 'write_i2c_block_data',
+	'read', 'write', 'transfer',
+)
+
+# Controller methods reading the device or its values
+AXIS_READ_METHODS = ('poll', 'axis_value')
+BUTTON_READ_METHODS = ('poll', 'buttons_mask', 'button_status')
+
+# Joystick methods timed as stages
+STAGE_METHODS = ('update', 'update_axis', 'update_buttons', 'update_axis_controller', 'update_button_controller')
+
+_MISSING = object()
+
+# Stand-in for bus handles whose methods cannot be replaced (C extension types like
+# smbus.SMBus). Methods are looked up in the handle, the I/O ones are timed.
+class _HandleProxy (object):
+
+	def __init__(self, handle, wrap):
+		self._handle = handle
+		self._wrap = wrap
+
+	def __getattr__(self, attr):
+		value = getattr(self._handle, attr)
+		if attr in IO_METHODS and callable(value):
+			return self._wrap(value)
+		return value
+
+# HotPathProfiler times the update path of the joysticks for a while and logs a flat
+# profile, splitting the time of every controller in bus I/O and the rest of its reading
+# (computation and conversion waits), plus the time emitting events.
+#
+# Nothing is checked in the update loops: start() replaces the methods of the objects
+# (joysticks, controllers, bus handles and output sinks) with timed versions, and stop()
+# puts the original ones back, so when not profiling the loops run untouched.
+class HotPathProfiler (object):
+
+	def __init__(self, joysticks):
+		self._logger = logging.getLogger('Joyspyck.Profiler')
+		self._joysticks = joysticks
+		self._saved = []
+		self._counters = {}
+		self._current = threading.local()	# Controller being read by each thread
+		self._start_time = None
+		self._elapsed = 0
+
+	def start(self):
+		self._counters = {}
+		handles = set(id(handle) for handle in BusManager.bus_handles())
+		patched = {}
+
+		for j, joystick in enumerate(self._joysticks):
+			joystick_name = "joystick{}".format(j)
+			for method in STAGE_METHODS:
+				self._patch(joystick, method, ('stage', "{}.{}".format(joystick_name, method)))
+
+			sink = joystick.output()
+			for method in ('emit', 'syn'):
+				self._patch(sink, method, ('emit', joystick_name))
+
+			for controllers, read_methods in ((joystick.axis_controllers(), AXIS_READ_METHODS),
+					(joystick.button_controllers(), BUTTON_READ_METHODS)):
+				for controller in controllers:
+					name = controller.name()
+					for method in read_methods:
+						self._patch(controller, method, ('read', name), controller=name)
+
+					# Bus I/O is done by the shared handles or by objects of the controller
+					for attr, value in list(vars(controller).items()):
+						if id(value) in handles or _has_io_methods(value):
+							self._patch_handle(controller, attr, value, patched)
+
+		self._start_time = time.perf_counter()
+		self._logger.info("[start] Profiling {} methods".format(len(self._saved)))
+
+	def stop(self):
+		self._elapsed = time.perf_counter() - self._start_time
+		for obj, attr, previous in reversed(self._saved):
+			if previous is _MISSING:
+				delattr(obj, attr)
+			else:
+				setattr(obj, attr, previous)
+		self._saved = []
+
+	# Profile for `seconds` in the background, then log the profile
+	def run_for(self, seconds):
+		self.start()
+		timer = threading.Timer(seconds, self._finish)
+		timer.daemon = True
+		timer.start()
+
+	def _finish(self):
+		self.stop()
+		for line in self.report():
+			self._logger.info("[profile] {}".format(line))
+
+	# Flat profile. Times are inclusive, except compute: reading time of the controller
+	# minus its bus I/O.
+	def report(self):
+		rows = []
+		io = {}
+		for (kind, name), (calls, total_ns) in self._counters.items():
+			if calls == 0:
+				continue
+			if kind == 'io':
+				io[name] = total_ns
+			rows.append((kind, name, calls, total_ns))
+		for (kind, name), (calls, total_ns) in self._counters.items():
+			if kind == 'read' and calls > 0:
+				rows.append(('compute', name, calls, total_ns - io.get(name, 0)))
+
+		order = ('stage', 'read', 'io', 'compute', 'emit')
+		rows.sort(key=lambda row: (order.index(row[0]), -row[3]))
+		elapsed_ns = self._elapsed * 1000000000 or 1
+		lines = ["{:.2f} s profiled, times in ms, % of wall time".format(self._elapsed),
+			"{:<8} {:<44} {:>9} {:>10} {:>9} {:>7}".format("kind", "name", "calls", "total", "mean us", "%")]
+		for kind, name, calls, total_ns in rows:
+			lines.append("{:<8} {:<44} {:>9} {:>10.2f} {:>9.1f} {:>7.2f}".format(kind, name, calls,
+				total_ns / 1000000, total_ns / calls / 1000 if calls else 0, 100 * total_ns / elapsed_ns))
+		return lines
+
+	def _counter(self, key):
+		if key not in self._counters:
+			self._counters[key] = [0, 0]
+		return self._counters[key]
+
+	# Replace obj.attr with a timed version. With controller, the controller is marked as
+	# the one being read while the method runs, so bus I/O is accounted to it.
+	def _patch(self, obj, attr, key, controller=None):
+		original = getattr(obj, attr, None)
+		if original is None:
+			return False
+		wrapped = self._timed(original, key, controller)
+		previous = getattr(obj, '__dict__', {}).get(attr, _MISSING)
+		try:
+			setattr(obj, attr, wrapped)
+		except (AttributeError, TypeError):
+			return False
+		self._saved.append((obj, attr, previous))
+		return True
+
+	def _patch_handle(self, controller, attr, handle, patched):
+		if id(handle) not in patched:
+			patched[id(handle)] = all(self._patch(handle, method, ('io', None)) for method in IO_METHODS
+				if callable(getattr(handle, method, None)))
+		if not patched[id(handle)]:
+			# Methods of C types can not be replaced, use a proxy in the controller
+			self._saved.append((controller, attr, handle))
+			setattr(controller, attr, _HandleProxy(handle, lambda method: self._timed(method, ('io', None))))
+
+	def _timed(self, method, key, controller=None):
+		clock = time.perf_counter_ns
+		current = self._current
+
+		# Bus I/O goes to the controller being read, or to "unknown". I/O methods calling
+		# other I/O methods (a driver calling the bus handle) are counted once.
+		if key == ('io', None):
+			def timed_io(*args, **kwargs):
+				if getattr(current, 'in_io', False):
+					return method(*args, **kwargs)
+				current.in_io = True
+				start = clock()
+				try:
+					return method(*args, **kwargs)
+				finally:
+					current.in_io = False
+					counter = self._counter(('io', getattr(current, 'name', None) or 'unknown'))
+					counter[0] += 1
+					counter[1] += clock() - start
+			return timed_io
+
+		counter = self._counter(key)
+		def timed(*args, **kwargs):
+			if controller is not None:
+				previous = getattr(current, 'name', None)
+				current.name = controller
+			start = clock()
+			try:
+				return method(*args, **kwargs)
+			finally:
+				counter[0] += 1
+				counter[1] += clock() - start
+				if controller is not None:
+					current.name = previous
+		return timed
+
+def _has_io_methods(value):
+	return not isinstance(value, (int, float, str, bytes, bytearray, list, tuple, dict)) and \
+		any(callable(getattr(value, method, None)) for method in IO_METHODS)
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+    Scheduler for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+import ctypes
+import logging
+
+module_logger = logging.getLogger('Joyspyck.Scheduler')
+
+CLOCK_MONOTONIC = 1
+TIMER_ABSTIME = 1
+EINTR = 4
+
+class _Timespec (ctypes.Structure):
+	_fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+# Interrupt driven controllers are also polled every this many periods of their joystick,
+# so a missed edge (for example one raised while the line was being reopened) does not
+# leave their inputs stuck until the next one.
+INTERRUPT_FALLBACK_PERIODS = 10
+
+# clock_nanosleep is not exposed by the time module, get it from libc if possible
+try:
+	_libc = ctypes.CDLL(None, use_errno=True)
+	_clock_nanosleep = _libc.clock_nanosleep
+	_clock_nanosleep.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(_Timespec), ctypes.c_void_p]
+	_clock_nanosleep.restype = ctypes.c_int
+except (OSError, AttributeError):
+	_clock_nanosleep = None
+
+# PeriodicScheduler runs a loop at a fixed rate. Deadlines are computed from the start
+# time on the monotonic clock, so the time spent working does not add to the period.
+#
+# If a tick ends after its deadline it is counted as an overrun, the missed deadlines are
+# skipped and the next tick starts right away. With absolute=True the sleep is done
+# with clock_nanosleep(TIMER_ABSTIME) up to the deadline instead of a relative sleep.
+class PeriodicScheduler (object):
+
+	def __init__(self, period, absolute=False):
+		self._logger = logging.getLogger('Joyspyck.Scheduler')
+		self._period_ns = int(period * 1000000000)
+		self._absolute = absolute
+		self._deadline = None
+		self._sleeping = False	# Waiting for a deadline, interrupted by ready fds
+		self._timespec = _Timespec()
+
+		if self._period_ns <= 0:
+			raise ValueError("Scheduler period must be greater than 0.")
+
+		if self._absolute and _clock_nanosleep is None:
+			self._logger.warning("[init] clock_nanosleep not available, using relative sleeps.")
+			self._absolute = False
+
+		self.reset_stats()
+
+	def period(self):
+		return self._period_ns / 1000000000
+
+	def reset_stats(self):
+		self._ticks = 0
+		self._overruns = 0
+		self._skipped = 0
+		self._lateness_sum_ns = 0
+		self._lateness_max_ns = 0
+
+	# Start counting deadlines from now
+	def start(self):
+		self._deadline = time.monotonic_ns() + self._period_ns
+		self._sleeping = False
+
+	# Sleep until the next deadline. Must be called at the end of every tick.
+	#
+	# If a select.poll object is given, the sleep is done waiting on it. When some fd gets
+	# ready before the deadline, the list of ready fds is returned and the tick is not
+	# over yet: the caller handles them and calls wait again. An empty list is returned
+	# once the deadline is reached.
+	def wait(self, poller=None):
+		if self._deadline is None:
+			self.start()
+
+		deadline = self._deadline
+		now = time.monotonic_ns()
+
+		if now >= deadline and not self._sleeping:
+			missed = (now - deadline) // self._period_ns
+			self._ticks += 1
+			self._overruns += 1
+			self._skipped += missed
+			self._deadline = deadline + (missed + 1) * self._period_ns
+			return []
+
+		if poller is not None:
+			while now < deadline:
+				ready = poller.poll((deadline - now + 999999) // 1000000)
+				if ready:
+					self._sleeping = True
+					return ready
+				now = time.monotonic_ns()
+		elif now < deadline:
+			if self._absolute:
+				self._timespec.tv_sec = deadline // 1000000000
+				self._timespec.tv_nsec = deadline % 1000000000
+				while _clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, self._timespec, None) == EINTR:
+					pass
+			else:
+				time.sleep((deadline - now) / 1000000000)
+
+		lateness = time.monotonic_ns() - deadline
+		self._ticks += 1
+		self._sleeping = False
+		self._lateness_sum_ns += lateness
+		if lateness > self._lateness_max_ns:
+			self._lateness_max_ns = lateness
+		self._deadline = deadline + self._period_ns
+		return []
+
+	# Statistics since the last reset. Jitter is the wake up lateness after a sleep.
+	def stats(self):
+		slept = self._ticks - self._overruns
+		return {
+			'ticks': self._ticks,
+			'overruns': self._overruns,
+			'skipped': self._skipped,
+			'jitter_mean_us': (self._lateness_sum_ns / slept / 1000) if slept > 0 else 0.0,
+			'jitter_max_us': self._lateness_max_ns / 1000,
+		}
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+    Supervisor for Joyspyck
+ 
+	Under MIT License
+
+    Copyright (c) 2019 Noemi Escudero del Olmo <noemi.escudero.del.olmo@gmail.com>
+ 
+	Permission is hereby granted, free of charge, to any person obtaining a copy of this software
+	and associated documentation files (the “Software”), to deal in the Software without restriction,
+	including without limitation the rights to use, copy, modify, merge, publish, distribute,
+	sublicense, and/or sell copies of the Software, and to permit persons to whom the Software is
+	furnished to do so, subject to the following conditions:
+
+	The above copyright notice and this permission notice shall be included in all copies or 
+	substantial portions of the Software.
+
+	THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT 
+	NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. 
+	IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+	WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE 
+	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+import time
+import random
+import logging
+import threading
+
+from BusManager import get_bus_lock
+
+module_logger = logging.getLogger('Joyspyck.Supervisor')
+
+# Reconnect backoff: first retry after BASE_DELAY seconds, doubling on every failed
+# attempt up to MAX_DELAY, each delay randomized by +-JITTER so devices sharing a bus
+# do not retry at the same time.
+BASE_DELAY = 0.1
+MAX_DELAY = 10.0
+JITTER = 0.2
+
+# A controller failing again before being online this long keeps its backoff delay
+STABLE_TIME = 5.0
+
+class HealthState:
+	ONLINE = 'online'
+	OFFLINE = 'offline'
+	RECONNECTING = 'reconnecting'
+
+# Health of one controller. Update loops only check `online` and skip the controller
+# while it is false; everything else is maintained by the supervisor. Update loops and
+# reconnects hold bus_lock, the lock of the bus of the controller, while using it.
+class ControllerHealth (object):
+
+	def __init__(self, supervisor, controller, name):
+		self._supervisor = supervisor
+		self.controller = controller
+		self.name = name
+		self.bus_lock = get_bus_lock(controller.bus())
+		self.online = True
+		self.state = HealthState.ONLINE
+		self.failures = 0
+		self.reconnects = 0
+		self.last_error = None
+		self.retry_time = 0
+		self.online_since = time.monotonic()
+
+	# Called from the update loop when the controller failed
+	def failed(self, error):
+		self._supervisor.report_failure(self, error)
+
+	def as_dict(self):
+		return {
+			'name': self.name,
+			'state': self.state,
+			'failures': self.failures,
+			'reconnects': self.reconnects,
+			'last_error': self.last_error,
+		}
+
+# ReconnectSupervisor reconnects failed controllers from a background thread, so a
+# missing device never slows down the update of the healthy ones.
+class ReconnectSupervisor (object):
+
+	def __init__(self, base_delay=BASE_DELAY, max_delay=MAX_DELAY, jitter=JITTER):
+		self._logger = logging.getLogger('Joyspyck.Supervisor')
+		self._base_delay = base_delay
+		self._max_delay = max_delay
+		self._jitter = jitter
+		self._controllers = []
+		self._offline = []
+		self._condition = threading.Condition()
+		self._thread = None
+
+	def watch(self, controller, name):
+		health = ControllerHealth(self, controller, name)
+		with self._condition:
+			self._controllers.append(health)
+		return health
+
+	# Stop watching a controller, removed from its joystick
+	def unwatch(self, health):
+		with self._condition:
+			if health in self._controllers:
+				self._controllers.remove(health)
+			if health in self._offline:
+				self._offline.remove(health)
+
+	def report_failure(self, health, error):
+		with self._condition:
+			if not health.online or health not in self._controllers:
+				return
+			now = time.monotonic()
+			if now - health.online_since > STABLE_TIME:
+				health.failures = 0
+			elif health.reconnects > 0:
+				health.failures += 1
+			health.online = False
+			health.state = HealthState.OFFLINE
+			health.last_error = str(error)
+			health.retry_time = now + self._delay(health.failures)
+			self._offline.append(health)
+			self._logger.warning("[report_failure] {} is offline: {}".format(health.name, health.last_error))
+			if self._thread is None or not self._thread.is_alive():
+				self._thread = threading.Thread(target=self._run, name="reconnect-supervisor", daemon=True)
+				self._thread.start()
+			self._condition.notify()
+
+	def health(self):
+		with self._condition:
+			return [health.as_dict() for health in self._controllers]
+
+	def _delay(self, failures):
+		delay = min(self._max_delay, self._base_delay * (2 ** failures))
+		return delay * random.uniform(1 - self._jitter, 1 + self._jitter)
+
+	# Errors out of connect are reconnect failures; anything else is logged and the loop goes
+	# on, so one bad controller can not stop the reconnection of the rest
+	def _run(self):
+		while True:
+			try:
+				self._reconnect_next()
+			except Exception as ex:
+				self._logger.error("[run] Unexpected error reconnecting: {}".format(str(ex)))
+				time.sleep(self._base_delay)
+
+	# Wait for the next offline controller due for a retry and try to connect it
+	def _reconnect_next(self):
+		with self._condition:
+			while True:
+				while not self._offline:
+					self._condition.wait()
+				health = min(self._offline, key=lambda h: h.retry_time)
+				remaining = health.retry_time - time.monotonic()
+				if remaining <= 0:
+					break
+				self._condition.wait(remaining)
+			health.state = HealthState.RECONNECTING
+
+		connected = False
+		try:
+			with health.bus_lock:
+				connected = health.controller.connect()
+		except Exception as ex:
+			health.last_error = str(ex)
+
+		with self._condition:
+			if health not in self._offline:
+				# Unwatched while connecting, the controller was removed from its joystick
+				if connected:
+					self._logger.info("[run] {} was removed while reconnecting, closing it".format(health.name))
+				watched = False
+			else:
+				watched = True
+				if connected:
+					self._offline.remove(health)
+					health.reconnects += 1
+					health.online_since = time.monotonic()
+					health.state = HealthState.ONLINE
+					health.online = True
+					self._logger.info("[run] {} is online again".format(health.name))
+				else:
+					health.failures += 1
+					health.state = HealthState.OFFLINE
+					health.retry_time = time.monotonic() + self._delay(health.failures)
+
+		if connected and not watched:
+			with health.bus_lock:
+				health.controller.close()
+
+_supervisor = None
+
+# Supervisor shared by all joysticks
+def get_supervisor():
+	global _supervisor
+	if _supervisor is None:
+		_supervisor = ReconnectSupervisor()
+	return _supervisor
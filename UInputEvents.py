@@ -22,602 +22,116 @@
 	SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-import uinput
+import logging
 
-UInputEvents = {
-    "KEY_RESERVED": uinput.KEY_RESERVED,
-    "KEY_ESC": uinput.KEY_ESC,
-    "KEY_1": uinput.KEY_1,
-    "KEY_2": uinput.KEY_2,
-    "KEY_3": uinput.KEY_3,
-    "KEY_4": uinput.KEY_4,
-    "KEY_5": uinput.KEY_5,
-    "KEY_6": uinput.KEY_6,
-    "KEY_7": uinput.KEY_7,
-    "KEY_8": uinput.KEY_8,
-    "KEY_9": uinput.KEY_9,
-    "KEY_0": uinput.KEY_0,
-    "KEY_MINUS": uinput.KEY_MINUS,
-    "KEY_EQUAL": uinput.KEY_EQUAL,
-    "KEY_BACKSPACE": uinput.KEY_BACKSPACE,
-    "KEY_TAB": uinput.KEY_TAB,
-    "KEY_Q": uinput.KEY_Q,
-    "KEY_W": uinput.KEY_W,
-    "KEY_E": uinput.KEY_E,
-    "KEY_R": uinput.KEY_R,
-    "KEY_T": uinput.KEY_T,
-    "KEY_Y": uinput.KEY_Y,
-    "KEY_U": uinput.KEY_U,
-    "KEY_I": uinput.KEY_I,
-    "KEY_O": uinput.KEY_O,
-    "KEY_P": uinput.KEY_P,
-    "KEY_LEFTBRACE": uinput.KEY_LEFTBRACE,
-    "KEY_RIGHTBRACE": uinput.KEY_RIGHTBRACE,
-    "KEY_ENTER": uinput.KEY_ENTER,
-    "KEY_LEFTCTRL": uinput.KEY_LEFTCTRL,
-    "KEY_A": uinput.KEY_A,
-    "KEY_S": uinput.KEY_S,
-    "KEY_D": uinput.KEY_D,
-    "KEY_F": uinput.KEY_F,
-    "KEY_G": uinput.KEY_G,
-    "KEY_H": uinput.KEY_H,
-    "KEY_J": uinput.KEY_J,
-    "KEY_K": uinput.KEY_K,
-    "KEY_L": uinput.KEY_L,
-    "KEY_SEMICOLON": uinput.KEY_SEMICOLON,
-    "KEY_APOSTROPHE": uinput.KEY_APOSTROPHE,
-    "KEY_GRAVE": uinput.KEY_GRAVE,
-    "KEY_LEFTSHIFT": uinput.KEY_LEFTSHIFT,
-    "KEY_BACKSLASH": uinput.KEY_BACKSLASH,
-    "KEY_Z": uinput.KEY_Z,
-    "KEY_X": uinput.KEY_X,
-    "KEY_C": uinput.KEY_C,
-    "KEY_V": uinput.KEY_V,
-    "KEY_B": uinput.KEY_B,
-    "KEY_N": uinput.KEY_N,
-    "KEY_M": uinput.KEY_M,
-    "KEY_COMMA": uinput.KEY_COMMA,
-    "KEY_DOT": uinput.KEY_DOT,
-    "KEY_SLASH": uinput.KEY_SLASH,
-    "KEY_RIGHTSHIFT": uinput.KEY_RIGHTSHIFT,
-    "KEY_KPASTERISK": uinput.KEY_KPASTERISK,
-    "KEY_LEFTALT": uinput.KEY_LEFTALT,
-    "KEY_SPACE": uinput.KEY_SPACE,
-    "KEY_CAPSLOCK": uinput.KEY_CAPSLOCK,
-    "KEY_F1": uinput.KEY_F1,
-    "KEY_F2": uinput.KEY_F2,
-    "KEY_F3": uinput.KEY_F3,
-    "KEY_F4": uinput.KEY_F4,
-    "KEY_F5": uinput.KEY_F5,
-    "KEY_F6": uinput.KEY_F6,
-    "KEY_F7": uinput.KEY_F7,
-    "KEY_F8": uinput.KEY_F8,
-    "KEY_F9": uinput.KEY_F9,
-    "KEY_F10": uinput.KEY_F10,
-    "KEY_NUMLOCK": uinput.KEY_NUMLOCK,
-    "KEY_SCROLLLOCK": uinput.KEY_SCROLLLOCK,
-    "KEY_KP7": uinput.KEY_KP7,
-    "KEY_KP8": uinput.KEY_KP8,
-    "KEY_KP9": uinput.KEY_KP9,
-    "KEY_KPMINUS": uinput.KEY_KPMINUS,
-    "KEY_KP4": uinput.KEY_KP4,
-    "KEY_KP5": uinput.KEY_KP5,
-    "KEY_KP6": uinput.KEY_KP6,
-    "KEY_KPPLUS": uinput.KEY_KPPLUS,
-    "KEY_KP1": uinput.KEY_KP1,
-    "KEY_KP2": uinput.KEY_KP2,
-    "KEY_KP3": uinput.KEY_KP3,
-    "KEY_KP0": uinput.KEY_KP0,
-    "KEY_KPDOT": uinput.KEY_KPDOT,
-    "KEY_ZENKAKUHANKAKU": uinput.KEY_ZENKAKUHANKAKU,
-    "KEY_102ND": uinput.KEY_102ND,
-    "KEY_F11": uinput.KEY_F11,
-    "KEY_F12": uinput.KEY_F12,
-    "KEY_RO": uinput.KEY_RO,
-    "KEY_KATAKANA": uinput.KEY_KATAKANA,
-    "KEY_HIRAGANA": uinput.KEY_HIRAGANA,
-    "KEY_HENKAN": uinput.KEY_HENKAN,
-    "KEY_KATAKANAHIRAGANA": uinput.KEY_KATAKANAHIRAGANA,
-    "KEY_MUHENKAN": uinput.KEY_MUHENKAN,
-    "KEY_KPJPCOMMA": uinput.KEY_KPJPCOMMA,
-    "KEY_KPENTER": uinput.KEY_KPENTER,
-    "KEY_RIGHTCTRL": uinput.KEY_RIGHTCTRL,
-    "KEY_KPSLASH": uinput.KEY_KPSLASH,
-    "KEY_SYSRQ": uinput.KEY_SYSRQ,
-    "KEY_RIGHTALT": uinput.KEY_RIGHTALT,
-    "KEY_LINEFEED": uinput.KEY_LINEFEED,
-    "KEY_HOME": uinput.KEY_HOME,
-    "KEY_UP": uinput.KEY_UP,
-    "KEY_PAGEUP": uinput.KEY_PAGEUP,
-    "KEY_LEFT": uinput.KEY_LEFT,
-    "KEY_RIGHT": uinput.KEY_RIGHT,
-    "KEY_END": uinput.KEY_END,
-    "KEY_DOWN": uinput.KEY_DOWN,
-    "KEY_PAGEDOWN": uinput.KEY_PAGEDOWN,
-    "KEY_INSERT": uinput.KEY_INSERT,
-    "KEY_DELETE": uinput.KEY_DELETE,
-    "KEY_MACRO": uinput.KEY_MACRO,
-    "KEY_MUTE": uinput.KEY_MUTE,
-    "KEY_VOLUMEDOWN": uinput.KEY_VOLUMEDOWN,
-    "KEY_VOLUMEUP": uinput.KEY_VOLUMEUP,
-    "KEY_POWER": uinput.KEY_POWER,
-    "KEY_KPEQUAL": uinput.KEY_KPEQUAL,
-    "KEY_KPPLUSMINUS": uinput.KEY_KPPLUSMINUS,
-    "KEY_PAUSE": uinput.KEY_PAUSE,
-    "KEY_SCALE": uinput.KEY_SCALE,
-    "KEY_KPCOMMA": uinput.KEY_KPCOMMA,
-    "KEY_HANGEUL": uinput.KEY_HANGEUL,
-    "KEY_HANGUEL": uinput.KEY_HANGUEL,
-    "KEY_HANJA": uinput.KEY_HANJA,
-    "KEY_YEN": uinput.KEY_YEN,
-    "KEY_LEFTMETA": uinput.KEY_LEFTMETA,
-    "KEY_RIGHTMETA": uinput.KEY_RIGHTMETA,
-    "KEY_COMPOSE": uinput.KEY_COMPOSE,
-    "KEY_STOP": uinput.KEY_STOP,
-    "KEY_AGAIN": uinput.KEY_AGAIN,
-    "KEY_PROPS": uinput.KEY_PROPS,
-    "KEY_UNDO": uinput.KEY_UNDO,
-    "KEY_FRONT": uinput.KEY_FRONT,
-    "KEY_COPY": uinput.KEY_COPY,
-    "KEY_OPEN": uinput.KEY_OPEN,
-    "KEY_PASTE": uinput.KEY_PASTE,
-    "KEY_FIND": uinput.KEY_FIND,
-    "KEY_CUT": uinput.KEY_CUT,
-    "KEY_HELP": uinput.KEY_HELP,
-    "KEY_MENU": uinput.KEY_MENU,
-    "KEY_CALC": uinput.KEY_CALC,
-    "KEY_SETUP": uinput.KEY_SETUP,
-    "KEY_SLEEP": uinput.KEY_SLEEP,
-    "KEY_WAKEUP": uinput.KEY_WAKEUP,
-    "KEY_FILE": uinput.KEY_FILE,
-    "KEY_SENDFILE": uinput.KEY_SENDFILE,
-    "KEY_DELETEFILE": uinput.KEY_DELETEFILE,
-    "KEY_XFER": uinput.KEY_XFER,
-    "KEY_PROG1": uinput.KEY_PROG1,
-    "KEY_PROG2": uinput.KEY_PROG2,
-    "KEY_WWW": uinput.KEY_WWW,
-    "KEY_MSDOS": uinput.KEY_MSDOS,
-    "KEY_COFFEE": uinput.KEY_COFFEE,
-    "KEY_SCREENLOCK": uinput.KEY_SCREENLOCK,
-    "KEY_ROTATE_DISPLAY": uinput.KEY_ROTATE_DISPLAY,
-    "KEY_DIRECTION": uinput.KEY_DIRECTION,
-    "KEY_CYCLEWINDOWS": uinput.KEY_CYCLEWINDOWS,
-    "KEY_MAIL": uinput.KEY_MAIL,
-    "KEY_BOOKMARKS": uinput.KEY_BOOKMARKS,
-    "KEY_COMPUTER": uinput.KEY_COMPUTER,
-    "KEY_BACK": uinput.KEY_BACK,
-    "KEY_FORWARD": uinput.KEY_FORWARD,
-    "KEY_CLOSECD": uinput.KEY_CLOSECD,
-    "KEY_EJECTCD": uinput.KEY_EJECTCD,
-    "KEY_EJECTCLOSECD": uinput.KEY_EJECTCLOSECD,
-    "KEY_NEXTSONG": uinput.KEY_NEXTSONG,
-    "KEY_PLAYPAUSE": uinput.KEY_PLAYPAUSE,
-    "KEY_PREVIOUSSONG": uinput.KEY_PREVIOUSSONG,
-    "KEY_STOPCD": uinput.KEY_STOPCD,
-    "KEY_RECORD": uinput.KEY_RECORD,
-    "KEY_REWIND": uinput.KEY_REWIND,
-    "KEY_PHONE": uinput.KEY_PHONE,
-    "KEY_ISO": uinput.KEY_ISO,
-    "KEY_CONFIG": uinput.KEY_CONFIG,
-    "KEY_HOMEPAGE": uinput.KEY_HOMEPAGE,
-    "KEY_REFRESH": uinput.KEY_REFRESH,
-    "KEY_EXIT": uinput.KEY_EXIT,
-    "KEY_MOVE": uinput.KEY_MOVE,
-    "KEY_EDIT": uinput.KEY_EDIT,
-    "KEY_SCROLLUP": uinput.KEY_SCROLLUP,
-    "KEY_SCROLLDOWN": uinput.KEY_SCROLLDOWN,
-    "KEY_KPLEFTPAREN": uinput.KEY_KPLEFTPAREN,
-    "KEY_KPRIGHTPAREN": uinput.KEY_KPRIGHTPAREN,
-    "KEY_NEW": uinput.KEY_NEW,
-    "KEY_REDO": uinput.KEY_REDO,
-    "KEY_F13": uinput.KEY_F13,
-    "KEY_F14": uinput.KEY_F14,
-    "KEY_F15": uinput.KEY_F15,
-    "KEY_F16": uinput.KEY_F16,
-    "KEY_F17": uinput.KEY_F17,
-    "KEY_F18": uinput.KEY_F18,
-    "KEY_F19": uinput.KEY_F19,
-    "KEY_F20": uinput.KEY_F20,
-    "KEY_F21": uinput.KEY_F21,
-    "KEY_F22": uinput.KEY_F22,
-    "KEY_F23": uinput.KEY_F23,
-    "KEY_F24": uinput.KEY_F24,
-    "KEY_PLAYCD": uinput.KEY_PLAYCD,
-    "KEY_PAUSECD": uinput.KEY_PAUSECD,
-    "KEY_PROG3": uinput.KEY_PROG3,
-    "KEY_PROG4": uinput.KEY_PROG4,
-    "KEY_DASHBOARD": uinput.KEY_DASHBOARD,
-    "KEY_SUSPEND": uinput.KEY_SUSPEND,
-    "KEY_CLOSE": uinput.KEY_CLOSE,
-    "KEY_PLAY": uinput.KEY_PLAY,
-    "KEY_FASTFORWARD": uinput.KEY_FASTFORWARD,
-    "KEY_BASSBOOST": uinput.KEY_BASSBOOST,
-    "KEY_PRINT": uinput.KEY_PRINT,
-    "KEY_HP": uinput.KEY_HP,
-    "KEY_CAMERA": uinput.KEY_CAMERA,
-    "KEY_SOUND": uinput.KEY_SOUND,
-    "KEY_QUESTION": uinput.KEY_QUESTION,
-    "KEY_EMAIL": uinput.KEY_EMAIL,
-    "KEY_CHAT": uinput.KEY_CHAT,
-    "KEY_SEARCH": uinput.KEY_SEARCH,
-    "KEY_CONNECT": uinput.KEY_CONNECT,
-    "KEY_FINANCE": uinput.KEY_FINANCE,
-    "KEY_SPORT": uinput.KEY_SPORT,
-    "KEY_SHOP": uinput.KEY_SHOP,
-    "KEY_ALTERASE": uinput.KEY_ALTERASE,
-    "KEY_CANCEL": uinput.KEY_CANCEL,
-    "KEY_BRIGHTNESSDOWN": uinput.KEY_BRIGHTNESSDOWN,
-    "KEY_BRIGHTNESSUP": uinput.KEY_BRIGHTNESSUP,
-    "KEY_MEDIA": uinput.KEY_MEDIA,
-    "KEY_SWITCHVIDEOMODE": uinput.KEY_SWITCHVIDEOMODE,
-    "KEY_KBDILLUMTOGGLE": uinput.KEY_KBDILLUMTOGGLE,
-    "KEY_KBDILLUMDOWN": uinput.KEY_KBDILLUMDOWN,
-    "KEY_KBDILLUMUP": uinput.KEY_KBDILLUMUP,
-    "KEY_SEND": uinput.KEY_SEND,
-    "KEY_REPLY": uinput.KEY_REPLY,
-    "KEY_FORWARDMAIL": uinput.KEY_FORWARDMAIL,
-    "KEY_SAVE": uinput.KEY_SAVE,
-    "KEY_DOCUMENTS": uinput.KEY_DOCUMENTS,
-    "KEY_BATTERY": uinput.KEY_BATTERY,
-    "KEY_BLUETOOTH": uinput.KEY_BLUETOOTH,
-    "KEY_WLAN": uinput.KEY_WLAN,
-    "KEY_UWB": uinput.KEY_UWB,
-    "KEY_UNKNOWN": uinput.KEY_UNKNOWN,
-    "KEY_VIDEO_NEXT": uinput.KEY_VIDEO_NEXT,
-    "KEY_VIDEO_PREV": uinput.KEY_VIDEO_PREV,
-    "KEY_BRIGHTNESS_CYCLE": uinput.KEY_BRIGHTNESS_CYCLE,
-    "KEY_BRIGHTNESS_AUTO": uinput.KEY_BRIGHTNESS_AUTO,
-    "KEY_BRIGHTNESS_ZERO": uinput.KEY_BRIGHTNESS_ZERO,
-    "KEY_DISPLAY_OFF": uinput.KEY_DISPLAY_OFF,
-    "KEY_WWAN": uinput.KEY_WWAN,
-    "KEY_WIMAX": uinput.KEY_WIMAX,
-    "KEY_RFKILL": uinput.KEY_RFKILL,
-    "KEY_MICMUTE": uinput.KEY_MICMUTE,
-    "KEY_OK": uinput.KEY_OK,
-    "KEY_SELECT": uinput.KEY_SELECT,
-    "KEY_GOTO": uinput.KEY_GOTO,
-    "KEY_CLEAR": uinput.KEY_CLEAR,
-    "KEY_POWER2": uinput.KEY_POWER2,
-    "KEY_OPTION": uinput.KEY_OPTION,
-    "KEY_INFO": uinput.KEY_INFO,
-    "KEY_TIME": uinput.KEY_TIME,
-    "KEY_VENDOR": uinput.KEY_VENDOR,
-    "KEY_ARCHIVE": uinput.KEY_ARCHIVE,
-    "KEY_PROGRAM": uinput.KEY_PROGRAM,
-    "KEY_CHANNEL": uinput.KEY_CHANNEL,
-    "KEY_FAVORITES": uinput.KEY_FAVORITES,
-    "KEY_EPG": uinput.KEY_EPG,
-    "KEY_PVR": uinput.KEY_PVR,
-    "KEY_MHP": uinput.KEY_MHP,
-    "KEY_LANGUAGE": uinput.KEY_LANGUAGE,
-    "KEY_TITLE": uinput.KEY_TITLE,
-    "KEY_SUBTITLE": uinput.KEY_SUBTITLE,
-    "KEY_ANGLE": uinput.KEY_ANGLE,
-    "KEY_ZOOM": uinput.KEY_ZOOM,
-    "KEY_MODE": uinput.KEY_MODE,
-    "KEY_KEYBOARD": uinput.KEY_KEYBOARD,
-    "KEY_SCREEN": uinput.KEY_SCREEN,
-    "KEY_PC": uinput.KEY_PC,
-    "KEY_TV": uinput.KEY_TV,
-    "KEY_TV2": uinput.KEY_TV2,
-    "KEY_VCR": uinput.KEY_VCR,
-    "KEY_VCR2": uinput.KEY_VCR2,
-    "KEY_SAT": uinput.KEY_SAT,
-    "KEY_SAT2": uinput.KEY_SAT2,
-    "KEY_CD": uinput.KEY_CD,
-    "KEY_TAPE": uinput.KEY_TAPE,
-    "KEY_RADIO": uinput.KEY_RADIO,
-    "KEY_TUNER": uinput.KEY_TUNER,
-    "KEY_PLAYER": uinput.KEY_PLAYER,
-    "KEY_TEXT": uinput.KEY_TEXT,
-    "KEY_DVD": uinput.KEY_DVD,
-    "KEY_AUX": uinput.KEY_AUX,
-    "KEY_MP3": uinput.KEY_MP3,
-    "KEY_AUDIO": uinput.KEY_AUDIO,
-    "KEY_VIDEO": uinput.KEY_VIDEO,
-    "KEY_DIRECTORY": uinput.KEY_DIRECTORY,
-    "KEY_LIST": uinput.KEY_LIST,
-    "KEY_MEMO": uinput.KEY_MEMO,
-    "KEY_CALENDAR": uinput.KEY_CALENDAR,
-    "KEY_RED": uinput.KEY_RED,
-    "KEY_GREEN": uinput.KEY_GREEN,
-    "KEY_YELLOW": uinput.KEY_YELLOW,
-    "KEY_BLUE": uinput.KEY_BLUE,
-    "KEY_CHANNELUP": uinput.KEY_CHANNELUP,
-    "KEY_CHANNELDOWN": uinput.KEY_CHANNELDOWN,
-    "KEY_FIRST": uinput.KEY_FIRST,
-    "KEY_LAST": uinput.KEY_LAST,
-    "KEY_AB": uinput.KEY_AB,
-    "KEY_NEXT": uinput.KEY_NEXT,
-    "KEY_RESTART": uinput.KEY_RESTART,
-    "KEY_SLOW": uinput.KEY_SLOW,
-    "KEY_SHUFFLE": uinput.KEY_SHUFFLE,
-    "KEY_BREAK": uinput.KEY_BREAK,
-    "KEY_PREVIOUS": uinput.KEY_PREVIOUS,
-    "KEY_DIGITS": uinput.KEY_DIGITS,
-    "KEY_TEEN": uinput.KEY_TEEN,
-    "KEY_TWEN": uinput.KEY_TWEN,
-    "KEY_VIDEOPHONE": uinput.KEY_VIDEOPHONE,
-    "KEY_GAMES": uinput.KEY_GAMES,
-    "KEY_ZOOMIN": uinput.KEY_ZOOMIN,
-    "KEY_ZOOMOUT": uinput.KEY_ZOOMOUT,
-    "KEY_ZOOMRESET": uinput.KEY_ZOOMRESET,
-    "KEY_WORDPROCESSOR": uinput.KEY_WORDPROCESSOR,
-    "KEY_EDITOR": uinput.KEY_EDITOR,
-    "KEY_SPREADSHEET": uinput.KEY_SPREADSHEET,
-    "KEY_GRAPHICSEDITOR": uinput.KEY_GRAPHICSEDITOR,
-    "KEY_PRESENTATION": uinput.KEY_PRESENTATION,
-    "KEY_DATABASE": uinput.KEY_DATABASE,
-    "KEY_NEWS": uinput.KEY_NEWS,
-    "KEY_VOICEMAIL": uinput.KEY_VOICEMAIL,
-    "KEY_ADDRESSBOOK": uinput.KEY_ADDRESSBOOK,
-    "KEY_MESSENGER": uinput.KEY_MESSENGER,
-    "KEY_DISPLAYTOGGLE": uinput.KEY_DISPLAYTOGGLE,
-    "KEY_BRIGHTNESS_TOGGLE": uinput.KEY_BRIGHTNESS_TOGGLE,
-    "KEY_SPELLCHECK": uinput.KEY_SPELLCHECK,
-    "KEY_LOGOFF": uinput.KEY_LOGOFF,
-    "KEY_DOLLAR": uinput.KEY_DOLLAR,
-    "KEY_EURO": uinput.KEY_EURO,
-    "KEY_FRAMEBACK": uinput.KEY_FRAMEBACK,
-    "KEY_FRAMEFORWARD": uinput.KEY_FRAMEFORWARD,
-    "KEY_CONTEXT_MENU": uinput.KEY_CONTEXT_MENU,
-    "KEY_MEDIA_REPEAT": uinput.KEY_MEDIA_REPEAT,
-    "KEY_10CHANNELSUP": uinput.KEY_10CHANNELSUP,
-    "KEY_10CHANNELSDOWN": uinput.KEY_10CHANNELSDOWN,
-    "KEY_IMAGES": uinput.KEY_IMAGES,
-    "KEY_DEL_EOL": uinput.KEY_DEL_EOL,
-    "KEY_DEL_EOS": uinput.KEY_DEL_EOS,
-    "KEY_INS_LINE": uinput.KEY_INS_LINE,
-    "KEY_DEL_LINE": uinput.KEY_DEL_LINE,
-    "KEY_FN": uinput.KEY_FN,
-    "KEY_FN_ESC": uinput.KEY_FN_ESC,
-    "KEY_FN_F1": uinput.KEY_FN_F1,
-    "KEY_FN_F2": uinput.KEY_FN_F2,
-    "KEY_FN_F3": uinput.KEY_FN_F3,
-    "KEY_FN_F4": uinput.KEY_FN_F4,
-    "KEY_FN_F5": uinput.KEY_FN_F5,
-    "KEY_FN_F6": uinput.KEY_FN_F6,
-    "KEY_FN_F7": uinput.KEY_FN_F7,
-    "KEY_FN_F8": uinput.KEY_FN_F8,
-    "KEY_FN_F9": uinput.KEY_FN_F9,
-    "KEY_FN_F10": uinput.KEY_FN_F10,
-    "KEY_FN_F11": uinput.KEY_FN_F11,
-    "KEY_FN_F12": uinput.KEY_FN_F12,
-    "KEY_FN_1": uinput.KEY_FN_1,
-    "KEY_FN_2": uinput.KEY_FN_2,
-    "KEY_FN_D": uinput.KEY_FN_D,
-    "KEY_FN_E": uinput.KEY_FN_E,
-    "KEY_FN_F": uinput.KEY_FN_F,
-    "KEY_FN_S": uinput.KEY_FN_S,
-    "KEY_FN_B": uinput.KEY_FN_B,
-    "KEY_BRL_DOT1": uinput.KEY_BRL_DOT1,
-    "KEY_BRL_DOT2": uinput.KEY_BRL_DOT2,
-    "KEY_BRL_DOT3": uinput.KEY_BRL_DOT3,
-    "KEY_BRL_DOT4": uinput.KEY_BRL_DOT4,
-    "KEY_BRL_DOT5": uinput.KEY_BRL_DOT5,
-    "KEY_BRL_DOT6": uinput.KEY_BRL_DOT6,
-    "KEY_BRL_DOT7": uinput.KEY_BRL_DOT7,
-    "KEY_BRL_DOT8": uinput.KEY_BRL_DOT8,
-    "KEY_BRL_DOT9": uinput.KEY_BRL_DOT9,
-    "KEY_BRL_DOT10": uinput.KEY_BRL_DOT10,
-    "KEY_NUMERIC_0": uinput.KEY_NUMERIC_0,
-    "KEY_NUMERIC_1": uinput.KEY_NUMERIC_1,
-    "KEY_NUMERIC_2": uinput.KEY_NUMERIC_2,
-    "KEY_NUMERIC_3": uinput.KEY_NUMERIC_3,
-    "KEY_NUMERIC_4": uinput.KEY_NUMERIC_4,
-    "KEY_NUMERIC_5": uinput.KEY_NUMERIC_5,
-    "KEY_NUMERIC_6": uinput.KEY_NUMERIC_6,
-    "KEY_NUMERIC_7": uinput.KEY_NUMERIC_7,
-    "KEY_NUMERIC_8": uinput.KEY_NUMERIC_8,
-    "KEY_NUMERIC_9": uinput.KEY_NUMERIC_9,
-    "KEY_NUMERIC_STAR": uinput.KEY_NUMERIC_STAR,
-    "KEY_NUMERIC_POUND": uinput.KEY_NUMERIC_POUND,
-    "KEY_NUMERIC_A": uinput.KEY_NUMERIC_A,
-    "KEY_NUMERIC_B": uinput.KEY_NUMERIC_B,
-    "KEY_NUMERIC_C": uinput.KEY_NUMERIC_C,
-    "KEY_NUMERIC_D": uinput.KEY_NUMERIC_D,
-    "KEY_CAMERA_FOCUS": uinput.KEY_CAMERA_FOCUS,
-    "KEY_WPS_BUTTON": uinput.KEY_WPS_BUTTON,
-    "KEY_TOUCHPAD_TOGGLE": uinput.KEY_TOUCHPAD_TOGGLE,
-    "KEY_TOUCHPAD_ON": uinput.KEY_TOUCHPAD_ON,
-    "KEY_TOUCHPAD_OFF": uinput.KEY_TOUCHPAD_OFF,
-    "KEY_CAMERA_ZOOMIN": uinput.KEY_CAMERA_ZOOMIN,
-    "KEY_CAMERA_ZOOMOUT": uinput.KEY_CAMERA_ZOOMOUT,
-    "KEY_CAMERA_UP": uinput.KEY_CAMERA_UP,
-    "KEY_CAMERA_DOWN": uinput.KEY_CAMERA_DOWN,
-    "KEY_CAMERA_LEFT": uinput.KEY_CAMERA_LEFT,
-    "KEY_CAMERA_RIGHT": uinput.KEY_CAMERA_RIGHT,
-    "KEY_ATTENDANT_ON": uinput.KEY_ATTENDANT_ON,
-    "KEY_ATTENDANT_OFF": uinput.KEY_ATTENDANT_OFF,
-    "KEY_ATTENDANT_TOGGLE": uinput.KEY_ATTENDANT_TOGGLE,
-    "KEY_LIGHTS_TOGGLE": uinput.KEY_LIGHTS_TOGGLE,
-    "KEY_ALS_TOGGLE": uinput.KEY_ALS_TOGGLE,
-    "KEY_BUTTONCONFIG": uinput.KEY_BUTTONCONFIG,
-    "KEY_TASKMANAGER": uinput.KEY_TASKMANAGER,
-    "KEY_JOURNAL": uinput.KEY_JOURNAL,
-    "KEY_CONTROLPANEL": uinput.KEY_CONTROLPANEL,
-    "KEY_APPSELECT": uinput.KEY_APPSELECT,
-    "KEY_SCREENSAVER": uinput.KEY_SCREENSAVER,
-    "KEY_VOICECOMMAND": uinput.KEY_VOICECOMMAND,
-    "KEY_BRIGHTNESS_MIN": uinput.KEY_BRIGHTNESS_MIN,
-    "KEY_BRIGHTNESS_MAX": uinput.KEY_BRIGHTNESS_MAX,
-    "KEY_KBDINPUTASSIST_PREV": uinput.KEY_KBDINPUTASSIST_PREV,
-    "KEY_KBDINPUTASSIST_NEXT": uinput.KEY_KBDINPUTASSIST_NEXT,
-    "KEY_KBDINPUTASSIST_PREVGROUP": uinput.KEY_KBDINPUTASSIST_PREVGROUP,
-    "KEY_KBDINPUTASSIST_NEXTGROUP": uinput.KEY_KBDINPUTASSIST_NEXTGROUP,
-    "KEY_KBDINPUTASSIST_ACCEPT": uinput.KEY_KBDINPUTASSIST_ACCEPT,
-    "KEY_KBDINPUTASSIST_CANCEL": uinput.KEY_KBDINPUTASSIST_CANCEL,
-    "KEY_MIN_INTERESTING": uinput.KEY_MIN_INTERESTING,
-    "KEY_MAX": uinput.KEY_MAX,
-    "BTN_MISC": uinput.BTN_MISC,
-    "BTN_0": uinput.BTN_0,
-    "BTN_1": uinput.BTN_1,
-    "BTN_2": uinput.BTN_2,
-    "BTN_3": uinput.BTN_3,
-    "BTN_4": uinput.BTN_4,
-    "BTN_5": uinput.BTN_5,
-    "BTN_6": uinput.BTN_6,
-    "BTN_7": uinput.BTN_7,
-    "BTN_8": uinput.BTN_8,
-    "BTN_9": uinput.BTN_9,
-    "BTN_MOUSE": uinput.BTN_MOUSE,
-    "BTN_LEFT": uinput.BTN_LEFT,
-    "BTN_RIGHT": uinput.BTN_RIGHT,
-    "BTN_MIDDLE": uinput.BTN_MIDDLE,
-    "BTN_SIDE": uinput.BTN_SIDE,
-    "BTN_EXTRA": uinput.BTN_EXTRA,
-    "BTN_FORWARD": uinput.BTN_FORWARD,
-    "BTN_BACK": uinput.BTN_BACK,
-    "BTN_TASK": uinput.BTN_TASK,
-    "BTN_JOYSTICK": uinput.BTN_JOYSTICK,
-    "BTN_TRIGGER": uinput.BTN_TRIGGER,
-    "BTN_THUMB": uinput.BTN_THUMB,
-    "BTN_THUMB2": uinput.BTN_THUMB2,
-    "BTN_TOP": uinput.BTN_TOP,
-    "BTN_TOP2": uinput.BTN_TOP2,
-    "BTN_PINKIE": uinput.BTN_PINKIE,
-    "BTN_BASE": uinput.BTN_BASE,
-    "BTN_BASE2": uinput.BTN_BASE2,
-    "BTN_BASE3": uinput.BTN_BASE3,
-    "BTN_BASE4": uinput.BTN_BASE4,
-    "BTN_BASE5": uinput.BTN_BASE5,
-    "BTN_BASE6": uinput.BTN_BASE6,
-    "BTN_DEAD": uinput.BTN_DEAD,
-    "BTN_GAMEPAD": uinput.BTN_GAMEPAD,
-    "BTN_SOUTH": uinput.BTN_SOUTH,
-    "BTN_A": uinput.BTN_A,
-    "BTN_EAST": uinput.BTN_EAST,
-    "BTN_B": uinput.BTN_B,
-    "BTN_C": uinput.BTN_C,
-    "BTN_NORTH": uinput.BTN_NORTH,
-    "BTN_X": uinput.BTN_X,
-    "BTN_WEST": uinput.BTN_WEST,
-    "BTN_Y": uinput.BTN_Y,
-    "BTN_Z": uinput.BTN_Z,
-    "BTN_TL": uinput.BTN_TL,
-    "BTN_TR": uinput.BTN_TR,
-    "BTN_TL2": uinput.BTN_TL2,
-    "BTN_TR2": uinput.BTN_TR2,
-    "BTN_SELECT": uinput.BTN_SELECT,
-    "BTN_START": uinput.BTN_START,
-    "BTN_MODE": uinput.BTN_MODE,
-    "BTN_THUMBL": uinput.BTN_THUMBL,
-    "BTN_THUMBR": uinput.BTN_THUMBR,
-    "BTN_DIGI": uinput.BTN_DIGI,
-    "BTN_TOOL_PEN": uinput.BTN_TOOL_PEN,
-    "BTN_TOOL_RUBBER": uinput.BTN_TOOL_RUBBER,
-    "BTN_TOOL_BRUSH": uinput.BTN_TOOL_BRUSH,
-    "BTN_TOOL_PENCIL": uinput.BTN_TOOL_PENCIL,
-    "BTN_TOOL_AIRBRUSH": uinput.BTN_TOOL_AIRBRUSH,
-    "BTN_TOOL_FINGER": uinput.BTN_TOOL_FINGER,
-    "BTN_TOOL_MOUSE": uinput.BTN_TOOL_MOUSE,
-    "BTN_TOOL_LENS": uinput.BTN_TOOL_LENS,
-    "BTN_TOOL_QUINTTAP": uinput.BTN_TOOL_QUINTTAP,
-    "BTN_TOUCH": uinput.BTN_TOUCH,
-    "BTN_STYLUS": uinput.BTN_STYLUS,
-    "BTN_STYLUS2": uinput.BTN_STYLUS2,
-    "BTN_TOOL_DOUBLETAP": uinput.BTN_TOOL_DOUBLETAP,
-    "BTN_TOOL_TRIPLETAP": uinput.BTN_TOOL_TRIPLETAP,
-    "BTN_TOOL_QUADTAP": uinput.BTN_TOOL_QUADTAP,
-    "BTN_WHEEL": uinput.BTN_WHEEL,
-    "BTN_GEAR_DOWN": uinput.BTN_GEAR_DOWN,
-    "BTN_GEAR_UP": uinput.BTN_GEAR_UP,
-    "BTN_DPAD_UP": uinput.BTN_DPAD_UP,
-    "BTN_DPAD_DOWN": uinput.BTN_DPAD_DOWN,
-    "BTN_DPAD_LEFT": uinput.BTN_DPAD_LEFT,
-    "BTN_DPAD_RIGHT": uinput.BTN_DPAD_RIGHT,
-    "BTN_TRIGGER_HAPPY": uinput.BTN_TRIGGER_HAPPY,
-    "BTN_TRIGGER_HAPPY1": uinput.BTN_TRIGGER_HAPPY1,
-    "BTN_TRIGGER_HAPPY2": uinput.BTN_TRIGGER_HAPPY2,
-    "BTN_TRIGGER_HAPPY3": uinput.BTN_TRIGGER_HAPPY3,
-    "BTN_TRIGGER_HAPPY4": uinput.BTN_TRIGGER_HAPPY4,
-    "BTN_TRIGGER_HAPPY5": uinput.BTN_TRIGGER_HAPPY5,
-    "BTN_TRIGGER_HAPPY6": uinput.BTN_TRIGGER_HAPPY6,
-    "BTN_TRIGGER_HAPPY7": uinput.BTN_TRIGGER_HAPPY7,
-    "BTN_TRIGGER_HAPPY8": uinput.BTN_TRIGGER_HAPPY8,
-    "BTN_TRIGGER_HAPPY9": uinput.BTN_TRIGGER_HAPPY9,
-    "BTN_TRIGGER_HAPPY10": uinput.BTN_TRIGGER_HAPPY10,
-    "BTN_TRIGGER_HAPPY11": uinput.BTN_TRIGGER_HAPPY11,
-    "BTN_TRIGGER_HAPPY12": uinput.BTN_TRIGGER_HAPPY12,
-    "BTN_TRIGGER_HAPPY13": uinput.BTN_TRIGGER_HAPPY13,
-    "BTN_TRIGGER_HAPPY14": uinput.BTN_TRIGGER_HAPPY14,
-    "BTN_TRIGGER_HAPPY15": uinput.BTN_TRIGGER_HAPPY15,
-    "BTN_TRIGGER_HAPPY16": uinput.BTN_TRIGGER_HAPPY16,
-    "BTN_TRIGGER_HAPPY17": uinput.BTN_TRIGGER_HAPPY17,
-    "BTN_TRIGGER_HAPPY18": uinput.BTN_TRIGGER_HAPPY18,
-    "BTN_TRIGGER_HAPPY19": uinput.BTN_TRIGGER_HAPPY19,
-    "BTN_TRIGGER_HAPPY20": uinput.BTN_TRIGGER_HAPPY20,
-    "BTN_TRIGGER_HAPPY21": uinput.BTN_TRIGGER_HAPPY21,
-    "BTN_TRIGGER_HAPPY22": uinput.BTN_TRIGGER_HAPPY22,
-    "BTN_TRIGGER_HAPPY23": uinput.BTN_TRIGGER_HAPPY23,
-    "BTN_TRIGGER_HAPPY24": uinput.BTN_TRIGGER_HAPPY24,
-    "BTN_TRIGGER_HAPPY25": uinput.BTN_TRIGGER_HAPPY25,
-    "BTN_TRIGGER_HAPPY26": uinput.BTN_TRIGGER_HAPPY26,
-    "BTN_TRIGGER_HAPPY27": uinput.BTN_TRIGGER_HAPPY27,
-    "BTN_TRIGGER_HAPPY28": uinput.BTN_TRIGGER_HAPPY28,
-    "BTN_TRIGGER_HAPPY29": uinput.BTN_TRIGGER_HAPPY29,
-    "BTN_TRIGGER_HAPPY30": uinput.BTN_TRIGGER_HAPPY30,
-    "BTN_TRIGGER_HAPPY31": uinput.BTN_TRIGGER_HAPPY31,
-    "BTN_TRIGGER_HAPPY32": uinput.BTN_TRIGGER_HAPPY32,
-    "BTN_TRIGGER_HAPPY33": uinput.BTN_TRIGGER_HAPPY33,
-    "BTN_TRIGGER_HAPPY34": uinput.BTN_TRIGGER_HAPPY34,
-    "BTN_TRIGGER_HAPPY35": uinput.BTN_TRIGGER_HAPPY35,
-    "BTN_TRIGGER_HAPPY36": uinput.BTN_TRIGGER_HAPPY36,
-    "BTN_TRIGGER_HAPPY37": uinput.BTN_TRIGGER_HAPPY37,
-    "BTN_TRIGGER_HAPPY38": uinput.BTN_TRIGGER_HAPPY38,
-    "BTN_TRIGGER_HAPPY39": uinput.BTN_TRIGGER_HAPPY39,
-    "BTN_TRIGGER_HAPPY40": uinput.BTN_TRIGGER_HAPPY40,
-    "REL_X": uinput.REL_X,
-    "REL_Y": uinput.REL_Y,
-    "REL_Z": uinput.REL_Z,
-    "REL_RX": uinput.REL_RX,
-    "REL_RY": uinput.REL_RY,
-    "REL_RZ": uinput.REL_RZ,
-    "REL_HWHEEL": uinput.REL_HWHEEL,
-    "REL_DIAL": uinput.REL_DIAL,
-    "REL_WHEEL": uinput.REL_WHEEL,
-    "REL_MISC": uinput.REL_MISC,
-    "REL_MAX": uinput.REL_MAX,
-    "ABS_X": uinput.ABS_X,
-    "ABS_Y": uinput.ABS_Y,
-    "ABS_Z": uinput.ABS_Z,
-    "ABS_RX": uinput.ABS_RX,
-    "ABS_RY": uinput.ABS_RY,
-    "ABS_RZ": uinput.ABS_RZ,
-    "ABS_THROTTLE": uinput.ABS_THROTTLE,
-    "ABS_RUDDER": uinput.ABS_RUDDER,
-    "ABS_WHEEL": uinput.ABS_WHEEL,
-    "ABS_GAS": uinput.ABS_GAS,
-    "ABS_BRAKE": uinput.ABS_BRAKE,
-    "ABS_HAT0X": uinput.ABS_HAT0X,
-    "ABS_HAT0Y": uinput.ABS_HAT0Y,
-    "ABS_HAT1X": uinput.ABS_HAT1X,
-    "ABS_HAT1Y": uinput.ABS_HAT1Y,
-    "ABS_HAT2X": uinput.ABS_HAT2X,
-    "ABS_HAT2Y": uinput.ABS_HAT2Y,
-    "ABS_HAT3X": uinput.ABS_HAT3X,
-    "ABS_HAT3Y": uinput.ABS_HAT3Y,
-    "ABS_PRESSURE": uinput.ABS_PRESSURE,
-    "ABS_DISTANCE": uinput.ABS_DISTANCE,
-    "ABS_TILT_X": uinput.ABS_TILT_X,
-    "ABS_TILT_Y": uinput.ABS_TILT_Y,
-    "ABS_TOOL_WIDTH": uinput.ABS_TOOL_WIDTH,
-    "ABS_VOLUME": uinput.ABS_VOLUME,
-    "ABS_MISC": uinput.ABS_MISC,
-    "ABS_MT_SLOT": uinput.ABS_MT_SLOT,
-    "ABS_MT_TOUCH_MAJOR": uinput.ABS_MT_TOUCH_MAJOR,
-    "ABS_MT_TOUCH_MINOR": uinput.ABS_MT_TOUCH_MINOR,
-    "ABS_MT_WIDTH_MAJOR": uinput.ABS_MT_WIDTH_MAJOR,
-    "ABS_MT_WIDTH_MINOR": uinput.ABS_MT_WIDTH_MINOR,
-    "ABS_MT_ORIENTATION": uinput.ABS_MT_ORIENTATION,
-    "ABS_MT_POSITION_X": uinput.ABS_MT_POSITION_X,
-    "ABS_MT_POSITION_Y": uinput.ABS_MT_POSITION_Y,
-    "ABS_MT_TOOL_TYPE": uinput.ABS_MT_TOOL_TYPE,
-    "ABS_MT_BLOB_ID": uinput.ABS_MT_BLOB_ID,
-    "ABS_MT_TRACKING_ID": uinput.ABS_MT_TRACKING_ID,
-    "ABS_MT_PRESSURE": uinput.ABS_MT_PRESSURE,
-    "ABS_MT_DISTANCE": uinput.ABS_MT_DISTANCE,
-    "ABS_MT_TOOL_X": uinput.ABS_MT_TOOL_X,
-    "ABS_MT_TOOL_Y": uinput.ABS_MT_TOOL_Y,
-    "ABS_MAX": uinput.ABS_MAX,
-}
\ No newline at end of file
+from UInputEventCodes import EVENT_CODES
+
+module_logger = logging.getLogger('Joyspyck.UInputEvents')
+
+# Event type of every event name prefix, see linux/input-event-codes.h
+EVENT_TYPES = {
+    "KEY": 0x01,
+    "BTN": 0x01,
+    "REL": 0x02,
+    "ABS": 0x03,
+}
+
+# UInputEventRegistry maps event names ("BTN_A", "ABS_X"...) to the (type, code) tuples
+# used by python-uinput.
+#
+# Names are looked up in EVENT_CODES, an index generated from the kernel headers, so
+# python-uinput is not imported to parse a configuration. Names missing from the index
+# are resolved from python-uinput on demand and cached.
+class UInputEventRegistry (object):
+
+    def __init__(self, codes):
+        self._codes = codes
+        self._resolved = {}
+        self._missing = set()
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __getitem__(self, name):
+        event = self.get(name)
+        if event is None:
+            raise KeyError(name)
+        return event
+
+    def get(self, name, default=None):
+        event = self._codes.get(name)
+        if event is not None:
+            return event
+        if not isinstance(name, str) or name in self._missing:
+            return default
+        if name not in self._resolved:
+            event = _resolve_uinput(name)
+            if event is None:
+                self._missing.add(name)
+                return default
+            self._resolved[name] = event
+        return self._resolved[name]
+
+    def names(self):
+        return list(self._codes)
+
+    # Closest known event names, to suggest fixes of a misspelled name
+    def suggest(self, name, count=3):
+        import difflib
+        return difflib.get_close_matches(str(name).upper(), self._codes, n=count)
+
+    # Error message for an invalid event name, with suggestions if there are any
+    def invalid_message(self, name):
+        suggestions = self.suggest(name)
+        if suggestions:
+            return "Event {0} is not a valid UInputEvent. Did you mean {1}?".format(name, " or ".join(suggestions))
+        return "Event {0} is not a valid UInputEvent".format(name)
+
+def _resolve_uinput(name):
+    try:
+        import uinput
+    except Exception as ex:
+        module_logger.debug("[resolve] python-uinput not available: {0}".format(str(ex)))
+        return None
+    event = getattr(uinput, name, None)
+    if isinstance(event, tuple) and len(event) == 2:
+        module_logger.debug("[resolve] {0} resolved from python-uinput".format(name))
+        return event
+    return None
+
+UInputEvents = UInputEventRegistry(EVENT_CODES)
+
+# Build the EVENT_CODES index from the kernel definitions of the event codes
+def parse_event_codes(header_path):
+    import re
+    defines = {}
+    with open(header_path, "r") as header:
+        for line in header:
+            match = re.match(r"#define\s+((KEY|BTN|REL|ABS)_\w+)\s+(\w+)\s*(/\*.*)?$", line)
+            if match:
+                defines[match.group(1)] = (match.group(2), match.group(3))
+
+    codes = {}
+    for name, (prefix, value) in defines.items():
+        # Aliases of other codes are resolved once
+        while value in defines:
+            value = defines[value][1]
+        try:
+            code = int(value, 0)
+        except ValueError:
+            continue
+        codes[name] = (EVENT_TYPES[prefix], code)
+    return codes
+
+# Regenerate UInputEventCodes.py:
+#   python3 UInputEvents.py /usr/include/linux/input-event-codes.h > UInputEventCodes.py
+if __name__ == "__main__":
+    import sys
+    header_path = sys.argv[1] if len(sys.argv) > 1 else "/usr/include/linux/input-event-codes.h"
+    print('# -*- coding: utf-8 -*-')
+    print('# Event codes by name. Generated by UInputEvents.py from {0}, do not edit.'.format(header_path))
+    print('')
+    print('EVENT_CODES = {')
+    for name, (event_type, code) in parse_event_codes(header_path).items():
+        print('    "{0}": (0x{1:02x}, 0x{2:03x}),'.format(name, event_type, code))
+    print('}')
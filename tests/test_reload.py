@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+    Reload tests for Joyspyck. Run from the repository root with:
+
+        python3 -m unittest discover tests
+"""
+
+import copy
+import unittest
+
+import Joystick
+
+from UInputEvents import UInputEvents
+
+
+def _joystick_conf(debounce=None, dummy_option=0):
+	buttons = {"name": "buttons", "type": "Dummy", "options": {"reload": dummy_option},
+		"mapping": ["BTN_A", "BTN_B", "BTN_X"]}
+	if debounce is not None:
+		buttons["debounce"] = debounce
+	return {"waitTimeButtons": 0.01, "waitTimeAxis": 0.01, "output": "recorder",
+		"buttonControllers": [buttons], "axisControllers": []}
+
+# Buttons of the controller in position 0 read as mask on every poll
+def _hold(joystick, mask):
+	joystick.button_controllers()[0].buttons_mask = lambda: mask
+
+def _button_events(joystick):
+	return [(record[1], record[2]) for record in joystick.output().records if not record[3]]
+
+
+class ReloadHeldButtonsTest (unittest.TestCase):
+
+	def setUp(self):
+		self.joystick = None
+
+	def tearDown(self):
+		if self.joystick is not None:
+			self.joystick.close()
+
+	def _reload_while_held(self, conf, new_conf):
+		self.joystick = Joystick.Joystick(copy.deepcopy(conf))
+		_hold(self.joystick, 0b101)
+		for _ in range(8):
+			self.joystick.update()
+		old_controller = self.joystick.button_controllers()[0]
+		self.joystick.reload(copy.deepcopy(new_conf))
+		self.assertIsNot(self.joystick.button_controllers()[0], old_controller)
+		self.joystick.output().clear()
+
+	def test_held_buttons_are_kept(self):
+		self._reload_while_held(_joystick_conf(), _joystick_conf(dummy_option=1))
+		_hold(self.joystick, 0b101)
+		self.joystick.update()
+		self.assertEqual(_button_events(self.joystick), [])
+
+	def test_buttons_released_after_reload(self):
+		self._reload_while_held(_joystick_conf(), _joystick_conf(dummy_option=1))
+		_hold(self.joystick, 0)
+		self.joystick.update()
+		self.assertEqual(sorted(_button_events(self.joystick)),
+			sorted([(UInputEvents["BTN_A"], 0), (UInputEvents["BTN_X"], 0)]))
+
+	def test_debounced_held_buttons_are_kept(self):
+		self._reload_while_held(_joystick_conf("consecutive"), _joystick_conf("consecutive", dummy_option=1))
+		_hold(self.joystick, 0b101)
+		self.joystick.update()
+		self.assertEqual(_button_events(self.joystick), [])
+		_hold(self.joystick, 0)
+		for _ in range(4):
+			self.joystick.update()
+		self.assertEqual(sorted(_button_events(self.joystick)),
+			sorted([(UInputEvents["BTN_A"], 0), (UInputEvents["BTN_X"], 0)]))
+
+	def test_moved_held_buttons_are_released(self):
+		conf = _joystick_conf()
+		conf["buttonControllers"].append({"name": "extra", "type": "Dummy", "options": {},
+			"mapping": ["BTN_Y"]})
+		new_conf = _joystick_conf(dummy_option=1)
+		new_conf["buttonControllers"][0]["mapping"] = ["BTN_A", "BTN_B", "BTN_Y"]
+		new_conf["buttonControllers"].append({"name": "extra", "type": "Dummy", "options": {"reload": 1},
+			"mapping": ["BTN_X"]})
+		self.joystick = Joystick.Joystick(copy.deepcopy(conf))
+		_hold(self.joystick, 0b101)
+		self.joystick.button_controllers()[1].buttons_mask = lambda: 0
+		self.joystick.update()
+		self.joystick.reload(copy.deepcopy(new_conf))
+		# BTN_X moved to the other controller, which reads it released
+		_hold(self.joystick, 0b001)
+		self.joystick.button_controllers()[1].buttons_mask = lambda: 0
+		self.joystick.output().clear()
+		self.joystick.update()
+		self.assertEqual(_button_events(self.joystick), [(UInputEvents["BTN_X"], 0)])
+
+
+if __name__ == '__main__':
+	unittest.main()